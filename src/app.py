@@ -1,15 +1,51 @@
 # src/app.py
 
 import streamlit as st
+import io
 import os
+import uuid
+import hashlib
 from dotenv import load_dotenv
 from core.email_sender import EmailSender
 from utils.recipient_parser import parse_from_text, parse_from_csv
 from streamlit_quill import st_quill
 from core.ai_generator import GeminiEmailGenerator
+from core.mail_merge import has_placeholders
+from core.attachment_spool import spool_from_env
+from core.background_sends import BackgroundSends
 load_dotenv()
 
 st.set_page_config(page_title="Bulk Email Sender", layout="centered")
+
+@st.cache_resource
+def get_ai_generator():
+    """One generator (and response cache) per server process, shared across reruns."""
+    return GeminiEmailGenerator()
+
+@st.cache_resource(max_entries=16)
+def get_email_sender(sender_email, _sender_password):
+    """
+    One logged-in sender (and SMTP connection pool) per account, reused by every send.
+    Keyed on the address only (Streamlit skips `_` arguments), so passwords never end
+    up in cache keys; callers pass a changed password to `EmailSender.login`.
+    """
+    return EmailSender(sender_email, _sender_password)
+
+@st.cache_resource
+def get_background_sends():
+    """Sends run here, off the script thread, so reruns neither block on nor restart them."""
+    return BackgroundSends(max_workers=int(os.getenv("STREAMLIT_SEND_WORKERS", "2")))
+
+@st.cache_data(max_entries=8, show_spinner="Reading recipients...")
+def load_recipient_rows(digest, _data):
+    """The CSV's (email, fields) rows, parsed once per file content (`digest`) instead of on every rerun."""
+    return parse_from_csv(io.BytesIO(_data), with_fields=True)
+
+def background_send(method, *args, **kwargs):
+    """Binds a sender method's arguments now; the background worker supplies the callbacks."""
+    def send(progress_callback, failure_callback):
+        return method(*args, progress_callback=progress_callback, failure_callback=failure_callback, **kwargs)
+    return send
 st.title(" Bulk Email Sender with AI")
 
 # Initialize Session State for AI content
@@ -34,14 +70,19 @@ recipient_option = st.radio(
 )
 # ... (Recipient logic remains the same) ...
 recipients = []
+# (email, fields) per recipient, used to fill {{field}} placeholders
+recipient_rows = []
 if recipient_option == "Type manually":
     recipient_text = st.text_area("Enter emails (comma-separated)")
     recipients = parse_from_text(recipient_text)
+    recipient_rows = [(email, {}) for email in recipients]
 else:
     uploaded_file = st.file_uploader("Choose a CSV file (must have an 'Email' column)")
     if uploaded_file:
         try:
-            recipients = parse_from_csv(uploaded_file)
+            data = uploaded_file.getvalue()
+            recipient_rows = load_recipient_rows(hashlib.sha256(data).hexdigest(), data)
+            recipients = [email for email, _ in recipient_rows]
             st.success(f"Loaded {len(recipients)} emails from {uploaded_file.name}")
         except ValueError as e:
             st.error(e)
@@ -49,7 +90,10 @@ else:
 if recipients:
     st.write(f"**Total Recipients:** {len(recipients)}")
     with st.expander("Show Recipients"):
-        st.write(recipients)
+        # Only a preview: the whole list would be sent to the browser on every rerun.
+        st.write(recipients[:200])
+        if len(recipients) > 200:
+            st.caption(f"... and {len(recipients) - 200} more")
 
 
 # --- UI for Email Content ---
@@ -69,7 +113,7 @@ with st.expander("AI Email Assistant (Generate a Draft)"):
         else:
             try:
                 with st.spinner("Gemini is thinking... Please wait."):
-                    ai_generator = GeminiEmailGenerator()
+                    ai_generator = get_ai_generator()
                     # Pass the single user prompt to the updated function
                     email_content = ai_generator.generate_email(user_prompt)
                     st.session_state.generated_subject = email_content['subject']
@@ -108,10 +152,15 @@ sending_mode = st.radio(
     "Select Sending Mode",
     ("Individual Mode", "Batch Mode (sends one email to all, fast)"),
     index=0,
-    help="Individual Mode is more professional. Batch mode sends a single email with all recipients hidden (BCC)."
+    help="Individual Mode is more professional and fills {{field}} placeholders (e.g. {{name}}) from CSV columns. Batch mode sends a single email with all recipients hidden (BCC)."
 )
 
-if st.button("SEND EMAILS", use_container_width=True):
+background = get_background_sends()
+active_send = st.session_state.get("send_id")
+active_state = background.status(active_send) if active_send else None
+sending = active_state is not None and active_state["status"] in ("queued", "running")
+
+if st.button("SEND EMAILS", use_container_width=True, disabled=sending):
     # Validations
     if not sender_email or not sender_password:
         st.error("Sender credentials are required in the sidebar.")
@@ -122,43 +171,71 @@ if st.button("SEND EMAILS", use_container_width=True):
     elif not email_body or email_body == "<p><br></p>":
         st.warning("Email body is empty.")
     else:
+        attachment_spool = spool_from_env()
+        send_id = str(uuid.uuid4())
+        attachment_path = None
         try:
-            email_sender = EmailSender(sender_email, sender_password)
-            attachment_path = None
+            email_sender = get_email_sender(sender_email, sender_password)
+            email_sender.login(sender_password)
             if attachment:
-                attachment_path = os.path.join(os.getcwd(), attachment.name)
-                with open(attachment_path, "wb") as f:
-                    f.write(attachment.getbuffer())
+                attachment_path = attachment_spool.store(attachment, attachment.name, send_id)
 
             if sending_mode.startswith("Individual"):
-                st.info("Sending emails in Individual Mode...")
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-
-                def update_progress(index, total, current_recipient):
-                    progress = (index + 1) / total
-                    progress_bar.progress(progress)
-                    status_text.info(f"Sending email {index + 1}/{total} to: {current_recipient}")
-
-                email_sender.send_individual_emails(
-                    recipients, email_subject, email_body, attachment_path, progress_callback=update_progress
-                )
-                status_text.empty()
-                progress_bar.empty()
-                st.success("✅ All emails have been sent successfully!")
-            else:
-                with st.spinner(f"Sending one email to all {len(recipients)} recipients in Batch Mode..."):
-                    email_sender.send_batch_email(
-                        recipients, email_subject, email_body, attachment_path
+                if has_placeholders(email_subject, email_body):
+                    # Mail merge: fill {{field}} placeholders from each recipient's CSV columns.
+                    send = background_send(
+                        email_sender.send_merged_emails, list(recipient_rows), email_subject, email_body, attachment_path
                     )
-                st.success("✅ Batch email sent successfully!")
+                else:
+                    send = background_send(
+                        email_sender.send_individual_emails, list(recipients), email_subject, email_body, attachment_path
+                    )
+                description = "Sending emails in Individual Mode"
+            else:
+                batch_size = int(os.getenv("SMTP_BATCH_SIZE", "100"))
+                send = background_send(
+                    email_sender.send_batch_email, list(recipients), email_subject, email_body, attachment_path,
+                    chunk_size=batch_size
+                )
+                description = f"Sending in Batch Mode ({batch_size} per email)"
 
-            if attachment_path:
-                os.remove(attachment_path)
+            background.submit(
+                send_id, len(recipients), send, description,
+                cleanup=lambda path=attachment_path, owner=send_id: attachment_spool.release(path, owner)
+            )
+            st.session_state.send_id = active_send = send_id
+            active_state = background.status(send_id)
 
         except (ValueError, ConnectionError, RuntimeError) as e:
+            attachment_spool.release(attachment_path, send_id)
             st.error(f"An error occurred: {e}")
         except Exception as e:
+            attachment_spool.release(attachment_path, send_id)
             st.error(f"An unexpected error occurred: {e}")
 
-
+@st.fragment(run_every=1.0)
+def show_send_progress(send_id):
+    """Polls only the send's compact progress record, once a second, without rerunning the page."""
+    state = get_background_sends().status(send_id)
+    if state is None or state["status"] not in ("queued", "running"):
+        # Finished: one full rerun shows the result and stops the polling.
+        st.rerun()
+    st.progress(min(1.0, state["sent"] / max(1, state["total"])), text=state["message"])
+    if state.get("failed"):
+        st.caption(f"{state['failed']} could not be delivered so far.")
+
+if active_state is not None:
+    if active_state["status"] in ("queued", "running"):
+        show_send_progress(active_send)
+    elif active_state["status"] == "failed":
+        st.error(f"An error occurred: {active_state['message']}")
+    else:
+        failures = background.failures(active_send)
+        if failures:
+            st.warning(f"✅ {active_state['message']}")
+            st.dataframe(
+                [{"Email": f.recipient, "Status": f.status, "Error": f.error} for f in failures],
+                use_container_width=True
+            )
+        else:
+            st.success(f"✅ {active_state['message']}")
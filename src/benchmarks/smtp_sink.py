@@ -0,0 +1,171 @@
+# src/benchmarks/smtp_sink.py
+
+import random
+import asyncio
+import threading
+from typing import Optional
+
+# Messages up to this size are accepted in one DATA transaction.
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+class SMTPSink:
+    """
+    In-process SMTP server that accepts mail and throws it away, for benchmarks and
+    tests. It runs on its own event loop in a background thread, so both the sync and
+    async senders can talk to it on `127.0.0.1:port` without TLS (any login is accepted).
+
+    Faults are injected at random with a fixed `seed`: `throttle_rate` of the
+    transactions are answered `451 4.7.1` at MAIL FROM, and `error_rate` of the
+    recipients are refused with `550 5.1.1`. Every accepted message is answered after
+    `latency` seconds.
+    """
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self.connections = 0
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+        self.throttled = 0
+        self.rejected = 0
+
+    def start(self) -> "SMTPSink":
+        self._thread = threading.Thread(target=self._serve, name="smtp-sink", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._server is None:
+            raise RuntimeError(f"SMTP sink could not listen on {self.host}:{self.port}.")
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "SMTPSink":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "messages": self.messages,
+            "recipients": self.recipients,
+            "bytes": self.bytes,
+            "throttled": self.throttled,
+            "rejected": self.rejected
+        }
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._session, self.host, self.port, limit=MAX_MESSAGE_SIZE)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError:
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._loop.close()
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+
+        async def reply(text: str):
+            writer.write(text.encode("ascii") + b"\r\n")
+            await writer.drain()
+
+        recipients = None
+        try:
+            await reply("220 automail-sink ESMTP ready")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode("utf-8", errors="replace").strip().partition(" ")
+                command = command.upper()
+                if command == "EHLO":
+                    await reply("250-automail-sink\r\n250-PIPELINING\r\n250-8BITMIME\r\n"
+                                f"250-SIZE {MAX_MESSAGE_SIZE}\r\n250 AUTH PLAIN LOGIN")
+                elif command == "HELO":
+                    await reply("250 automail-sink")
+                elif command == "AUTH":
+                    mechanism, _, initial = argument.partition(" ")
+                    prompts = ["VXNlcm5hbWU6", "UGFzc3dvcmQ6"] if mechanism.upper() == "LOGIN" else [""]
+                    if initial:
+                        prompts = prompts[1:]
+                    for prompt in prompts:
+                        await reply(f"334 {prompt}".rstrip())
+                        await reader.readline()
+                    await reply("235 2.7.0 Authentication successful")
+                elif command == "MAIL":
+                    if self.throttle_rate and self._random.random() < self.throttle_rate:
+                        self.throttled += 1
+                        await reply("451 4.7.1 Too many messages, slow down")
+                        continue
+                    recipients = []
+                    await reply("250 2.1.0 OK")
+                elif command == "RCPT":
+                    if recipients is None:
+                        await reply("503 5.5.1 MAIL first")
+                    elif self.error_rate and self._random.random() < self.error_rate:
+                        self.rejected += 1
+                        await reply("550 5.1.1 No such user")
+                    else:
+                        recipients.append(argument)
+                        await reply("250 2.1.5 OK")
+                elif command == "DATA":
+                    if not recipients:
+                        await reply("554 5.5.1 No valid recipients")
+                        continue
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = await reader.readuntil(b"\r\n.\r\n")
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self.messages += 1
+                    self.recipients += len(recipients)
+                    self.bytes += len(data)
+                    recipients = None
+                    await reply("250 2.0.0 Queued")
+                elif command == "RSET":
+                    recipients = None
+                    await reply("250 2.0.0 OK")
+                elif command == "NOOP":
+                    await reply("250 2.0.0 OK")
+                elif command == "QUIT":
+                    await reply("221 2.0.0 Bye")
+                    break
+                else:
+                    await reply("502 5.5.2 Command not recognized")
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
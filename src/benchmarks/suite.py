@@ -0,0 +1,426 @@
+# src/benchmarks/suite.py
+
+import io
+import os
+import sys
+import json
+import time
+import array
+import asyncio
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from src.benchmarks.smtp_sink import SMTPSink
+from src.core.async_email_sender import AsyncEmailSender
+from src.core.ai_generator import GeminiEmailGenerator
+from src.core.fake_model import FakeGenerativeModel
+from src.core.personalizer import Personalizer
+from src.core.rate_limiter import SenderRateLimiter
+from src.core.response_cache import ResponseCache
+from src.utils.recipient_parser import stream_from_csv
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCENARIOS = ("individual", "batch", "csv", "generation", "startup_api", "startup_worker")
+DEFAULT_SIZES = (1000, 100000, 1000000)
+# Cold-start scenarios: the module each entry point imports. They run `startup_repeats`
+# times instead of once per size.
+STARTUP_MODULES = {"startup_api": "src.main", "startup_worker": "src.worker"}
+# Slow imports that only some requests need; a cold start should not load them.
+HEAVY_MODULES = ("google.generativeai", "pypdf", "pandas", "dns.resolver")
+_STARTUP_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+except ImportError:
+    peak = None
+print(json.dumps({{"seconds": seconds, "cpu": time.process_time(), "peak": peak,
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+BODY = "<p>Hello,</p><p>" + "This is the benchmark campaign body. " * 20 + "</p>"
+
+
+class BenchmarkOptions:
+    """Knobs shared by every scenario of a run."""
+    def __init__(
+        self,
+        smtp_latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        concurrency: int = 4,
+        batch_size: int = 100,
+        ai_latency: float = 0.0,
+        ai_batch_size: int = 5,
+        startup_repeats: int = 5,
+        seed: int = 0
+    ):
+        self.smtp_latency = smtp_latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.ai_latency = ai_latency
+        self.ai_batch_size = ai_batch_size
+        self.startup_repeats = startup_repeats
+        self.seed = seed
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class Measurement:
+    """Raw result of one scenario run: what was processed, how long it took, per-operation latencies."""
+    def __init__(self, items: int, seconds: float, latencies: Optional[array.array] = None, **extra):
+        self.items = items
+        self.seconds = seconds
+        self.latencies = latencies
+        self.extra = extra
+
+
+class TimedSender(AsyncEmailSender):
+    """AsyncEmailSender recording how long each message took to go out, throttling retries included."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = array.array("d")
+
+    async def _send_limited(self, envelope, msg_string):
+        started = time.perf_counter()
+        try:
+            return await super()._send_limited(envelope, msg_string)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+
+class TimedModel(FakeGenerativeModel):
+    """FakeGenerativeModel recording the duration of each call."""
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency=latency)
+        self.latencies = array.array("d")
+
+    async def generate_content_async(self, prompt: str):
+        started = time.perf_counter()
+        try:
+            return await super().generate_content_async(prompt)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+
+def percentiles(values, points=(50, 90, 99)) -> Optional[Dict[str, float]]:
+    """Nearest-rank percentiles of `values` (seconds), in milliseconds."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))] * 1000 for p in points}
+    result["max"] = ordered[-1] * 1000
+    return {name: round(value, 3) for name, value in result.items()}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _recipients(size: int) -> List[str]:
+    return [f"user{i}@example.com" for i in range(size)]
+
+
+async def _send(sink: SMTPSink, options: BenchmarkOptions, send: Callable) -> TimedSender:
+    sender = TimedSender(
+        "bench@example.com",
+        "secret",
+        host=sink.host,
+        port=sink.port,
+        use_tls=False,
+        max_concurrency=options.concurrency,
+        retry_delay=0.01,
+        max_retry_delay=0.1,
+        # The benchmark measures the engine itself, not the account's sending limits.
+        rate_limiter=SenderRateLimiter(rate=1e9, burst=1e9, base_backoff=0.01, max_backoff=0.1)
+    )
+    await sender.connect()
+    try:
+        sender.report = await send(sender)
+    finally:
+        await sender.close()
+    return sender
+
+
+def _smtp_scenario(size: int, options: BenchmarkOptions, send: Callable) -> Measurement:
+    with SMTPSink(
+        latency=options.smtp_latency,
+        throttle_rate=options.throttle_rate,
+        error_rate=options.error_rate,
+        seed=options.seed
+    ) as sink:
+        started = time.perf_counter()
+        sender = asyncio.run(_send(sink, options, send))
+        seconds = time.perf_counter() - started
+        stats = sink.stats()
+    report = sender.report.as_dict()
+    return Measurement(
+        size, seconds, sender.latencies,
+        messages=stats["messages"], bytes=stats["bytes"], connections=stats["connections"],
+        throttled=stats["throttled"], failed=report["failed"], deferred=report["deferred"], retries=report["retries"]
+    )
+
+
+def bench_individual(size: int, options: BenchmarkOptions) -> Measurement:
+    """One message per recipient, as in Individual Mode."""
+    recipients = _recipients(size)
+    return _smtp_scenario(size, options, lambda sender: sender.send_individual_emails(recipients, "Benchmark", BODY))
+
+
+def bench_batch(size: int, options: BenchmarkOptions) -> Measurement:
+    """BCC chunks of `batch_size` recipients, as in Batch Mode; latencies are per chunk."""
+    recipients = _recipients(size)
+    return _smtp_scenario(
+        size, options,
+        lambda sender: sender.send_batch_email(recipients, "Benchmark", BODY, chunk_size=options.batch_size)
+    )
+
+
+def bench_csv(size: int, options: BenchmarkOptions) -> Measurement:
+    """Streams, validates and de-duplicates an uploaded recipient CSV with extra columns."""
+    lines = ["Email,First Name,Company"]
+    for i in range(size):
+        # About 1% duplicates and 1% invalid addresses, as in real lists.
+        if i % 100 == 1:
+            lines.append("USER0@Example.com,Dup,Acme")
+        elif i % 100 == 2:
+            lines.append(f"not-an-address-{i},Bad,Acme")
+        else:
+            lines.append(f"user{i}@example.com,User {i},Company {i % 50}")
+    data = ("\n".join(lines) + "\n").encode("utf-8")
+    del lines
+
+    started = time.perf_counter()
+    stream = stream_from_csv(io.BytesIO(data), with_fields=True)
+    valid = sum(1 for _ in stream)
+    seconds = time.perf_counter() - started
+    return Measurement(size, seconds, valid=valid, invalid=stream.invalid, duplicates=stream.duplicates, bytes=len(data))
+
+
+def bench_generation(size: int, options: BenchmarkOptions) -> Measurement:
+    """Personalized drafts from the local fake model; latencies are per model call."""
+    model = TimedModel(latency=options.ai_latency)
+    generator = GeminiEmailGenerator(
+        model=model, cache=ResponseCache(max_entries=1024), max_concurrency=options.concurrency
+    )
+    personalizer = Personalizer(generator, batch_size=options.ai_batch_size)
+    rows = ((email, {"first_name": f"User {i}"}) for i, email in enumerate(_recipients(size)))
+
+    async def generate() -> int:
+        count = 0
+        async for _ in personalizer.stream(rows, "Benchmark", BODY):
+            count += 1
+        return count
+
+    started = time.perf_counter()
+    drafts = asyncio.run(generate())
+    seconds = time.perf_counter() - started
+    return Measurement(size, seconds, model.latencies, drafts=drafts, model_calls=model.calls)
+
+
+def bench_startup(module: str, repeats: int) -> Measurement:
+    """
+    Imports an entry point's module in `repeats` fresh interpreters. Reports the median
+    import time, the child's CPU time and memory, and any heavy modules it loaded.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    probe = _STARTUP_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    runs = []
+    with tempfile.TemporaryDirectory() as directory:
+        # Keep the job store and caches the entry point creates out of the working tree.
+        env = dict(os.environ, JOB_STORE_PATH=os.path.join(directory, "jobs.db"), PYTHONDONTWRITEBYTECODE="1")
+        for _ in range(repeats):
+            output = subprocess.run(
+                [sys.executable, "-c", probe], cwd=root, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+    latencies = array.array("d", (run["seconds"] for run in runs))
+    return Measurement(
+        1, statistics.median(latencies), latencies,
+        module=module,
+        cpu_seconds=round(statistics.median(run["cpu"] for run in runs), 3),
+        peak_rss_mb=max((run["peak"] or 0) for run in runs) or None,
+        heavy_modules=sorted({name for run in runs for name in run["heavy"]})
+    )
+
+
+BENCHMARKS: Dict[str, Callable[[int, BenchmarkOptions], Measurement]] = {
+    "individual": bench_individual,
+    "batch": bench_batch,
+    "csv": bench_csv,
+    "generation": bench_generation,
+    **{
+        scenario: (lambda size, options, module=module: bench_startup(module, size))
+        for scenario, module in STARTUP_MODULES.items()
+    }
+}
+
+
+def run_scenario(scenario: str, size: int, options: BenchmarkOptions) -> dict:
+    """Runs one scenario and summarizes it: throughput, latency percentiles, CPU time and peak memory."""
+    cpu_started = time.process_time()
+    measurement = BENCHMARKS[scenario](size, options)
+    cpu_seconds = time.process_time() - cpu_started
+    # Read before summarizing, so sorting the latencies does not count towards the peak.
+    peak = peak_rss_mb()
+    result = {
+        "scenario": scenario,
+        "size": size,
+        "seconds": round(measurement.seconds, 4),
+        "per_second": round(measurement.items / measurement.seconds, 1) if measurement.seconds else None,
+        "latency_ms": percentiles(measurement.latencies),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "peak_rss_mb": peak
+    }
+    result.update(measurement.extra)
+    return result
+
+
+def run_isolated(scenario: str, size: int, options: BenchmarkOptions) -> dict:
+    """`run_scenario` in a fresh process, so peak memory and CPU time belong to that scenario alone."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_scenario, scenario, size, options).result()
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(
+    scenarios=SCENARIOS,
+    sizes=DEFAULT_SIZES,
+    options: Optional[BenchmarkOptions] = None,
+    isolate: bool = True,
+    log: Callable[[str], None] = print
+) -> dict:
+    """Runs every scenario at every size and returns the machine-readable results."""
+    options = options or BenchmarkOptions()
+    results = []
+    for scenario in scenarios:
+        if scenario not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark scenario: {scenario}")
+        for size in ([options.startup_repeats] if scenario in STARTUP_MODULES else sizes):
+            result = (run_isolated if isolate else run_scenario)(scenario, size, options)
+            latency = result["latency_ms"]
+            log(
+                f"{scenario:>14} {size:>9,}: {result['per_second'] or 0:>10,.0f}/s"
+                + (f"  p50 {latency['p50']:.2f} ms  p99 {latency['p99']:.2f} ms" if latency else "")
+                + f"  cpu {result['cpu_seconds']:.1f} s  peak {result['peak_rss_mb']} MB"
+            )
+            results.append(result)
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": options.as_dict(),
+        "results": results
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.2) -> List[str]:
+    """
+    Regressions of `current` against `baseline`: throughput lower, or p99 latency or
+    peak memory higher, by more than `tolerance` (a fraction) for the same scenario and
+    size, and heavy modules newly loaded at startup.
+    """
+    previous = {(r["scenario"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["scenario"], result["size"]))
+        if before is None:
+            continue
+        name = f"{result['scenario']} @ {result['size']:,}"
+        checks = [
+            ("throughput", before.get("per_second"), result.get("per_second"), False),
+            ("p99 latency", (before.get("latency_ms") or {}).get("p99"), (result.get("latency_ms") or {}).get("p99"), True),
+            ("peak memory", before.get("peak_rss_mb"), result.get("peak_rss_mb"), True)
+        ]
+        for metric, old, new, higher_is_worse in checks:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append(f"{name}: {metric} {old:g} -> {new:g} ({change:+.0%})")
+        loaded = sorted(set(result.get("heavy_modules") or ()) - set(before.get("heavy_modules") or ()))
+        if loaded:
+            regressions.append(f"{name}: now imports {', '.join(loaded)} at startup")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-Mail benchmark suite (local SMTP sink and fake AI model)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run ({', '.join(SCENARIOS)}).")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated recipient counts.")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Earlier results to compare against; exits with status 1 on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed change before a result is a regression.")
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="Seconds the sink takes to accept a message.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of transactions answered 451.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of recipients refused with 550.")
+    parser.add_argument("--concurrency", type=int, default=4, help="SMTP connections and AI calls in flight.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Recipients per message in batch mode.")
+    parser.add_argument("--ai-latency", type=float, default=0.0, help="Seconds the fake model takes per call.")
+    parser.add_argument("--ai-batch-size", type=int, default=5, help="Recipients per personalization prompt.")
+    parser.add_argument("--startup-repeats", type=int, default=5, help="Fresh interpreters per cold-start scenario.")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run scenarios in this process (faster, but memory figures accumulate).")
+    args = parser.parse_args()
+
+    options = BenchmarkOptions(
+        smtp_latency=args.smtp_latency,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        ai_latency=args.ai_latency,
+        ai_batch_size=args.ai_batch_size,
+        startup_repeats=args.startup_repeats
+    )
+    report = run_suite(
+        [name.strip() for name in args.scenarios.split(",") if name.strip()],
+        [int(size) for size in args.sizes.split(",") if size.strip()],
+        options,
+        isolate=not args.in_process
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
@@ -2,26 +2,107 @@
 
 import os
 import json
-import google.generativeai as genai
-from typing import Dict
+import random
+import asyncio
+import weakref
+import threading
+from typing import Dict, Optional
 from dotenv import load_dotenv
 
+from .response_cache import ResponseCache, cache_key, cache_from_env
+from .fake_model import FakeGenerativeModel
+from .metrics import time_stage
+
+DEFAULT_MODEL = "models/gemini-2.0-flash"
+# HTTP statuses of Gemini API errors worth retrying: rate limited or temporarily unavailable.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def strip_code_fence(text: str) -> str:
+    """Removes the ```json fences models sometimes wrap around JSON replies."""
+    cleaned = text.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    if cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    return cleaned.strip()
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # google.api_core exceptions carry the HTTP status as `code`.
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
 class GeminiEmailGenerator:
     """
     A class to handle email content generation using the Gemini API.
     """
-    def __init__(self):
+    def __init__(
+        self,
+        model=None,
+        model_name: str = DEFAULT_MODEL,
+        cache: Optional[ResponseCache] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: float = 0.5
+    ):
         """
         Initializes the Gemini model.
+
+        Args:
+            model: Object with a `generate_content(prompt)` method. Defaults to the Gemini
+                model, created on first use, or to a local `FakeGenerativeModel` when
+                AUTOMAIL_FAKE_AI=1.
+            model_name (str): Gemini model to use; also part of the cache key.
+            cache (ResponseCache): Cache for generated drafts. Defaults to one configured
+                from the AI_CACHE_* environment variables.
+            max_concurrency (int): Model calls allowed in flight at once on the async path
+                (AI_MAX_CONCURRENCY, default 4).
+            timeout (float): Seconds allowed per model call (AI_TIMEOUT, default 30).
+            max_retries (int): Retries after a transient failure (AI_MAX_RETRIES, default 2).
+            retry_backoff (float): Base delay in seconds for the jittered exponential backoff.
         """
         load_dotenv()
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables.")
-        
-        genai.configure(api_key=api_key)
-        # --- FIX: Updated model to a stable one ---
-        self.model = genai.GenerativeModel('models/gemini-2.0-flash')
+        if model is None and os.getenv("AUTOMAIL_FAKE_AI") == "1":
+            model = FakeGenerativeModel()
+        self._api_key = None
+        if model is None:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY not found in environment variables.")
+            self._api_key = api_key
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.model_name = model_name
+        self.cache = cache if cache is not None else cache_from_env()
+        self.max_concurrency = max_concurrency or int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+        self.timeout = timeout or float(os.getenv("AI_TIMEOUT", "30"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("AI_MAX_RETRIES", "2"))
+        self.retry_backoff = retry_backoff
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def model(self):
+        """
+        The model client. The Gemini SDK takes most of a second to import, so it is
+        only loaded when the first draft is generated, not when the app starts.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self._api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
 
     def generate_email(self, user_prompt: str, context_text: str = "") -> Dict[str, str]:
         """
@@ -33,7 +114,15 @@ class GeminiEmailGenerator:
 
         Returns:
             Dict[str, str]: A dictionary with 'subject' and 'body' keys.
+
+        Identical requests are answered from the cache, and concurrent identical
+        requests share a single model call.
         """
+        key = cache_key(user_prompt, context_text, self.model_name)
+        email_content = self.cache.get_or_compute(key, lambda: self._generate(user_prompt, context_text))
+        return dict(email_content)
+
+    def _build_prompt(self, user_prompt: str, context_text: str) -> str:
         # --- NEW: A much more robust prompt that lets the AI figure out the details ---
         context_section = ""
         if context_text:
@@ -71,20 +160,15 @@ class GeminiEmailGenerator:
         **Example JSON Output:**
         {{"subject": "Inquiry Regarding AI/ML Internship Opportunities", "body": "<p>Dear Hiring Manager,</p><p>I hope you're doing well...</p><p>Sincerely,<br>John Doe<br>555-0123<br>john@example.com</p>"}}
         """
+        return prompt
 
+    def _parse_response(self, text: str) -> Dict[str, str]:
+        """Extracts the {"subject", "body"} JSON object from the model's reply."""
+        cleaned_response = text
         try:
-            response = self.model.generate_content(prompt)
             # Clean up the response to ensure it's valid JSON
-            cleaned_response = response.text.strip()
-            if cleaned_response.startswith("```json"):
-                cleaned_response = cleaned_response[7:]
-            if cleaned_response.startswith("```"):
-                cleaned_response = cleaned_response[3:]
-            if cleaned_response.endswith("```"):
-                cleaned_response = cleaned_response[:-3]
-            
-            cleaned_response = cleaned_response.strip()
-            
+            cleaned_response = strip_code_fence(text)
+
             # Parse the JSON string into a Python dictionary
             email_content = json.loads(cleaned_response)
             
@@ -96,4 +180,66 @@ class GeminiEmailGenerator:
         except json.JSONDecodeError:
             raise RuntimeError(f"Failed to decode the AI's JSON response. The response was: {cleaned_response}")
         except Exception as e:
-            raise RuntimeError(f"An error occurred with the Gemini API: {e}")
\ No newline at end of file
+            raise RuntimeError(f"An error occurred with the Gemini API: {e}")
+
+    def _generate(self, user_prompt: str, context_text: str) -> Dict[str, str]:
+        try:
+            with time_stage("ai_generation"):
+                text = self.model.generate_content(self._build_prompt(user_prompt, context_text)).text
+        except Exception as e:
+            raise RuntimeError(f"An error occurred with the Gemini API: {e}")
+        return self._parse_response(text)
+
+    def _loop_semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop; keep one semaphore per loop.
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _call_model_async(self, prompt: str) -> str:
+        """One bounded, time-limited model call that never blocks the event loop."""
+        if self._model is None:
+            # Loading the SDK blocks; keep it off the event loop.
+            await asyncio.to_thread(lambda: self.model)
+        async with self._loop_semaphore():
+            if hasattr(self.model, "generate_content_async"):
+                call = self.model.generate_content_async(prompt)
+            else:
+                call = asyncio.to_thread(self.model.generate_content, prompt)
+            with time_stage("ai_generation"):
+                response = await asyncio.wait_for(call, self.timeout)
+        return response.text
+
+    async def generate_text_async(self, prompt: str) -> str:
+        """
+        Sends a raw prompt to the model and returns the reply text, with the same
+        concurrency limit, timeout and retry policy as `generate_email_async`.
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self._call_model_async(prompt)
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise RuntimeError(f"The Gemini API did not answer within {self.timeout:g} seconds.")
+                    raise RuntimeError(f"An error occurred with the Gemini API: {e}")
+                # Full jitter keeps retries from many requests from arriving in lockstep.
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+                attempt += 1
+
+    async def _generate_async(self, user_prompt: str, context_text: str) -> Dict[str, str]:
+        text = await self.generate_text_async(self._build_prompt(user_prompt, context_text))
+        return self._parse_response(text)
+
+    async def generate_email_async(self, user_prompt: str, context_text: str = "") -> Dict[str, str]:
+        """
+        Async variant of `generate_email` for use on an event loop. At most
+        `max_concurrency` model calls run at once, each limited to `timeout` seconds,
+        and transient failures are retried `max_retries` times with jittered backoff.
+        """
+        key = cache_key(user_prompt, context_text, self.model_name)
+        email_content = await self.cache.aget_or_compute(key, lambda: self._generate_async(user_prompt, context_text))
+        return dict(email_content)
\ No newline at end of file
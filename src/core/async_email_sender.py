@@ -0,0 +1,434 @@
+# src/core/async_email_sender.py
+
+import asyncio
+from abc import ABC, abstractmethod
+import yagmail
+import aiosmtplib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Callable, Optional, Tuple, Union
+
+from .rate_limiter import SenderRateLimiter, get_rate_limiter, is_throttle_error
+from .message_builder import Attachment, MessageTemplate, MergeMessageTemplate, UNDISCLOSED_RECIPIENTS
+from .pipelining import group_by_domain
+from .delivery import DeliveryEngine, DeliveryReport, RetryScheduler
+from .metrics import SENDS_IN_FLIGHT, time_stage
+
+class AsyncDelivery(ABC):
+    """
+    The delivery loops of the async senders. Subclasses open connections, compile
+    messages and send one prepared message (`_send_limited`); retries, concurrency and
+    callbacks are shared, so `AsyncEmailSender` and `SenderPool` take the same calls.
+    """
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_throttle_retries: int = 5,
+        max_delivery_retries: int = 3,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0
+    ):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_throttle_retries = max_throttle_retries
+        self.max_delivery_retries = max_delivery_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._attachments: Dict[str, Attachment] = {}
+        self._attachment_lock = asyncio.Lock()
+
+    @abstractmethod
+    async def connect(self):
+        """Opens and authenticates the sending connection(s)."""
+
+    @abstractmethod
+    async def close(self):
+        """Closes every connection; safe to call on a sender that never connected."""
+
+    @abstractmethod
+    async def compile_message(self, subject: str, body: str, attachment_path: str = None):
+        """Builds the message once for a whole campaign."""
+
+    @abstractmethod
+    async def compile_merge_message(self, subject: str, body: str, attachment_path: str = None):
+        """Builds a mail-merge message whose copies are rendered per recipient."""
+
+    @abstractmethod
+    async def _send_limited(self, envelope: List[str], msg_string) -> dict:
+        """Sends one prepared message; returns the refused recipients as {address: reply}."""
+
+    async def _attachment(self, attachment_path: Optional[str]) -> Optional[Attachment]:
+        """The encoded attachment, read once per sender however many messages carry it."""
+        if not attachment_path:
+            return None
+        async with self._attachment_lock:
+            attachment = self._attachments.get(attachment_path)
+            if attachment is None:
+                # Reading and encoding the file is blocking; keep it off the event loop.
+                attachment = await asyncio.to_thread(Attachment.from_path, attachment_path)
+                self._attachments[attachment_path] = attachment
+        return attachment
+
+    async def send_batch_email(
+        self,
+        recipients: List[str],
+        subject: str,
+        body: str,
+        attachment_path: str = None,
+        chunk_size: int = 100,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        chunk_callback: Callable = None
+    ) -> DeliveryReport:
+        """
+        Sends one BCC-style copy per chunk of up to `chunk_size` recipients: they are
+        only on the envelope, and the message is addressed to "undisclosed-recipients".
+        Chunks stay under servers' per-message recipient limits and go out in parallel
+        over the connection pool, and a chunk that fails is retried on its own.
+        `chunk_callback(index, total_chunks, chunk)` is called when a chunk has been
+        sent (again for recipients of it that needed a retry); the other callbacks
+        and the returned `DeliveryReport` follow `send_individual_emails`.
+        """
+        recipients = list(recipients)
+        if not recipients:
+            return DeliveryReport()
+        chunk_size = max(1, int(chunk_size))
+        chunks = [recipients[i:i + chunk_size] for i in range(0, len(recipients), chunk_size)]
+        try:
+            template = await self.compile_message(subject, body, attachment_path)
+        except Exception as e:
+            raise RuntimeError(f"An error occurred while sending the batch email: {e}")
+
+        envelope_callback = None
+        if chunk_callback:
+            envelope_callback = lambda envelope, fields: chunk_callback(fields["chunk"], len(chunks), envelope)
+        return await self._deliver(
+            ((chunk, {"chunk": index}) for index, chunk in enumerate(chunks)),
+            len(recipients),
+            lambda envelope, fields: template.render(UNDISCLOSED_RECIPIENTS),
+            progress_callback,
+            failure_callback,
+            envelope_callback
+        )
+
+    def _engine(
+        self,
+        envelopes: Iterable[Tuple[List[str], Optional[dict]]],
+        total_recipients: int,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        envelope_callback: Callable = None
+    ) -> DeliveryEngine:
+        return DeliveryEngine(
+            envelopes, total_recipients, progress_callback, failure_callback,
+            max_retries=self.max_delivery_retries,
+            scheduler=RetryScheduler(self.retry_delay, self.max_retry_delay),
+            envelope_callback=envelope_callback
+        )
+
+    async def _deliver(
+        self,
+        envelopes: Iterable[Tuple[List[str], Optional[Dict[str, str]]]],
+        total_recipients: int,
+        render: Callable,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        envelope_callback: Callable = None
+    ) -> DeliveryReport:
+        """Async counterpart of `EmailSender._deliver`, with the same failure handling."""
+        engine = self._engine(envelopes, total_recipients, progress_callback, failure_callback, envelope_callback)
+
+        async def worker():
+            while True:
+                attempt, wait = engine.next()
+                if attempt is None:
+                    if wait is None:
+                        return
+                    # Poll, as another worker may schedule an earlier retry meanwhile.
+                    await asyncio.sleep(min(wait, 1.0))
+                    continue
+                envelope, fields, _ = attempt
+                try:
+                    refused = await self._send_limited(envelope, render(envelope, fields))
+                except Exception as e:
+                    engine.failed(attempt, e)
+                    continue
+                engine.delivered(attempt, refused)
+
+        await self._run_workers(engine, [worker() for _ in range(min(self.max_concurrency, total_recipients))])
+        return engine.report
+
+    async def _run_workers(self, engine: DeliveryEngine, coroutines: List):
+        workers = [asyncio.create_task(coroutine) for coroutine in coroutines]
+        try:
+            await asyncio.gather(*workers)
+        except Exception as e:
+            engine.abort(e)
+        finally:
+            for task in workers:
+                task.cancel()
+        if engine.error is not None:
+            raise RuntimeError(f"Failed to send emails. Error: {engine.error}")
+
+    async def send_individual_emails(
+        self,
+        recipients: List[str],
+        subject: str,
+        body: str,
+        attachment_path: str = None,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None
+    ) -> DeliveryReport:
+        """
+        Sends a separate email to each recipient with at most `max_concurrency` in flight.
+        The callbacks and the returned `DeliveryReport` follow the `EmailSender` contract,
+        except that the callbacks run on the event loop's thread.
+        """
+        total_recipients = len(recipients)
+        try:
+            template = await self.compile_message(subject, body, attachment_path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to build the email message. Error: {e}")
+
+        return await self._deliver(
+            (([recipient], None) for recipient in recipients),
+            total_recipients,
+            lambda envelope, fields: template.render(envelope[0]),
+            progress_callback,
+            failure_callback
+        )
+
+    async def send_envelope_batched_emails(
+        self,
+        recipients: List[str],
+        subject: str,
+        body: str,
+        attachment_path: str = None,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        envelope_size: int = 50
+    ) -> DeliveryReport:
+        """
+        Async counterpart of `EmailSender.send_envelope_batched_emails`: one transaction
+        per domain group of up to `envelope_size` recipients, each mailbox receiving a
+        private copy. aiosmtplib issues the envelope commands one after another, so the
+        saving here comes from the shared transaction rather than from pipelining.
+        """
+        total_recipients = len(recipients)
+        try:
+            template = await self.compile_message(subject, body, attachment_path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to build the email message. Error: {e}")
+
+        return await self._deliver(
+            ((group, None) for group in group_by_domain(recipients, max(1, envelope_size))),
+            total_recipients,
+            lambda envelope, fields: template.render(UNDISCLOSED_RECIPIENTS),
+            progress_callback,
+            failure_callback
+        )
+
+    async def send_merged_emails(
+        self,
+        recipients: Iterable[Tuple[str, Dict[str, str]]],
+        subject: str,
+        body: str,
+        attachment_path: str = None,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        total_recipients: Optional[int] = None
+    ) -> DeliveryReport:
+        """Async counterpart of `EmailSender.send_merged_emails`."""
+        if total_recipients is None:
+            total_recipients = len(recipients)
+        try:
+            template = await self.compile_merge_message(subject, body, attachment_path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to build the email message. Error: {e}")
+
+        return await self._deliver(
+            (([email], fields) for email, fields in recipients),
+            total_recipients,
+            lambda envelope, fields: template.render(envelope[0], fields),
+            progress_callback,
+            failure_callback
+        )
+
+    async def send_personalized_emails(
+        self,
+        drafts: AsyncIterator[Tuple[str, Union[Dict[str, str], Exception]]],
+        total_recipients: int,
+        attachment_path: str = None,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None
+    ) -> DeliveryReport:
+        """
+        Sends one individually written email per (recipient, {"subject", "body"}) draft,
+        starting as soon as the first draft arrives so delivery overlaps with generation.
+        A draft that is an exception marks its recipient as failed.
+        The callbacks follow the `send_individual_emails` contract.
+        """
+        workers = min(self.max_concurrency, total_recipients)
+        if not workers:
+            return DeliveryReport()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        engine = self._engine((), total_recipients, progress_callback, failure_callback)
+
+        async def pump():
+            try:
+                async for item in drafts:
+                    await queue.put(item)
+            finally:
+                if hasattr(drafts, "aclose"):
+                    await drafts.aclose()
+            for _ in range(workers):
+                await queue.put(None)
+
+        async def worker():
+            drained = False
+            while True:
+                # Due retries first, then new drafts as they are written.
+                attempt, wait = engine.next()
+                if attempt is None:
+                    if drained:
+                        if wait is None:
+                            return
+                        await asyncio.sleep(min(wait, 1.0))
+                        continue
+                    try:
+                        item = await asyncio.wait_for(queue.get(), wait) if wait is not None else await queue.get()
+                    except asyncio.TimeoutError:
+                        continue
+                    if item is None:
+                        drained = True
+                        continue
+                    recipient, draft = item
+                    attempt = ([recipient], draft, 0)
+                envelope, draft, _ = attempt
+                try:
+                    if isinstance(draft, Exception):
+                        raise draft
+                    template = await self.compile_message(draft["subject"], draft["body"], attachment_path)
+                    refused = await self._send_limited(envelope, template.render(envelope[0]))
+                except Exception as e:
+                    engine.failed(attempt, e)
+                    continue
+                engine.delivered(attempt, refused)
+
+        await self._run_workers(engine, [pump()] + [worker() for _ in range(workers)])
+        return engine.report
+
+
+class AsyncEmailSender(AsyncDelivery):
+    """
+    Asyncio counterpart of `EmailSender`, built on aiosmtplib.
+
+    SMTP I/O runs on the event loop instead of a worker thread. Up to `max_concurrency`
+    authenticated connections are kept open; a semaphore caps how many are in use at once.
+    """
+    def __init__(
+        self,
+        sender_email: str,
+        sender_password: str,
+        host: str = "smtp.gmail.com",
+        port: int = 465,
+        use_tls: bool = True,
+        max_concurrency: int = 4,
+        rate_limiter: Optional[SenderRateLimiter] = None,
+        max_throttle_retries: int = 5,
+        max_delivery_retries: int = 3,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0
+    ):
+        if not sender_email or not sender_password:
+            raise ValueError("Sender email and password must be provided.")
+
+        self.sender_email = sender_email
+        self._password = sender_password
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        super().__init__(max_concurrency, max_throttle_retries, max_delivery_retries, retry_delay, max_retry_delay)
+        self.rate_limiter = rate_limiter or get_rate_limiter(sender_email)
+        # yagmail is only used to compile messages; it never opens a connection here.
+        self._builder = yagmail.SMTP(sender_email, sender_password, host=host, port=port)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._open: List[aiosmtplib.SMTP] = []
+
+    async def _new_client(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(hostname=self.host, port=self.port, use_tls=self.use_tls)
+        with time_stage("smtp_connect"):
+            await client.connect()
+            await client.login(self.sender_email, self._password)
+        self._open.append(client)
+        return client
+
+    async def connect(self):
+        """Opens the first connection so bad credentials fail before any sending starts."""
+        try:
+            async with self._connection():
+                pass
+        except Exception as e:
+            raise ConnectionError(f"Failed to connect to SMTP server. Check your credentials. Error: {e}")
+
+    @asynccontextmanager
+    async def _connection(self):
+        async with self._semaphore:
+            client = self._idle.pop() if self._idle else await self._new_client()
+            try:
+                yield client
+            finally:
+                self._idle.append(client)
+
+    async def close(self):
+        clients, self._open, self._idle = self._open, [], []
+        for client in clients:
+            try:
+                await client.quit()
+            except Exception:
+                pass
+
+    async def compile_message(self, subject: str, body: str, attachment_path: str = None) -> MessageTemplate:
+        """
+        Renders and encodes the body once for a whole campaign; the attachment is encoded
+        once per sender. The MIME build runs in a thread, as personalized campaigns
+        compile one message per draft.
+        """
+        with time_stage("mime_build"):
+            attachment = await self._attachment(attachment_path)
+            return await asyncio.to_thread(MessageTemplate.from_yagmail, self._builder, subject, body, attachment)
+
+    async def compile_merge_message(self, subject: str, body: str, attachment_path: str = None) -> MergeMessageTemplate:
+        """Compiles a mail-merge message once; each copy is rendered from its recipient's fields."""
+        with time_stage("mime_build"):
+            attachment = await self._attachment(attachment_path)
+            return await asyncio.to_thread(MergeMessageTemplate.from_yagmail, self._builder, subject, body, attachment)
+
+    async def _send_limited(self, envelope: List[str], msg_string) -> dict:
+        """Returns the recipients the server refused, as {address: SMTPResponse}."""
+        attempts = 0
+        while True:
+            await self.rate_limiter.acquire_async(messages=1, recipients=len(envelope))
+            try:
+                async with self._connection() as client:
+                    if not client.is_connected:
+                        await client.connect()
+                        await client.login(self.sender_email, self._password)
+                    SENDS_IN_FLIGHT.inc()
+                    try:
+                        with time_stage("send"):
+                            try:
+                                refused, _ = await client.sendmail(self.sender_email, envelope, msg_string)
+                            except aiosmtplib.SMTPServerDisconnected:
+                                await client.connect()
+                                await client.login(self.sender_email, self._password)
+                                refused, _ = await client.sendmail(self.sender_email, envelope, msg_string)
+                    finally:
+                        SENDS_IN_FLIGHT.dec()
+            except Exception as e:
+                if is_throttle_error(e) and attempts < self.max_throttle_retries:
+                    attempts += 1
+                    self.rate_limiter.record_throttle()
+                    continue
+                raise
+            self.rate_limiter.record_success()
+            return refused
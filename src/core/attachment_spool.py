@@ -0,0 +1,205 @@
+# src/core/attachment_spool.py
+
+import os
+import re
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import IO, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_UNSAFE_CHARS = re.compile(r"[^\w.\- ()]+")
+REFS_DIR = ".refs"
+LOCKS_DIR = ".locks"
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """The client-supplied name reduced to a plain file name (no directories or odd characters)."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    name = _UNSAFE_CHARS.sub("_", name).lstrip(".")
+    return name[:200] or "attachment"
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on `path`, held against other processes as well as other threads."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after about 10 seconds; keep waiting.
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class AttachmentSpool:
+    """
+    Content-addressed storage for campaign attachments.
+
+    Uploads are streamed to disk in `chunk_size` pieces while being hashed, then
+    stored as `<directory>/<sha256>/<filename>`. Identical files are kept once across
+    campaigns (a second name for the same content is a hard link), and every
+    campaign using a file holds a reference, recorded as a marker file so that
+    several processes (API and workers) share the counts. Changes to a file's
+    references are serialized by a lock file that works across processes. The file
+    is deleted when its last reference is released.
+
+    References of campaigns that never complete (failed ones are kept for a resume)
+    expire `ttl` seconds after they were taken or last refreshed; `sweep` drops them.
+    """
+    def __init__(self, directory: str = ".automail_cache/attachments", chunk_size: int = 1 << 20, ttl: Optional[float] = None):
+        self.directory = os.path.abspath(directory)
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+
+    @contextmanager
+    def _locked(self, digest: str):
+        # One lock file per digest prefix: bounded in number, and outside the blob
+        # directories so removing a blob never removes a lock someone waits on.
+        locks = os.path.join(self.directory, LOCKS_DIR)
+        os.makedirs(locks, exist_ok=True)
+        with _file_lock(os.path.join(locks, f"{digest[:2]}.lock")):
+            yield
+
+    def store(self, source: IO[bytes], filename: str, owner: str) -> str:
+        """Streams `source` into the spool, takes a reference for `owner` and returns the stored path."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f".upload-{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    chunk = source.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+            return self._place(tmp_path, digest.hexdigest(), safe_filename(filename), owner)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _place(self, tmp_path: str, digest: str, filename: str, owner: str) -> str:
+        blob_dir = os.path.join(self.directory, digest)
+        path = os.path.join(blob_dir, filename)
+        with self._locked(digest):
+            # Reference first, so a concurrent release cannot remove the file we reuse.
+            os.makedirs(os.path.join(blob_dir, REFS_DIR), exist_ok=True)
+            open(os.path.join(blob_dir, REFS_DIR, owner), "a").close()
+            if os.path.exists(path):
+                return path
+            existing = next((entry.path for entry in os.scandir(blob_dir) if entry.is_file()), None)
+            if existing is not None:
+                try:
+                    os.link(existing, path)
+                    return path
+                except OSError:
+                    pass  # No hard links on this filesystem; keep the upload as its own copy.
+            os.replace(tmp_path, path)
+        return path
+
+    def owns(self, path: Optional[str]) -> bool:
+        return bool(path) and os.path.dirname(os.path.dirname(os.path.abspath(path))) == self.directory
+
+    def references(self, path: str) -> int:
+        try:
+            return len(os.listdir(os.path.join(os.path.dirname(path), REFS_DIR)))
+        except OSError:
+            return 0
+
+    def release(self, path: Optional[str], owner: str):
+        """Drops `owner`'s reference; the stored file goes once nothing references it."""
+        if not self.owns(path):
+            return
+        blob_dir = os.path.dirname(os.path.abspath(path))
+        with self._locked(os.path.basename(blob_dir)):
+            try:
+                os.remove(os.path.join(blob_dir, REFS_DIR, owner))
+            except FileNotFoundError:
+                return
+            if not self.references(path):
+                shutil.rmtree(blob_dir, ignore_errors=True)
+
+    def refresh(self, path: Optional[str], owner: str):
+        """Restarts the expiry of `owner`'s reference, e.g. when its campaign is resumed."""
+        if not self.owns(path):
+            return
+        try:
+            os.utime(os.path.join(os.path.dirname(os.path.abspath(path)), REFS_DIR, owner))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Drops references older than `ttl` (and uploads abandoned half-way), deleting
+        files left without references. Returns the number of references dropped.
+        """
+        if not self.ttl or not os.path.isdir(self.directory):
+            return 0
+        cutoff = (now if now is not None else time.time()) - self.ttl
+        dropped = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".upload-"):
+                # A concurrent store() may rename or remove its upload at any point.
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            with self._locked(entry.name):
+                refs = os.path.join(entry.path, REFS_DIR)
+                try:
+                    markers = list(os.scandir(refs))
+                except FileNotFoundError:
+                    markers = []
+                for marker in markers:
+                    try:
+                        if marker.stat().st_mtime < cutoff:
+                            os.remove(marker.path)
+                            dropped += 1
+                    except FileNotFoundError:
+                        pass
+                if not os.path.isdir(refs) or not os.listdir(refs):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+        return dropped
+
+
+_spools: Dict[str, AttachmentSpool] = {}
+_spools_lock = threading.Lock()
+
+
+def spool_from_env() -> AttachmentSpool:
+    """
+    The process's spool in ATTACHMENT_SPOOL_DIR (default `.automail_cache/attachments`),
+    with references expiring after ATTACHMENT_TTL seconds (default 7 days; 0 keeps them).
+    """
+    directory = os.path.abspath(os.getenv("ATTACHMENT_SPOOL_DIR", ".automail_cache/attachments"))
+    ttl = float(os.getenv("ATTACHMENT_TTL", str(7 * 24 * 60 * 60))) or None
+    with _spools_lock:
+        spool = _spools.get(directory)
+        if spool is None:
+            spool = _spools[directory] = AttachmentSpool(directory, ttl=ttl)
+        return spool
@@ -0,0 +1,92 @@
+# src/core/background_sends.py
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .delivery import DeliveryOutcome, DeliveryReport
+from .progress_store import ProgressStore
+
+# A send started in the background: called with (progress_callback, failure_callback).
+SendFunction = Callable[[Callable, Callable], DeliveryReport]
+
+
+class BackgroundSends:
+    """
+    Runs sends on a small thread pool instead of the caller's thread, for front ends
+    such as Streamlit whose script thread is restarted on every interaction.
+
+    Each send keeps a compact progress record (status, sent, total, failed, message)
+    in a `ProgressStore`, so the UI only polls that record. The undeliverable
+    recipients of the last `keep_failures` sends are kept for display.
+    """
+    def __init__(self, max_workers: int = 2, progress: Optional[ProgressStore] = None, keep_failures: int = 32):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="automail-send")
+        self.progress = progress if progress is not None else ProgressStore(max_entries=256)
+        self.keep_failures = keep_failures
+        self._failures: "OrderedDict[str, List[DeliveryOutcome]]" = OrderedDict()
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        send_id: str,
+        total: int,
+        send: SendFunction,
+        description: str = "Sending emails",
+        cleanup: Optional[Callable[[], None]] = None
+    ) -> str:
+        """Queues `send` and returns `send_id`; `cleanup` runs once the send has finished either way."""
+        self.progress.start(send_id, status="queued", sent=0, total=total, message="Waiting to start...", failed=0)
+        with self._lock:
+            self._failures[send_id] = []
+            while len(self._failures) > self.keep_failures:
+                self._failures.popitem(last=False)
+            self._futures[send_id] = self.executor.submit(self._run, send_id, send, description, cleanup)
+        return send_id
+
+    def _run(self, send_id: str, send: SendFunction, description: str, cleanup: Optional[Callable[[], None]]):
+        with self._lock:
+            failures = self._failures.get(send_id, [])
+
+        # Both callbacks are called from the sender's worker threads (see
+        # `EmailSender.send_individual_emails`); ProgressStore is thread-safe.
+        def report_progress(index, total, recipient):
+            sent = self.progress.increment(send_id)
+            self.progress.update(send_id, message=f"{description}: {sent}/{total}, last to {recipient}")
+
+        def report_failure(outcome: DeliveryOutcome):
+            with self._lock:
+                failures.append(outcome)
+            self.progress.increment(send_id, "failed")
+
+        self.progress.update(send_id, status="running", message=f"{description}...")
+        try:
+            delivery = send(report_progress, report_failure)
+            if delivery.ok:
+                message = f"All {delivery.sent} emails have been sent."
+            else:
+                message = f"Sent {delivery.sent} emails; {delivery.failed + delivery.deferred} could not be delivered."
+            self.progress.update(send_id, status="completed", sent=delivery.sent, message=message)
+        except Exception as e:
+            self.progress.update(send_id, status="failed", message=str(e))
+        finally:
+            with self._lock:
+                self._futures.pop(send_id, None)
+            if cleanup is not None:
+                cleanup()
+
+    def status(self, send_id: str) -> Optional[dict]:
+        return self.progress.get(send_id)
+
+    def failures(self, send_id: str) -> List[DeliveryOutcome]:
+        with self._lock:
+            return list(self._failures.get(send_id, ()))
+
+    def running(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,358 @@
+# src/core/campaign.py
+
+import os
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from .async_email_sender import AsyncDelivery, AsyncEmailSender
+from .ai_generator import GeminiEmailGenerator
+from .personalizer import Personalizer
+from .job_store import JobStore, SENT
+from .mail_merge import compile_template, has_placeholders
+from .rate_limiter import get_rate_limiter
+from .delivery import DeliveryOutcome, DeliveryReport
+from .attachment_spool import spool_from_env
+from .sender_pool import SenderAccount, SenderPool, load_accounts
+from .profiler import SamplingProfiler
+
+load_dotenv()
+
+# Sending engine configuration
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_SEND_RATE = float(os.getenv("SMTP_SEND_RATE", "5"))
+SMTP_SEND_BURST = float(os.getenv("SMTP_SEND_BURST", "10"))
+SMTP_DAILY_QUOTA = int(os.getenv("SMTP_DAILY_QUOTA", "0")) or None
+# Retries of recipients failing transiently (4xx replies, dropped connections)
+SMTP_DELIVERY_RETRIES = int(os.getenv("SMTP_DELIVERY_RETRIES", "3"))
+SMTP_RETRY_DELAY = float(os.getenv("SMTP_RETRY_DELAY", "5"))
+# Recipients per message in batch mode; servers commonly cap this at 100-500
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "100"))
+# Extra sender accounts or relays a campaign is spread over (JSON list or path to a JSON file)
+SENDER_ACCOUNTS = os.getenv("SENDER_ACCOUNTS", "")
+SENDER_POOL_STRATEGY = os.getenv("SENDER_POOL_STRATEGY", "least_loaded")
+# Recipients packed into one prompt in personalized mode
+AI_PERSONALIZE_BATCH = int(os.getenv("AI_PERSONALIZE_BATCH", "5"))
+
+# Sampled profiles of campaigns started with profiling on
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".automail_cache/profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+
+# Uploaded attachments, stored once per content and referenced by the campaigns using them
+attachment_spool = spool_from_env()
+logger = logging.getLogger(__name__)
+
+
+def _account_sender(sender_email: str, sender_password: str, **settings) -> AsyncEmailSender:
+    connection = {key: settings[key] for key in ("host", "port", "use_tls") if key in settings}
+    return AsyncEmailSender(
+        sender_email,
+        sender_password,
+        max_concurrency=settings.get("max_concurrency", SMTP_POOL_SIZE),
+        max_delivery_retries=SMTP_DELIVERY_RETRIES,
+        retry_delay=SMTP_RETRY_DELAY,
+        rate_limiter=get_rate_limiter(
+            sender_email,
+            rate=settings.get("rate", SMTP_SEND_RATE),
+            burst=settings.get("burst", SMTP_SEND_BURST),
+            daily_quota=settings.get("daily_quota", SMTP_DAILY_QUOTA)
+        ),
+        **connection
+    )
+
+
+def build_sender(sender_email: str, sender_password: str, accounts: Optional[str] = None) -> AsyncDelivery:
+    """
+    Creates an AsyncEmailSender wired to the shared, configured rate limiter. When
+    `accounts` (default: SENDER_ACCOUNTS) lists more accounts, returns a SenderPool
+    spreading the campaign over them and the given account.
+    """
+    sender = _account_sender(sender_email, sender_password)
+    extra = [
+        settings for settings in load_accounts(SENDER_ACCOUNTS if accounts is None else accounts)
+        if settings["email"].strip().lower() != sender_email.strip().lower()
+    ]
+    if not extra:
+        return sender
+    pool = [SenderAccount(sender)]
+    for settings in extra:
+        settings = dict(settings)
+        email, password, weight = settings.pop("email"), settings.pop("password"), settings.pop("weight", 1.0)
+        pool.append(SenderAccount(_account_sender(email, password, **settings), weight=weight))
+    return SenderPool(
+        pool,
+        strategy=SENDER_POOL_STRATEGY,
+        max_delivery_retries=SMTP_DELIVERY_RETRIES,
+        retry_delay=SMTP_RETRY_DELAY
+    )
+
+
+def finish_campaign(store: JobStore, task_id: str, status: str, message: str, attachment_path: Optional[str], report: Callable):
+    report(status=status, message=message)
+    store.set_status(task_id, status, message)
+    # Keep the attachment around while the campaign can still be resumed.
+    if status == "completed" and attachment_path:
+        if attachment_spool.owns(attachment_path):
+            attachment_spool.release(attachment_path, task_id)
+        elif os.path.exists(attachment_path):
+            os.remove(attachment_path)
+
+
+async def sweep_attachments():
+    """
+    Expires the attachment references of abandoned campaigns (files of failed ones
+    stay for a resume until then). Best effort: errors are logged, never raised.
+    """
+    try:
+        await asyncio.to_thread(attachment_spool.sweep)
+    except Exception:
+        logger.exception("Sweeping the attachment spool failed")
+
+
+def failure_recorder(recorder, report: Callable) -> Callable:
+    """`failure_callback` that records undeliverable recipients and counts them in the progress."""
+    counts = {"failed": 0, "deferred": 0}
+
+    def record_failure(outcome: DeliveryOutcome):
+        recorder.record(outcome.recipient, outcome.status, outcome.error)
+        counts[outcome.status] += 1
+        report(**counts)
+    return record_failure
+
+
+def delivery_result(delivery: DeliveryReport, success_message: str) -> Tuple[str, str]:
+    """Final status and message of a run that went through all of its recipients."""
+    if delivery.deferred:
+        # Not "completed": the deferred recipients are picked up again on resume.
+        return "failed", (
+            f"Sent {delivery.sent} emails, but {delivery.deferred} could not be delivered yet"
+            f" (last error: {delivery.last_error}). Resume the campaign to retry them."
+        )
+    if delivery.failed:
+        return "completed", (
+            f"Sent {delivery.sent} emails; the server rejected {delivery.failed} of the addresses"
+            f" (last error: {delivery.last_error})."
+        )
+    return "completed", success_message
+
+
+async def run_batch_email(
+    store: JobStore,
+    task_id: str,
+    sender: AsyncDelivery,
+    recipients: List[str],
+    subject: str,
+    body: str,
+    attachment_path: Optional[str],
+    report: Callable,
+    already_sent: int = 0
+):
+    """
+    Sends BCC-style copies in chunks of SMTP_BATCH_SIZE recipients and records the
+    outcome per recipient; progress also counts the chunks sent.
+    `report(**fields)` receives progress updates (status, sent, message).
+    """
+    recorder = store.recorder(task_id)
+    sent_chunks = set()
+    try:
+        def progress_callback(index, total, current_recipient):
+            recorder.record(current_recipient, SENT)
+            report(sent=already_sent + index + 1)
+
+        def chunk_callback(index, total_chunks, chunk):
+            sent_chunks.add(index)
+            report(
+                chunks_sent=len(sent_chunks),
+                chunks_total=total_chunks,
+                message=f"Sent chunk {len(sent_chunks)} of {total_chunks}"
+            )
+
+        delivery = await sender.send_batch_email(
+            recipients, subject, body, attachment_path,
+            chunk_size=SMTP_BATCH_SIZE,
+            progress_callback=progress_callback,
+            failure_callback=failure_recorder(recorder, report),
+            chunk_callback=chunk_callback
+        )
+        recorder.flush()
+        status, message = delivery_result(delivery, "Batch email sent successfully!")
+        finish_campaign(store, task_id, status, message, attachment_path, report)
+    except Exception as e:
+        recorder.flush()
+        finish_campaign(store, task_id, "failed", str(e), attachment_path, report)
+    finally:
+        await sender.close()
+
+
+async def run_individual_emails(
+    store: JobStore,
+    task_id: str,
+    sender: AsyncDelivery,
+    recipients: Iterable,
+    subject: str,
+    body: str,
+    attachment_path: Optional[str],
+    report: Callable,
+    already_sent: int = 0,
+    sending_mode: str = "individual",
+    total_recipients: Optional[int] = None
+):
+    """
+    Sends one email per recipient, recording each delivery in the job store.
+    In "envelope" mode the copies go out in per-domain, multi-recipient transactions.
+    When the subject or body has `{{field}}` placeholders, `recipients` are
+    (email, fields) pairs (possibly a lazy iterator of `total_recipients`) and each
+    copy is mail-merged from its recipient's fields instead.
+    """
+    recorder = store.recorder(task_id)
+    try:
+        def progress_callback(index, total, current_recipient):
+            recorder.record(current_recipient, SENT)
+            report(sent=already_sent + index + 1, message=f"Sent to {current_recipient}")
+
+        failure_callback = failure_recorder(recorder, report)
+        if has_placeholders(subject, body):
+            delivery = await sender.send_merged_emails(
+                recipients, subject, body, attachment_path,
+                progress_callback=progress_callback, failure_callback=failure_callback,
+                total_recipients=total_recipients
+            )
+        else:
+            send = sender.send_envelope_batched_emails if sending_mode == "envelope" else sender.send_individual_emails
+            delivery = await send(
+                recipients, subject, body, attachment_path,
+                progress_callback=progress_callback, failure_callback=failure_callback
+            )
+        recorder.flush()
+        status, message = delivery_result(delivery, "All emails sent successfully!")
+        finish_campaign(store, task_id, status, message, attachment_path, report)
+
+    except Exception as e:
+        recorder.flush()
+        finish_campaign(store, task_id, "failed", str(e), attachment_path, report)
+    finally:
+        await sender.close()
+
+
+async def run_personalized_emails(
+    store: JobStore,
+    task_id: str,
+    sender: AsyncDelivery,
+    generator: Optional[GeminiEmailGenerator],
+    recipients: List[Tuple[str, Dict[str, str]]],
+    subject: str,
+    body: str,
+    attachment_path: Optional[str],
+    report: Callable,
+    already_sent: int = 0
+):
+    """
+    Has the AI tailor the base subject and body to each recipient's CSV fields and
+    sends every draft as soon as it is written, recording each delivery.
+    """
+    recorder = store.recorder(task_id)
+    personalizer = None
+    try:
+        personalizer = Personalizer(generator or GeminiEmailGenerator(), batch_size=AI_PERSONALIZE_BATCH)
+
+        def progress_callback(index, total, current_recipient):
+            recorder.record(current_recipient, SENT)
+            report(
+                sent=already_sent + index + 1,
+                message=f"Sent to {current_recipient}",
+                personalization=personalizer.metrics.as_dict()
+            )
+
+        drafts = personalizer.stream(recipients, subject, body)
+        delivery = await sender.send_personalized_emails(
+            drafts, len(recipients), attachment_path,
+            progress_callback=progress_callback, failure_callback=failure_recorder(recorder, report)
+        )
+        recorder.flush()
+        metrics = personalizer.metrics
+        report(personalization=metrics.as_dict())
+        status, message = delivery_result(
+            delivery,
+            f"All emails sent successfully! Personalized {metrics.drafts} drafts at {metrics.drafts_per_second:.1f}/s."
+        )
+        finish_campaign(store, task_id, status, message, attachment_path, report)
+
+    except Exception as e:
+        recorder.flush()
+        if personalizer is not None:
+            report(personalization=personalizer.metrics.as_dict())
+        finish_campaign(store, task_id, "failed", str(e), attachment_path, report)
+    finally:
+        await sender.close()
+
+
+def profile_path(task_id: str) -> str:
+    """Where the sampled profile of a campaign run with `profile=True` is written."""
+    return os.path.join(PROFILE_DIR, f"{os.path.basename(task_id)}.collapsed")
+
+
+async def run_job(
+    store: JobStore,
+    job: dict,
+    sender: AsyncDelivery,
+    report: Callable,
+    generator: Optional[GeminiEmailGenerator] = None,
+    profile: bool = False
+):
+    """
+    Runs (or resumes) a stored job from its first unsent recipient. Personalized jobs
+    use `generator`, or a newly configured GeminiEmailGenerator when it is None.
+    With `profile`, the event loop is sampled while the job runs and the collapsed
+    stacks are written to `profile_path(job["id"])`.
+    """
+    attachment_spool.refresh(job["attachment_path"], job["id"])
+    if not profile:
+        await _run_job(store, job, sender, report, generator)
+    else:
+        profiler = SamplingProfiler(interval=PROFILE_INTERVAL).start()
+        try:
+            await _run_job(store, job, sender, report, generator)
+        finally:
+            profiler.stop()
+            path = profiler.dump(profile_path(job["id"]))
+            logger.info("Profile of campaign %s (%d samples) written to %s", job["id"], profiler.samples, path)
+    # Only once the campaign's outcome is stored, so housekeeping cannot change it.
+    await sweep_attachments()
+
+
+async def _run_job(
+    store: JobStore,
+    job: dict,
+    sender: AsyncDelivery,
+    report: Callable,
+    generator: Optional[GeminiEmailGenerator]
+):
+    if job["sending_mode"] == "personalized":
+        remaining = store.unsent_recipients(job["id"], with_fields=True)
+        await run_personalized_emails(
+            store, job["id"], sender, generator, remaining, job["subject"], job["body"], job["attachment_path"],
+            report, already_sent=job["sent"]
+        )
+        return
+
+    if job["sending_mode"] == "batch":
+        # One shared copy: placeholders can only take their defaults.
+        subject = compile_template(job["subject"]).render()
+        body = compile_template(job["body"]).render(escape=True)
+        await run_batch_email(
+            store, job["id"], sender, store.unsent_recipients(job["id"]), subject, body, job["attachment_path"], report,
+            already_sent=job["sent"]
+        )
+    elif has_placeholders(job["subject"], job["body"]):
+        # Mail merge renders each copy as it is sent, so stream recipients from the store.
+        await run_individual_emails(
+            store, job["id"], sender, store.iter_unsent(job["id"], with_fields=True),
+            job["subject"], job["body"], job["attachment_path"], report,
+            already_sent=job["sent"], total_recipients=store.count_unsent(job["id"])
+        )
+    else:
+        await run_individual_emails(
+            store, job["id"], sender, store.unsent_recipients(job["id"]), job["subject"], job["body"], job["attachment_path"], report,
+            already_sent=job["sent"], sending_mode=job["sending_mode"]
+        )
@@ -0,0 +1,120 @@
+# src/core/context_extractor.py
+
+import io
+import os
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .response_cache import ResponseCache, cache_key
+
+DEFAULT_MAX_CHARS = 20000
+DEFAULT_MAX_PAGES = 10
+
+
+def extract_pdf_text(data: bytes, max_chars: int = DEFAULT_MAX_CHARS, max_pages: int = DEFAULT_MAX_PAGES) -> str:
+    """
+    Extracts text page by page, stopping as soon as `max_pages` pages have been read
+    or `max_chars` characters collected, so the rest of the document is never parsed.
+    Runs in a worker process, hence a plain top-level function over bytes.
+    """
+    # Imported on first use: most processes never parse a PDF.
+    import pypdf
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    parts, size = [], 0
+    for number in range(min(len(reader.pages), max_pages)):
+        if size >= max_chars:
+            break
+        text = (reader.pages[number].extract_text() or "") + "\n"
+        parts.append(text)
+        size += len(text)
+    return "".join(parts)[:max_chars]
+
+
+def extract_plain_text(data: bytes, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    # Decoding a few bytes per character is enough; no need to decode a huge file whole.
+    return data[:max_chars * 4].decode("utf-8", errors="replace")[:max_chars]
+
+
+class ContextExtractor:
+    """
+    Turns an uploaded resume (PDF or plain text) into context text for the AI prompt.
+
+    Results are cached by a SHA-256 of the file's content, so regenerating a draft
+    with the same upload skips extraction entirely. PDFs are parsed in a pool of
+    `workers` processes (none: a worker thread) and only up to the page and
+    character budgets.
+    """
+    def __init__(
+        self,
+        max_chars: int = DEFAULT_MAX_CHARS,
+        max_pages: int = DEFAULT_MAX_PAGES,
+        workers: int = 1,
+        cache: Optional[ResponseCache] = None
+    ):
+        self.max_chars = max(1, int(max_chars))
+        self.max_pages = max(1, int(max_pages))
+        self.workers = max(0, int(workers))
+        self.cache = cache if cache is not None else ResponseCache(max_entries=32)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _cache_key(self, data: bytes, kind: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        return cache_key("context", kind, digest, str(self.max_chars), str(self.max_pages))
+
+    @staticmethod
+    def _kind(filename: str) -> Optional[str]:
+        name = (filename or "").lower()
+        if name.endswith(".pdf"):
+            return "pdf"
+        if name.endswith(".txt"):
+            return "txt"
+        return None
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def extract(self, data: bytes, filename: str) -> str:
+        """Context text for an upload; empty for unsupported file types."""
+        kind = self._kind(filename)
+        if kind is None:
+            return ""
+        if kind == "txt":
+            compute = lambda: extract_plain_text(data, self.max_chars)
+        else:
+            compute = lambda: extract_pdf_text(data, self.max_chars, self.max_pages)
+        return self.cache.get_or_compute(self._cache_key(data, kind), compute)
+
+    async def extract_async(self, data: bytes, filename: str) -> str:
+        """`extract` for the event loop: PDF parsing runs in the process pool."""
+        kind = self._kind(filename)
+        if kind is None:
+            return ""
+        if kind == "txt":
+            async def compute():
+                return extract_plain_text(data, self.max_chars)
+        else:
+            async def compute():
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._executor(), extract_pdf_text, data, self.max_chars, self.max_pages
+                )
+        return await self.cache.aget_or_compute(self._cache_key(data, kind), compute)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def extractor_from_env() -> ContextExtractor:
+    """Builds the extractor from CONTEXT_MAX_CHARS, CONTEXT_MAX_PAGES and CONTEXT_WORKERS."""
+    return ContextExtractor(
+        max_chars=int(os.getenv("CONTEXT_MAX_CHARS", str(DEFAULT_MAX_CHARS))),
+        max_pages=int(os.getenv("CONTEXT_MAX_PAGES", str(DEFAULT_MAX_PAGES))),
+        workers=int(os.getenv("CONTEXT_WORKERS", "1"))
+    )
@@ -0,0 +1,269 @@
+# src/core/delivery.py
+
+import time
+import heapq
+import random
+import smtplib
+import weakref
+import threading
+import aiosmtplib
+from itertools import count
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .job_store import FAILED, DEFERRED
+from .rate_limiter import DailyQuotaExceeded, _reply_code
+from .metrics import REGISTRY, DELIVERY_FAILURES, DELIVERY_RETRIES, record_sent
+
+# Failure classes: permanent failures are never retried, transient ones are.
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+
+# An envelope to send: (recipients, merge fields or AI draft, attempts made so far).
+Attempt = Tuple[List[str], Optional[dict], int]
+
+_DISCONNECTS = (
+    smtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError
+)
+
+
+def is_sender_error(error: Exception) -> bool:
+    """Failures of the sending account itself, which would fail every recipient alike."""
+    if isinstance(error, (DailyQuotaExceeded, smtplib.SMTPAuthenticationError, aiosmtplib.SMTPAuthenticationError)):
+        return True
+    if isinstance(error, (smtplib.SMTPSenderRefused, aiosmtplib.SMTPSenderRefused)):
+        code = _reply_code(error)
+        return code is not None and code >= 500
+    return False
+
+
+def classify_failure(error: Optional[Exception] = None, code: Optional[int] = None) -> str:
+    """
+    TRANSIENT for 4xx replies, dropped connections and timeouts; PERMANENT for 5xx
+    replies and anything else (a retry would fail the same way).
+    """
+    if code is None and error is not None:
+        code = _reply_code(error)
+    if code is not None:
+        return TRANSIENT if 400 <= code < 500 else PERMANENT
+    if isinstance(error, _DISCONNECTS):
+        return TRANSIENT
+    if isinstance(error, (smtplib.SMTPException, aiosmtplib.SMTPException)):
+        # smtplib errors are OSErrors too; without a reply code they are protocol problems.
+        return PERMANENT
+    if isinstance(error, (ConnectionError, TimeoutError, OSError)):
+        return TRANSIENT
+    return PERMANENT
+
+
+def _reply(reply) -> Tuple[Optional[int], str]:
+    # smtplib reports refusals as (code, message), aiosmtplib as SMTPResponse objects.
+    if isinstance(reply, tuple):
+        code, message = reply
+    else:
+        code, message = getattr(reply, "code", None), getattr(reply, "message", reply)
+    if isinstance(message, bytes):
+        message = message.decode("utf-8", errors="replace")
+    return code, str(message)
+
+
+def refused_by(error: Exception) -> Dict[str, Tuple[Optional[int], str]]:
+    """{recipient: (code, message)} for an error refusing every recipient of an envelope."""
+    recipients = getattr(error, "recipients", None)
+    if isinstance(recipients, dict):
+        return {recipient: _reply(reply) for recipient, reply in recipients.items()}
+    if isinstance(recipients, list):
+        return {item.recipient: (item.code, item.message) for item in recipients if hasattr(item, "recipient")}
+    return {}
+
+
+class DeliveryOutcome:
+    """Final result for a recipient that could not be delivered."""
+    __slots__ = ("recipient", "status", "error", "attempts")
+
+    def __init__(self, recipient: str, status: str, error: str, attempts: int):
+        self.recipient = recipient
+        self.status = status
+        self.error = error
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"DeliveryOutcome({self.recipient!r}, {self.status!r}, {self.error!r}, attempts={self.attempts})"
+
+
+class DeliveryReport:
+    """Counts of a finished delivery run."""
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.deferred = 0
+        self.retries = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.deferred
+
+    def as_dict(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed, "deferred": self.deferred, "retries": self.retries}
+
+
+# Schedulers of the runs in progress, for the retry queue depth gauge.
+_schedulers: "weakref.WeakSet[RetryScheduler]" = weakref.WeakSet()
+REGISTRY.gauge(
+    "automail_retry_queue_depth", "Envelopes waiting for a delivery retry.",
+    function=lambda: sum(len(scheduler) for scheduler in list(_schedulers))
+)
+
+
+class RetryScheduler:
+    """
+    Priority queue of envelopes waiting for a retry, ordered by when they are due.
+    The n-th retry waits `base_delay * 2**(n-1)` seconds (at most `max_delay`), with
+    jitter so retries from many failures do not arrive in lockstep.
+    """
+    def __init__(self, base_delay: float = 5.0, max_delay: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Attempt]] = []
+        self._order = count()
+        _schedulers.add(self)
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def schedule(self, attempt: Attempt) -> float:
+        delay = self.backoff(attempt[2])
+        heapq.heappush(self._heap, (self.clock() + delay, next(self._order), attempt))
+        return delay
+
+    def pop_due(self) -> Optional[Attempt]:
+        if self._heap and self._heap[0][0] <= self.clock():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def wait_time(self) -> Optional[float]:
+        """Seconds until the next retry is due, or None when nothing is scheduled."""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class DeliveryEngine:
+    """
+    Bookkeeping for one delivery run, shared by the sync and async senders' workers.
+
+    Workers take envelopes from `next()` (due retries first, then new envelopes) and
+    report each one back through `delivered` or `failed`. Refused recipients and
+    failed envelopes are classified: transient failures are retried up to
+    `max_retries` times on the `scheduler`'s backoff, while the rest of the list keeps
+    going; recipients that still fail end as FAILED (permanent) or DEFERRED (left for
+    a resume) and are passed to `failure_callback(outcome)`. Only errors of the
+    sending account itself stop the run, recorded in `error`. Thread-safe.
+
+    `envelope_callback(envelope, fields)` is called once per envelope that went out.
+    """
+    def __init__(
+        self,
+        envelopes: Iterable[Tuple[List[str], Optional[dict]]],
+        total_recipients: int,
+        progress_callback: Optional[Callable] = None,
+        failure_callback: Optional[Callable] = None,
+        max_retries: int = 3,
+        scheduler: Optional[RetryScheduler] = None,
+        envelope_callback: Optional[Callable] = None
+    ):
+        self._pending = iter(envelopes)
+        self._exhausted = False
+        self.total_recipients = total_recipients
+        self.progress_callback = progress_callback
+        self.failure_callback = failure_callback
+        self.envelope_callback = envelope_callback
+        self.max_retries = max_retries
+        self.scheduler = scheduler if scheduler is not None else RetryScheduler()
+        self.report = DeliveryReport()
+        self.error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def next(self) -> Tuple[Optional[Attempt], Optional[float]]:
+        """
+        Returns (attempt, None) for the next envelope to send, (None, seconds) while
+        only retries that are not yet due remain, and (None, None) when done.
+        """
+        with self._lock:
+            if self.error is not None:
+                return None, None
+            attempt = self.scheduler.pop_due()
+            if attempt is not None:
+                return attempt, None
+            if not self._exhausted:
+                item = next(self._pending, None)
+                if item is not None:
+                    envelope, fields = item
+                    return (envelope, fields, 0), None
+                self._exhausted = True
+            return None, self.scheduler.wait_time()
+
+    def delivered(self, attempt: Attempt, refused: Optional[dict] = None):
+        """Records a sent envelope; `refused` maps the recipients the server turned down to their replies."""
+        envelope, fields, attempts = attempt
+        refused = refused or {}
+        with self._lock:
+            for recipient in envelope:
+                if recipient in refused:
+                    continue
+                index = self.report.sent
+                self.report.sent += 1
+                if self.progress_callback:
+                    self.progress_callback(index, self.total_recipients, recipient)
+            record_sent(len(envelope) - len(refused))
+            if self.envelope_callback and len(refused) < len(envelope):
+                self.envelope_callback(envelope, fields)
+        for recipient, reply in refused.items():
+            code, message = _reply(reply)
+            self._settle([recipient], fields, attempts, classify_failure(code=code), f"({code}, {message!r})")
+
+    def failed(self, attempt: Attempt, error: Exception):
+        """Records an envelope whose send raised `error`."""
+        envelope, fields, attempts = attempt
+        if is_sender_error(error):
+            self.abort(error)
+            return
+        refused = refused_by(error)
+        if refused:
+            for recipient, (code, message) in refused.items():
+                self._settle([recipient], fields, attempts, classify_failure(code=code), f"({code}, {message!r})")
+        else:
+            self._settle(envelope, fields, attempts, classify_failure(error), str(error))
+
+    def abort(self, error: Exception):
+        """Stops the run; envelopes not yet reported stay unsent."""
+        with self._lock:
+            if self.error is None:
+                self.error = error
+
+    def _settle(self, envelope: List[str], fields: Optional[dict], attempts: int, kind: str, error: str):
+        if kind == TRANSIENT and attempts < self.max_retries:
+            with self._lock:
+                self.scheduler.schedule((envelope, fields, attempts + 1))
+                self.report.retries += 1
+            DELIVERY_RETRIES.inc()
+            return
+        status = DEFERRED if kind == TRANSIENT else FAILED
+        for recipient in envelope:
+            with self._lock:
+                if status == FAILED:
+                    self.report.failed += 1
+                else:
+                    self.report.deferred += 1
+                self.report.last_error = f"{recipient}: {error}"
+            DELIVERY_FAILURES.inc(status=status)
+            if self.failure_callback:
+                self.failure_callback(DeliveryOutcome(recipient, status, error, attempts + 1))
@@ -1,54 +1,328 @@
 # src/core/email_sender.py
 
-import yagmail
 import time
-from typing import List, Callable
+import yagmail
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Callable, Optional, Tuple
+
+from .smtp_pool import PooledConnection, SMTPConnectionPool
+from .rate_limiter import SenderRateLimiter, get_rate_limiter, is_throttle_error
+from .message_builder import MessageTemplate, MergeMessageTemplate, UNDISCLOSED_RECIPIENTS
+from .pipelining import group_by_domain
+from .delivery import DeliveryEngine, DeliveryReport, RetryScheduler
+from .metrics import SENDS_IN_FLIGHT, time_stage
 
 class EmailSender:
-    def __init__(self, sender_email: str, sender_password: str):
+    def __init__(
+        self,
+        sender_email: str,
+        sender_password: str,
+        max_workers: int = 4,
+        rate_per_connection: Optional[float] = None,
+        rate_limiter: Optional[SenderRateLimiter] = None,
+        max_throttle_retries: int = 5,
+        max_delivery_retries: int = 3,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0
+    ):
+        """
+        Args:
+            sender_email (str): The account used to authenticate and send.
+            sender_password (str): The account's (app) password.
+            max_workers (int): Number of concurrent SMTP connections / sending workers.
+            rate_per_connection (float): Maximum messages per second on each connection.
+                `None` disables the per-connection limit.
+            rate_limiter (SenderRateLimiter): Account-wide rate limiter. Defaults to the
+                process-wide limiter registered for `sender_email`.
+            max_throttle_retries (int): How many times a message is retried after the
+                server throttles the account (a 421, 451 or 454 reply; see
+                `rate_limiter.THROTTLE_CODES`).
+            max_delivery_retries (int): How many times a recipient that still fails
+                transiently is rescheduled before it is left for a resume.
+            retry_delay (float): Seconds before the first rescheduled attempt; doubles on
+                each further attempt, up to `max_retry_delay`.
+        """
         if not sender_email or not sender_password:
             raise ValueError("Sender email and password must be provided.")
-        
+
+        self.max_workers = max(1, int(max_workers))
+        self.max_throttle_retries = max_throttle_retries
+        self.max_delivery_retries = max_delivery_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.rate_limiter = rate_limiter or get_rate_limiter(sender_email)
+        self.sender_email = sender_email
+        self._password = sender_password
+        # Only used to compile messages; it never opens a connection.
+        self._builder = yagmail.SMTP(sender_email, sender_password)
+        self.pool = SMTPConnectionPool(
+            lambda: yagmail.SMTP(sender_email, self._password),
+            size=self.max_workers,
+            rate_per_connection=rate_per_connection
+        )
         try:
-            self.yag = yagmail.SMTP(sender_email, sender_password)
+            # Open one connection up front so bad credentials fail fast.
+            self.pool.warm_up(1)
         except Exception as e:
             raise ConnectionError(f"Failed to connect to SMTP server. Check your credentials. Error: {e}")
 
-    def send_batch_email(self, recipients: List[str], subject: str, body: str, attachment_path: str = None):
+    def login(self, sender_password: str):
+        """
+        Switches the sender to `sender_password` if it changed, after checking it on a
+        fresh connection. Sessions already open stay logged in; every connection
+        opened from now on uses the new password.
+        """
+        if sender_password == self._password:
+            return
+        check = PooledConnection(lambda: yagmail.SMTP(self.sender_email, sender_password))
         try:
-            self.yag.send(
-                to=recipients,
-                subject=subject,
-                contents=body,
-                attachments=attachment_path
-            )
+            check.connect()
+        except Exception as e:
+            raise ConnectionError(f"Failed to connect to SMTP server. Check your credentials. Error: {e}")
+        finally:
+            check.close()
+        self._password = sender_password
+
+    def close(self):
+        self.pool.close()
+
+    def compile_message(self, subject: str, body: str, attachment_path: str = None) -> MessageTemplate:
+        """Renders and encodes the body and attachment once for a whole campaign."""
+        with time_stage("mime_build"):
+            return MessageTemplate.from_yagmail(self._builder, subject, body, attachment_path)
+
+    def _send_limited(self, conn, envelope: List[str], msg_string, pipelined: bool = False) -> dict:
+        """
+        Sends one prepared message through the rate limiter, backing off on throttling replies.
+        Returns the recipients the server refused, as {address: (code, message)}.
+        """
+        attempts = 0
+        while True:
+            self.rate_limiter.acquire(messages=1, recipients=len(envelope))
+            SENDS_IN_FLIGHT.inc()
+            try:
+                with time_stage("send"):
+                    refused = conn.sendmail(envelope, msg_string, pipelined=pipelined)
+            except Exception as e:
+                if is_throttle_error(e) and attempts < self.max_throttle_retries:
+                    attempts += 1
+                    self.rate_limiter.record_throttle()
+                    continue
+                raise
+            finally:
+                SENDS_IN_FLIGHT.dec()
+            self.rate_limiter.record_success()
+            return refused or {}
+
+    def send_batch_email(
+        self,
+        recipients: List[str],
+        subject: str,
+        body: str,
+        attachment_path: str = None,
+        chunk_size: int = 100,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        chunk_callback: Callable = None
+    ) -> DeliveryReport:
+        """
+        Sends one BCC-style copy per chunk of up to `chunk_size` recipients: they are
+        only on the envelope, and the message is addressed to "undisclosed-recipients".
+        Chunks stay under servers' per-message recipient limits and go out in parallel
+        over the connection pool, and a chunk that fails is retried on its own.
+        `chunk_callback(index, total_chunks, chunk)` is called when a chunk has been
+        sent (again for recipients of it that needed a retry); the other callbacks
+        and the returned `DeliveryReport` follow `send_individual_emails`.
+        """
+        recipients = list(recipients)
+        if not recipients:
+            return DeliveryReport()
+        chunk_size = max(1, int(chunk_size))
+        chunks = [recipients[i:i + chunk_size] for i in range(0, len(recipients), chunk_size)]
+        try:
+            template = self.compile_message(subject, body, attachment_path)
         except Exception as e:
             raise RuntimeError(f"An error occurred while sending the batch email: {e}")
 
+        envelope_callback = None
+        if chunk_callback:
+            envelope_callback = lambda envelope, fields: chunk_callback(fields["chunk"], len(chunks), envelope)
+        return self._deliver(
+            ((chunk, {"chunk": index}) for index, chunk in enumerate(chunks)),
+            len(recipients),
+            lambda envelope, fields: template.render(UNDISCLOSED_RECIPIENTS),
+            progress_callback,
+            failure_callback,
+            envelope_callback,
+            pipelined=True
+        )
+
+    def _deliver(
+        self,
+        envelopes: Iterable[Tuple[List[str], Optional[Dict[str, str]]]],
+        total_recipients: int,
+        render: Callable,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        envelope_callback: Callable = None,
+        pipelined: bool = False
+    ) -> DeliveryReport:
+        """
+        Sends `render(envelope, fields)` for every (envelope, fields) pair, spread across
+        the connection pool. A failing recipient does not stop the others: transient
+        failures are retried with backoff, and recipients that cannot be delivered are
+        passed to `failure_callback(outcome)`. Only a failure of the sending account
+        itself stops the run, raised as a RuntimeError.
+        `envelope_callback(envelope, fields)` is called for every envelope sent.
+        """
+        engine = DeliveryEngine(
+            envelopes, total_recipients, progress_callback, failure_callback,
+            max_retries=self.max_delivery_retries,
+            scheduler=RetryScheduler(self.retry_delay, self.max_retry_delay),
+            envelope_callback=envelope_callback
+        )
+
+        def worker():
+            with self.pool.connection() as conn:
+                while True:
+                    attempt, wait = engine.next()
+                    if attempt is None:
+                        if wait is None:
+                            return
+                        # Poll, as another worker may schedule an earlier retry meanwhile.
+                        time.sleep(min(wait, 1.0))
+                        continue
+                    envelope, fields, _ = attempt
+                    try:
+                        refused = self._send_limited(conn, envelope, render(envelope, fields), pipelined=pipelined)
+                    except Exception as e:
+                        engine.failed(attempt, e)
+                        continue
+                    engine.delivered(attempt, refused)
+
+        workers = min(self.max_workers, total_recipients)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email-sender") as executor:
+            futures = [executor.submit(worker) for _ in range(workers)]
+            for future in futures:
+                exc = future.exception()
+                if exc is not None:
+                    engine.abort(exc)
+
+        if engine.error is not None:
+            raise RuntimeError(f"Failed to send emails. Error: {engine.error}")
+        return engine.report
+
     def send_individual_emails(
-        self, 
-        recipients: List[str], 
-        subject: str, 
-        body: str, 
+        self,
+        recipients: List[str],
+        subject: str,
+        body: str,
         attachment_path: str = None,
-        progress_callback: Callable = None
-    ):
+        progress_callback: Callable = None,
+        failure_callback: Callable = None
+    ) -> DeliveryReport:
+        """
+        Sends a separate email to each recipient, spread across the connection pool.
+
+        `progress_callback(index, total, recipient)` is called once per delivered email,
+        with `index + 1` equal to the number of emails sent so far.
+        `failure_callback(outcome)` receives a `DeliveryOutcome` for every recipient that
+        could not be delivered; the returned `DeliveryReport` has the totals.
+
+        Unlike the old one-by-one sender, which reported each recipient before sending
+        to it, progress is reported after delivery, in completion order, and both
+        callbacks run on the pool's worker threads. Progress calls never overlap, but
+        failure calls may run alongside them, so callbacks must be thread-safe and must
+        not touch UI objects bound to the caller's thread (see `BackgroundSends`).
+        """
         total_recipients = len(recipients)
-        for i, recipient in enumerate(recipients):
-            try:
-                if progress_callback:
-                    progress_callback(i, total_recipients, recipient)
-
-                self.yag.send(
-                    to=recipient,
-                    subject=subject,
-                    contents=body,
-                    attachments=attachment_path
-                )
-                
-                if i < total_recipients - 1:
-                    time.sleep(1)
+        if not total_recipients:
+            return DeliveryReport()
 
-            except Exception as e:
-                raise RuntimeError(f"Failed to send email to {recipient}. Error: {e}")
+        try:
+            template = self.compile_message(subject, body, attachment_path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to build the email message. Error: {e}")
+
+        return self._deliver(
+            (([recipient], None) for recipient in recipients),
+            total_recipients,
+            lambda envelope, fields: template.render(envelope[0]),
+            progress_callback,
+            failure_callback
+        )
+
+    def send_envelope_batched_emails(
+        self,
+        recipients: List[str],
+        subject: str,
+        body: str,
+        attachment_path: str = None,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        envelope_size: int = 50
+    ) -> DeliveryReport:
+        """
+        Delivers a private copy to each recipient using far fewer SMTP transactions.
+
+        Recipients are grouped by domain and each group is sent as one transaction with
+        up to `envelope_size` RCPT TO commands, pipelined (RFC 2920) when the server
+        supports it. Every mailbox receives its own copy addressed to
+        "undisclosed-recipients", so no recipient can see the others.
+        The callbacks follow the `send_individual_emails` contract.
+        """
+        total_recipients = len(recipients)
+        if not total_recipients:
+            return DeliveryReport()
+
+        try:
+            template = self.compile_message(subject, body, attachment_path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to build the email message. Error: {e}")
+
+        return self._deliver(
+            ((group, None) for group in group_by_domain(recipients, max(1, envelope_size))),
+            total_recipients,
+            lambda envelope, fields: template.render(UNDISCLOSED_RECIPIENTS),
+            progress_callback,
+            failure_callback,
+            pipelined=True
+        )
+
+    def send_merged_emails(
+        self,
+        recipients: Iterable[Tuple[str, Dict[str, str]]],
+        subject: str,
+        body: str,
+        attachment_path: str = None,
+        progress_callback: Callable = None,
+        failure_callback: Callable = None,
+        total_recipients: Optional[int] = None
+    ) -> DeliveryReport:
+        """
+        Mail merge: sends each (email, fields) recipient its own copy with `{{field}}`
+        placeholders in the subject and body filled from its fields (e.g. CSV columns).
+
+        The message is compiled once; each copy is rendered only when it is sent, so
+        `recipients` may be a lazy iterator over millions of rows. Pass
+        `total_recipients` when it has no `len()`.
+        The callbacks follow the `send_individual_emails` contract.
+        """
+        if total_recipients is None:
+            total_recipients = len(recipients)
+        if not total_recipients:
+            return DeliveryReport()
+
+        try:
+            with time_stage("mime_build"):
+                template = MergeMessageTemplate.from_yagmail(self._builder, subject, body, attachment_path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to build the email message. Error: {e}")
 
+        return self._deliver(
+            (([email], fields) for email, fields in recipients),
+            total_recipients,
+            lambda envelope, fields: template.render(envelope[0], fields),
+            progress_callback,
+            failure_callback
+        )
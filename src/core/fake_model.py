@@ -0,0 +1,62 @@
+# src/core/fake_model.py
+
+import json
+import time
+import asyncio
+import threading
+from typing import Callable, Optional
+
+
+def fake_reply(prompt: str) -> str:
+    """
+    Canned reply for a prompt: a JSON array with one "Hello <name>" draft per recipient
+    for personalization batch prompts, otherwise a single fixed draft.
+    """
+    start, end = prompt.find("<recipients>"), prompt.find("</recipients>")
+    if start != -1 and end != -1:
+        recipients = json.loads(prompt[start + len("<recipients>"):end])
+        return json.dumps([
+            {
+                "id": r["id"],
+                "subject": f"A note for {r.get('company') or r['email']}",
+                "body": f"<p>Hello {r.get('name') or r['email']},</p><p>This draft was generated offline.</p>"
+            }
+            for r in recipients
+        ])
+    return json.dumps({
+        "subject": "Draft from the local model",
+        "body": "<p>Hello,</p><p>This draft was generated offline.</p>"
+    })
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Local stand-in for `genai.GenerativeModel`, for tests and offline development.
+
+    Answers `generate_content(prompt)` with `respond(prompt)` (by default a fixed draft)
+    after an optional `latency`, and counts the calls it receives.
+    """
+    def __init__(self, respond: Optional[Callable[[str], str]] = None, latency: float = 0.0):
+        self.respond = respond or fake_reply
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeResponse(self.respond(prompt))
+
+    async def generate_content_async(self, prompt: str) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeResponse(self.respond(prompt))
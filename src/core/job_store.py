@@ -0,0 +1,463 @@
+# src/core/job_store.py
+
+import os
+import json
+import base64
+import hashlib
+import sqlite3
+import threading
+import time
+import uuid
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# A recipient is an address, or (address, fields) where fields holds extra CSV columns.
+Recipient = Union[str, Tuple[str, Dict[str, str]]]
+
+# Recipient delivery states
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+DEFERRED = "deferred"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    sender_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    sending_mode TEXT NOT NULL,
+    attachment_path TEXT,
+    status TEXT NOT NULL,
+    message TEXT,
+    total INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS recipient_lists (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recipient_list_members (
+    list_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    fields TEXT,
+    PRIMARY KEY (list_id, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS job_credentials (
+    job_id TEXT PRIMARY KEY,
+    sender_password TEXT NOT NULL,
+    created_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS recipients (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    updated_at REAL,
+    fields TEXT,
+    PRIMARY KEY (job_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS recipients_by_email ON recipients (job_id, email);
+CREATE INDEX IF NOT EXISTS recipients_by_state ON recipients (job_id, state);
+"""
+
+
+def _encode_recipient(recipient: Recipient) -> Tuple[str, Optional[str]]:
+    if isinstance(recipient, tuple):
+        email, fields = recipient
+        return email, json.dumps(fields, separators=(",", ":")) if fields else None
+    return recipient, None
+
+
+def _decode_recipient(email: str, fields: Optional[str], with_fields: bool) -> Recipient:
+    if not with_fields:
+        return email
+    return email, json.loads(fields) if fields else {}
+
+
+class RecipientStateRecorder:
+    """
+    Buffers per-recipient state changes and writes them in batched transactions,
+    so a 100k-recipient campaign costs a few hundred commits instead of 100k.
+    """
+    def __init__(self, store: "JobStore", job_id: str, flush_every: int = 500, flush_interval: float = 1.0):
+        self._store = store
+        self.job_id = job_id
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._buffer: List[Tuple[str, str, Optional[str]]] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, email: str, state: str, error: Optional[str] = None):
+        with self._lock:
+            self._buffer.append((email, state, error))
+            due = (
+                len(self._buffer) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if batch:
+            self._store._apply_states(self.job_id, batch)
+
+
+_ENCRYPTED_PREFIX = "fernet:"
+
+
+class CredentialCipher:
+    """
+    Encrypts queued sender passwords with a key derived from `secret` (Fernet:
+    AES-128-CBC with an HMAC). Needs the `cryptography` package.
+    """
+    def __init__(self, secret: str):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            raise RuntimeError("JOB_CREDENTIALS_KEY is set, but the 'cryptography' package is not installed.")
+        self._fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret.encode("utf-8")).digest()))
+
+    def encrypt(self, password: str) -> str:
+        return _ENCRYPTED_PREFIX + self._fernet.encrypt(password.encode("utf-8")).decode("ascii")
+
+    def decrypt(self, stored: str) -> Optional[str]:
+        """The password, or None if it was encrypted with another key."""
+        from cryptography.fernet import InvalidToken
+        try:
+            return self._fernet.decrypt(stored[len(_ENCRYPTED_PREFIX):].encode("ascii")).decode("utf-8")
+        except InvalidToken:
+            return None
+
+
+class JobStore:
+    """
+    Persistent campaign store backed by SQLite in WAL mode. Records each job and the
+    delivery state of every recipient so campaigns survive restarts and can be resumed.
+
+    Passwords of queued jobs are the only secret it holds. A new database file is
+    created readable by its owner only. With `credentials_key` (default:
+    JOB_CREDENTIALS_KEY) the passwords are encrypted. Passwords left behind, for
+    example by a worker that died, are purged `credentials_ttl` seconds (default:
+    JOB_CREDENTIALS_TTL, one day) after they were queued.
+    """
+    def __init__(
+        self,
+        path: str = "automail_jobs.db",
+        credentials_key: Optional[str] = None,
+        credentials_ttl: Optional[float] = None
+    ):
+        self.path = path
+        if credentials_key is None:
+            credentials_key = os.getenv("JOB_CREDENTIALS_KEY") or None
+        self._cipher = CredentialCipher(credentials_key) if credentials_key else None
+        if credentials_ttl is None:
+            credentials_ttl = float(os.getenv("JOB_CREDENTIALS_TTL", str(24 * 60 * 60)))
+        self.credentials_ttl = credentials_ttl
+        if path != ":memory:" and not os.path.exists(path):
+            # SQLite gives the -wal and -shm files the database file's permissions.
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self.purge_credentials()
+
+    def _migrate(self):
+        for table, column, kind in (
+            ("jobs", "worker", "TEXT"),
+            ("recipients", "fields", "TEXT"),
+            ("recipient_list_members", "fields", "TEXT"),
+            ("job_credentials", "created_at", "REAL NOT NULL DEFAULT 0")
+        ):
+            columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            if columns and column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def create_job(
+        self,
+        job_id: str,
+        sender_email: str,
+        subject: str,
+        body: str,
+        sending_mode: str,
+        recipients: Iterable[Recipient],
+        attachment_path: Optional[str] = None,
+        status: str = "running",
+        chunk_size: int = 10000
+    ) -> int:
+        """
+        Stores a new job and its recipients (all pending). Recipients may carry extra
+        fields as (email, fields) pairs. Returns the recipient count.
+
+        Each chunk of recipients is committed on its own, so other threads can use the
+        store while a large upload is streamed in. The job row is written last, which
+        keeps a half-stored job invisible to workers.
+        """
+        now = time.time()
+        try:
+            total = self._insert_chunks(
+                "INSERT INTO recipients (job_id, idx, email, fields) VALUES (?, ?, ?, ?)", job_id, recipients, chunk_size
+            )
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, sender_email, subject, body, sending_mode, attachment_path,"
+                    " status, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, sender_email, subject, body, sending_mode, attachment_path, status, total, now, now)
+                )
+        except BaseException:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM recipients WHERE job_id = ?", (job_id,))
+            raise
+        return total
+
+    def create_recipient_list(self, list_id: str, emails: Iterable[Recipient], name: Optional[str] = None, chunk_size: int = 10000) -> int:
+        """
+        Stores an uploaded recipient list server-side, streaming it in chunks that are
+        committed one by one. The list only exists once all of it is stored. Returns its size.
+        """
+        try:
+            count = self._insert_chunks(
+                "INSERT INTO recipient_list_members (list_id, idx, email, fields) VALUES (?, ?, ?, ?)",
+                list_id, emails, chunk_size
+            )
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO recipient_lists (id, name, count, created_at) VALUES (?, ?, ?, ?)",
+                    (list_id, name, count, time.time())
+                )
+        except BaseException:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM recipient_list_members WHERE list_id = ?", (list_id,))
+            raise
+        return count
+
+    def _insert_chunks(self, statement: str, owner: str, recipients: Iterable[Recipient], chunk_size: int) -> int:
+        """
+        Inserts (owner, idx, email, fields) rows, one transaction per chunk. The lock is
+        only held while a chunk is written, not while the next one is read and parsed.
+        """
+        count = 0
+        rows = enumerate(recipients)
+        while True:
+            chunk = [(owner, idx, *_encode_recipient(r)) for idx, r in islice(rows, chunk_size)]
+            if not chunk:
+                return count
+            with self._lock, self._conn:
+                self._conn.executemany(statement, chunk)
+            count += len(chunk)
+
+    def recipient_list_exists(self, list_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM recipient_lists WHERE id = ?", (list_id,)
+            ).fetchone() is not None
+
+    def iter_recipient_list(self, list_id: str, batch_size: int = 5000, with_fields: bool = False) -> Iterator[Recipient]:
+        """Yields the list's addresses, or (email, fields) pairs when `with_fields` is set."""
+        last_idx = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT idx, email, fields FROM recipient_list_members WHERE list_id = ? AND idx > ?"
+                    " ORDER BY idx LIMIT ?",
+                    (list_id, last_idx, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for idx, email, fields in rows:
+                yield _decode_recipient(email, fields, with_fields)
+            last_idx = rows[-1][0]
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([c[0] for c in cursor.description], row))
+
+    def set_status(self, job_id: str, status: str, message: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, updated_at = ? WHERE id = ?",
+                (status, message, time.time(), job_id)
+            )
+
+    def count_jobs(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def enqueue(self, job_id: str, sender_password: str):
+        """
+        Hands a job to the worker processes. The password is kept only until a worker
+        finishes the job (or `credentials_ttl` runs out), because workers have no other
+        way to authenticate.
+        """
+        stored = self._cipher.encrypt(sender_password) if self._cipher else sender_password
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_credentials (job_id, sender_password, created_at) VALUES (?, ?, ?)",
+                (job_id, stored, time.time())
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, message = ?, updated_at = ? WHERE id = ?",
+                ("Waiting for a worker...", time.time(), job_id)
+            )
+
+    def claim_next(self, worker_id: str) -> Optional[Tuple[Dict, str]]:
+        """
+        Atomically moves the oldest queued job to 'running' for `worker_id`.
+        Returns (job, sender_password), or None if the queue is empty.
+        """
+        token = f"{worker_id}:{uuid.uuid4().hex}"
+        self.purge_credentials()
+        with self._lock:
+            with self._conn:
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, updated_at = ?"
+                    " WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1)"
+                    " AND status = 'queued'",
+                    (token, time.time())
+                ).rowcount
+            if not claimed:
+                return None
+            job_id = self._conn.execute("SELECT id FROM jobs WHERE worker = ?", (token,)).fetchone()[0]
+            password = self._conn.execute(
+                "SELECT sender_password FROM job_credentials WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        job = self.get_job(job_id)
+        password = self._decrypt(password[0]) if password is not None else None
+        if password is None:
+            self.discard_credentials(job_id)
+            self.set_status(
+                job_id, "failed", "The sender credentials for this job are missing or expired. Resume it with the password."
+            )
+            return None
+        return job, password
+
+    def _decrypt(self, stored: str) -> Optional[str]:
+        if not stored.startswith(_ENCRYPTED_PREFIX):
+            return stored
+        return self._cipher.decrypt(stored) if self._cipher else None
+
+    def purge_credentials(self) -> int:
+        """Deletes passwords queued more than `credentials_ttl` seconds ago; returns how many."""
+        if not self.credentials_ttl or self.credentials_ttl <= 0:
+            return 0
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM job_credentials WHERE created_at < ?", (time.time() - self.credentials_ttl,)
+            ).rowcount
+
+    def touch(self, job_id: str):
+        """Heartbeat: marks a running job as still alive."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def discard_credentials(self, job_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_credentials WHERE job_id = ?", (job_id,))
+
+    def iter_unsent(self, job_id: str, batch_size: int = 5000, with_fields: bool = False) -> Iterator[Recipient]:
+        """
+        Yields recipients that still need delivery (pending or deferred), in original order,
+        as (email, fields) pairs when `with_fields` is set.
+        """
+        last_idx = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT idx, email, fields FROM recipients WHERE job_id = ? AND idx > ?"
+                    " AND state IN ('pending', 'deferred') ORDER BY idx LIMIT ?",
+                    (job_id, last_idx, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for idx, email, fields in rows:
+                yield _decode_recipient(email, fields, with_fields)
+            last_idx = rows[-1][0]
+
+    def count_unsent(self, job_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM recipients WHERE job_id = ? AND state IN ('pending', 'deferred')", (job_id,)
+            ).fetchone()[0]
+
+    def unsent_recipients(self, job_id: str, with_fields: bool = False) -> List[Recipient]:
+        return list(self.iter_unsent(job_id, with_fields=with_fields))
+
+    def recorder(self, job_id: str, flush_every: int = 500, flush_interval: float = 1.0) -> RecipientStateRecorder:
+        return RecipientStateRecorder(self, job_id, flush_every, flush_interval)
+
+    def mark_all(self, job_id: str, state: str, error: Optional[str] = None):
+        """Moves every unsent recipient of a job to `state` (used by batch mode)."""
+        with self._lock, self._conn:
+            moved = self._conn.execute(
+                "UPDATE recipients SET state = ?, error = ?, updated_at = ?"
+                " WHERE job_id = ? AND state IN ('pending', 'deferred')",
+                (state, error, time.time(), job_id)
+            ).rowcount
+            self._add_counts(job_id, moved if state == SENT else 0, moved if state == FAILED else 0)
+
+    def _apply_states(self, job_id: str, batch: List[Tuple[str, str, Optional[str]]]):
+        now = time.time()
+        with self._lock, self._conn:
+            sent, failed = self._count_changes(job_id, batch)
+            self._conn.executemany(
+                "UPDATE recipients INDEXED BY recipients_by_email SET state = ?, error = ?, updated_at = ?"
+                " WHERE job_id = ? AND email = ? AND state != 'sent'",
+                [(state, error, now, job_id, email) for email, state, error in batch]
+            )
+            self._add_counts(job_id, sent, failed)
+
+    def _count_changes(self, job_id: str, batch: List[Tuple[str, str, Optional[str]]]) -> Tuple[int, int]:
+        """
+        How much a batch of state changes moves the job's sent and failed counts. Reads
+        the current state of just the batch's recipients and replays the batch over them.
+        """
+        emails = list({email for email, _, _ in batch})
+        states: Dict[str, List[str]] = {}
+        for start in range(0, len(emails), 500):
+            chunk = emails[start:start + 500]
+            for email, state in self._conn.execute(
+                "SELECT email, state FROM recipients INDEXED BY recipients_by_email"
+                f" WHERE job_id = ? AND email IN ({','.join('?' * len(chunk))}) AND state != 'sent'",
+                (job_id, *chunk)
+            ):
+                states.setdefault(email, []).append(state)
+        sent = failed = 0
+        for email, new_state, _ in batch:
+            rows = states.get(email, [])
+            for old_state in rows:
+                sent += new_state == SENT
+                failed += (new_state == FAILED) - (old_state == FAILED)
+            # Rows that reach 'sent' are no longer matched by later updates.
+            states[email] = [] if new_state == SENT else [new_state] * len(rows)
+        return sent, failed
+
+    def _add_counts(self, job_id: str, sent: int, failed: int):
+        self._conn.execute(
+            "UPDATE jobs SET sent = sent + ?, failed = failed + ?, updated_at = ? WHERE id = ?",
+            (sent, failed, time.time(), job_id)
+        )
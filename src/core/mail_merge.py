@@ -0,0 +1,100 @@
+# src/core/mail_merge.py
+
+import re
+import html
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def field_name(header: str) -> str:
+    """Same normalization as `recipient_parser.field_name`: "First Name" -> "first_name"."""
+    return "_".join(header.strip().lower().split())
+
+# {{ field }} or {{ field | default }}; field names follow the CSV header normalization.
+_PLACEHOLDER = re.compile(r"\{\{\s*([^{}|]+?)\s*(?:\|\s*([^{}]*?)\s*)?\}\}")
+
+
+class MergeTemplate:
+    """
+    A subject or body with `{{field}}` placeholders, compiled once into a render plan:
+    the literal text between placeholders plus, for each placeholder, the field it
+    reads and its default. Rendering is a single pass over the plan.
+    """
+    def __init__(self, text: str):
+        self.text = text or ""
+        self._literals: List[str] = []
+        self.placeholders: List[Tuple[str, str]] = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(self.text):
+            self._literals.append(self.text[position:match.start()])
+            self.placeholders.append((field_name(match.group(1)), match.group(2) or ""))
+            position = match.end()
+        self._tail = self.text[position:]
+
+    @classmethod
+    def from_marked(cls, text: str, marker: "re.Pattern", placeholders: List[Tuple[str, str]]) -> "MergeTemplate":
+        """
+        Compiles `text` in which `marker` matches stand for placeholders; the marker's
+        first group is the index into `placeholders` (see `substitute`).
+        """
+        template = cls("")
+        template.text = text
+        position = 0
+        for match in marker.finditer(text):
+            template._literals.append(text[position:match.start()])
+            template.placeholders.append(placeholders[int(match.group(1))])
+            position = match.end()
+        template._tail = text[position:]
+        return template
+
+    @property
+    def fields(self) -> List[str]:
+        """Names of the fields the template reads, in order of first use."""
+        return list(dict.fromkeys(name for name, _ in self.placeholders))
+
+    @property
+    def is_static(self) -> bool:
+        return not self.placeholders
+
+    def render(self, values: Optional[Dict[str, str]] = None, escape: bool = False) -> str:
+        """Fills the placeholders from `values`; missing or empty fields use their default."""
+        if not self.placeholders:
+            return self.text
+        values = values or {}
+        out = []
+        for literal, (name, default) in zip(self._literals, self.placeholders):
+            out.append(literal)
+            value = values.get(name) or default
+            out.append(html.escape(value) if escape else value)
+        out.append(self._tail)
+        return "".join(out)
+
+    def substitute(self, replacement: Callable[[int], str]) -> str:
+        """Replaces the i-th placeholder with `replacement(i)`, e.g. to mark its position."""
+        out = []
+        for i, literal in enumerate(self._literals):
+            out.append(literal)
+            out.append(replacement(i))
+        out.append(self._tail)
+        return "".join(out)
+
+
+def compile_template(text: str) -> MergeTemplate:
+    return MergeTemplate(text)
+
+
+def has_placeholders(*texts: str) -> bool:
+    return any(_PLACEHOLDER.search(text or "") for text in texts)
+
+
+def render_stream(
+    subject: str, body: str, recipients: Iterable[Tuple[str, Dict[str, str]]]
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Lazily yields (email, subject, body) per recipient. The templates are compiled once
+    and nothing is rendered ahead of the recipient being consumed. Body values are
+    HTML-escaped.
+    """
+    subject_template = compile_template(subject)
+    body_template = compile_template(body)
+    for email, fields in recipients:
+        yield email, subject_template.render(fields), body_template.render(fields, escape=True)
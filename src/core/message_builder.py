@@ -0,0 +1,212 @@
+# src/core/message_builder.py
+
+import os
+import re
+import mmap
+import uuid
+import base64
+import mimetypes
+from email.header import Header
+from email.mime.base import MIMEBase
+from email.utils import formatdate, make_msgid
+from typing import Dict, List, Optional, Tuple, Union
+
+from .mail_merge import MergeTemplate
+
+# Headers that differ between copies of the same campaign message.
+_PER_RECIPIENT_HEADERS = {"to", "message-id", "date"}
+_PLACEHOLDER = "recipient@automail.invalid"
+# To header for copies delivered through a multi-recipient envelope (RFC 5322 group syntax).
+UNDISCLOSED_RECIPIENTS = "undisclosed-recipients:;"
+_EOL = re.compile(r"\r?\n")
+_LINE_BREAKS = re.compile(r"[\r\n]+")
+# A base64-encoded MIME body inside yagmail's output (before CRLF conversion).
+_BASE64_BODY = re.compile(r"(Content-Transfer-Encoding: base64\n\n)([A-Za-z0-9+/=\n]+?)(\n\n|\n--|\n$)")
+_BOUNDARY = re.compile(rb'boundary="([^"]+)"')
+_CONTENT_TYPE = re.compile(r"^Content-Type: ([\w.+-]+/[\w.+-]+)", re.MULTILINE | re.IGNORECASE)
+
+
+def _to_crlf_bytes(text: str) -> bytes:
+    return _EOL.sub("\r\n", text).encode("utf-8")
+
+
+class Attachment:
+    """
+    A file encoded once as a MIME part. The file is mapped into memory and
+    base64-encoded straight from the mapping, and the part is then spliced into every
+    message that carries it, so a campaign reads and encodes each attachment once.
+    """
+    def __init__(self, filename: str, part: bytes):
+        self.filename = filename
+        self.part = part
+
+    @classmethod
+    def from_path(cls, path: str, filename: Optional[str] = None) -> "Attachment":
+        filename = filename or os.path.basename(path)
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    encoded = base64.encodebytes(view)
+            else:
+                encoded = b""
+        content_type, _ = mimetypes.guess_type(filename)
+        main_type, _, sub_type = (content_type or "application/octet-stream").partition("/")
+        headers = MIMEBase(main_type, sub_type, name=("utf-8", "", filename))
+        headers["Content-Transfer-Encoding"] = "base64"
+        headers.add_header("Content-Disposition", "attachment", filename=("utf-8", "", filename))
+        return cls(filename, _to_crlf_bytes(headers.as_string()) + encoded.replace(b"\n", b"\r\n"))
+
+    @classmethod
+    def load(cls, attachment: Union[str, "Attachment", None]) -> Optional["Attachment"]:
+        return cls.from_path(attachment) if isinstance(attachment, str) else attachment
+
+
+def _with_attachment(static_headers: bytes, payload: bytes, attachment: Optional[Attachment]) -> bytes:
+    """Adds the attachment as the last part of yagmail's multipart/mixed payload."""
+    if attachment is None:
+        return payload
+    match = _BOUNDARY.search(static_headers)
+    if match is None:
+        raise ValueError("Attachments need a multipart message.")
+    boundary = match.group(1)
+    closing = payload.rindex(b"--" + boundary + b"--")
+    return b"".join((payload[:closing], b"--", boundary, b"\r\n", attachment.part, b"\r\n", payload[closing:]))
+
+
+class MessageTemplate:
+    """
+    A campaign message compiled once: the body and attachments are rendered, encoded
+    and cached as bytes. Each send only writes fresh To, Message-ID and Date headers
+    in front of the cached parts.
+    """
+    def __init__(self, sender_email: str, static_headers: bytes, payload: bytes):
+        self.sender_email = sender_email
+        self._domain = sender_email.rpartition("@")[2] or None
+        self._static_headers = static_headers
+        self._payload = payload
+
+    @classmethod
+    def from_yagmail(
+        cls, client, subject: str, body: str, attachment: Union[str, Attachment, None] = None
+    ) -> "MessageTemplate":
+        """
+        Builds the template with yagmail's own MIME formatting (HTML handling), so
+        compiled messages look like the ones `yag.send` produces. `attachment` is a file
+        path or an already encoded `Attachment`.
+        """
+        _, msg_string = client.prepare_send(
+            to=_PLACEHOLDER,
+            subject=subject,
+            contents=body
+        )
+        header_block, _, payload = msg_string.partition("\n\n")
+
+        headers: List[str] = []
+        for line in header_block.split("\n"):
+            if line[:1] in (" ", "\t") and headers:
+                headers[-1] += "\n" + line
+            else:
+                headers.append(line)
+        kept = [h for h in headers if h.partition(":")[0].strip().lower() not in _PER_RECIPIENT_HEADERS]
+
+        static_headers = _to_crlf_bytes("\n".join(kept) + "\n") if kept else b""
+        payload = _with_attachment(static_headers, _to_crlf_bytes(payload), Attachment.load(attachment))
+        return cls(client.user, static_headers, payload)
+
+    @property
+    def size(self) -> int:
+        return len(self._static_headers) + len(self._payload)
+
+    def _envelope_headers(self, to: Union[str, List[str]]) -> bytes:
+        recipients = [to] if isinstance(to, str) else list(to)
+        to_header = ",\r\n ".join(recipients)
+        return (
+            f"To: {to_header}\r\n"
+            f"Message-ID: {make_msgid(domain=self._domain)}\r\n"
+            f"Date: {formatdate(localtime=True)}\r\n"
+        ).encode("utf-8")
+
+    def render(self, to: Union[str, List[str]]) -> bytes:
+        """Returns the complete message addressed to `to`, ready for `sendmail`."""
+        return b"".join((self._envelope_headers(to), self._static_headers, b"\r\n", self._payload))
+
+
+def _subject_header(subject: str) -> bytes:
+    # Merged values come from uploaded CSVs: a line break in one must not start a new header.
+    subject = _LINE_BREAKS.sub(" ", subject)
+    if subject.isascii():
+        return f"Subject: {subject}\r\n".encode("ascii")
+    return f"Subject: {Header(subject, 'utf-8').encode()}\r\n".encode("ascii")
+
+
+class MergeMessageTemplate(MessageTemplate):
+    """
+    A mail-merge campaign message compiled once. yagmail builds the MIME structure a
+    single time with a marker in place of every `{{field}}`; the encoded parts that
+    contain markers are turned into render plans, and everything else (other headers,
+    attachments) is cached as bytes. Rendering a recipient's copy only re-encodes the
+    small text parts and the Subject header.
+    """
+    def __init__(
+        self,
+        sender_email: str,
+        static_headers: bytes,
+        segments: List[Union[bytes, Tuple[MergeTemplate, bool]]],
+        subject: MergeTemplate
+    ):
+        super().__init__(sender_email, static_headers, b"")
+        self._segments = segments
+        self._subject = subject
+
+    @classmethod
+    def from_yagmail(
+        cls, client, subject: str, body: str, attachment: Union[str, Attachment, None] = None
+    ) -> "MergeMessageTemplate":
+        body_template = MergeTemplate(body)
+        token = f"AUTOMAILMERGE{uuid.uuid4().hex}"
+        marked_body = body_template.substitute(lambda i: f"{token}X{i}X")
+        # The attachment is added after the text parts have been located.
+        template = MessageTemplate.from_yagmail(client, "-", marked_body)
+
+        marker = re.compile(rf"{token}X(\d+)X")
+        payload = template._payload.decode("utf-8").replace("\r\n", "\n")
+        segments: List[Union[bytes, Tuple[MergeTemplate, bool]]] = []
+        position = 0
+        for match in _BASE64_BODY.finditer(payload):
+            text = base64.b64decode(match.group(2)).decode("utf-8")
+            if token not in text:
+                continue
+            # Values are HTML-escaped in the text/html part only; text/plain gets them as typed.
+            content_type = _CONTENT_TYPE.findall(payload, position, match.start())
+            is_html = bool(content_type) and content_type[-1].lower() == "text/html"
+            segments.append(_to_crlf_bytes(payload[position:match.end(1)]))
+            segments.append((MergeTemplate.from_marked(text, marker, body_template.placeholders), is_html))
+            position = match.start(3)
+        if token in payload[position:] or (body_template.placeholders and not segments):
+            raise ValueError("Could not locate the merge fields in the compiled message.")
+        tail = _with_attachment(template._static_headers, _to_crlf_bytes(payload[position:]), Attachment.load(attachment))
+        segments.append(tail)
+
+        static_headers = b"".join(
+            line + b"\r\n" for line in template._static_headers.split(b"\r\n")
+            if line and not line.lower().startswith(b"subject:")
+        )
+        return cls(template.sender_email, static_headers, segments, MergeTemplate(subject))
+
+    @property
+    def size(self) -> int:
+        return len(self._static_headers) + sum(
+            len(s) if isinstance(s, bytes) else len(s[0].text) * 4 // 3 for s in self._segments
+        )
+
+    def render(self, to: Union[str, List[str]], fields: Optional[Dict[str, str]] = None) -> bytes:
+        """Returns the message addressed to `to` with the merge fields filled from `fields`."""
+        out = [self._envelope_headers(to), _subject_header(self._subject.render(fields)), self._static_headers, b"\r\n"]
+        for segment in self._segments:
+            if isinstance(segment, bytes):
+                out.append(segment)
+            else:
+                template, is_html = segment
+                text = template.render(fields, escape=is_html)
+                out.append(base64.encodebytes(text.encode("utf-8")).replace(b"\n", b"\r\n").rstrip(b"\r\n"))
+        return b"".join(out)
@@ -0,0 +1,262 @@
+# src/core/metrics.py
+
+import time
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Histogram buckets in seconds, from a fast MIME build to a slow model call.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {list(self.labelnames)}, got {sorted(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """The metric's sample lines in the text exposition format."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A value that only goes up, such as the number of messages sent."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            values = [((), 0)]
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down. With `function`, the value is read from it on every
+    scrape instead (for state owned elsewhere, such as the job queue).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        if self.function is not None:
+            return self.function()
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                # A failing source (e.g. a busy database) must not break the whole scrape.
+                return []
+            return [f"{self.name} {_format_value(value)}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            values = [((), 0)]
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Distribution of observed durations (seconds) over fixed, cumulative buckets."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (plus +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class RollingRate:
+    """Events per second over the last `window` seconds, kept in one-second buckets."""
+    def __init__(self, window: int = 60, clock: Callable[[], float] = time.monotonic):
+        self.window = max(1, int(window))
+        self.clock = clock
+        self._buckets = [0] * self.window
+        self._seconds = [-1] * self.window
+        self._lock = threading.Lock()
+
+    def add(self, count: int = 1):
+        second = int(self.clock())
+        slot = second % self.window
+        with self._lock:
+            if self._seconds[slot] != second:
+                self._seconds[slot] = second
+                self._buckets[slot] = 0
+            self._buckets[slot] += count
+
+    def rate(self) -> float:
+        now = int(self.clock())
+        with self._lock:
+            total = sum(
+                count for second, count in zip(self._seconds, self._buckets)
+                if now - self.window < second <= now
+            )
+        return total / self.window
+
+
+class MetricsRegistry:
+    """The metrics of one process, rendered in the Prometheus text exposition format."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Adds `metric`; registering a name again returns the metric already registered."""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Send pipeline instrumentation, shared by the sync and async senders.
+STAGE_SECONDS = REGISTRY.histogram(
+    "automail_stage_seconds",
+    "Time spent per send pipeline stage (smtp_connect, mime_build, send, ai_generation, csv_parse).",
+    ["stage"]
+)
+EMAILS_SENT = REGISTRY.counter("automail_emails_sent_total", "Recipients an email was delivered to.")
+DELIVERY_FAILURES = REGISTRY.counter(
+    "automail_delivery_failures_total", "Recipients given up on, by final status (failed or deferred).", ["status"]
+)
+DELIVERY_RETRIES = REGISTRY.counter("automail_delivery_retries_total", "Envelopes rescheduled after a transient failure.")
+SMTP_THROTTLES = REGISTRY.counter("automail_smtp_throttles_total", "Throttling replies (421, 451 or 454 to the connection or MAIL FROM) from the SMTP server.")
+SENDS_IN_FLIGHT = REGISTRY.gauge("automail_sends_in_flight", "Messages currently being handed to the SMTP server.")
+SEND_RATE = RollingRate(60)
+REGISTRY.gauge(
+    "automail_send_throughput", "Recipients delivered per second over the last minute.", function=SEND_RATE.rate
+)
+
+
+def time_stage(stage: str):
+    """Context manager recording the duration of one pipeline stage."""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def record_sent(count: int = 1):
+    EMAILS_SENT.inc(count)
+    SEND_RATE.add(count)
@@ -0,0 +1,209 @@
+# src/core/personalizer.py
+
+import json
+import time
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .ai_generator import GeminiEmailGenerator, strip_code_fence
+from .response_cache import cache_key
+
+# Markers around the recipients block of a batch prompt (also used by the fake model).
+RECIPIENTS_START = "<recipients>"
+RECIPIENTS_END = "</recipients>"
+
+Draft = Dict[str, str]
+
+
+class PersonalizationMetrics:
+    """Throughput counters for one personalization run."""
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.first_draft_at: Optional[float] = None
+        self.drafts = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.model_calls = 0
+        self.retried_recipients = 0
+        self.failed_recipients = 0
+
+    def record_drafts(self, count: int):
+        if count and self.first_draft_at is None:
+            self.first_draft_at = time.monotonic()
+        self.drafts += count
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def drafts_per_second(self) -> float:
+        return self.drafts / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "drafts": self.drafts,
+            "cache_hits": self.cache_hits,
+            "batches": self.batches,
+            "model_calls": self.model_calls,
+            "retried_recipients": self.retried_recipients,
+            "failed_recipients": self.failed_recipients,
+            "elapsed": round(self.elapsed, 3),
+            "drafts_per_second": round(self.drafts_per_second, 2),
+            "time_to_first_draft": (
+                round(self.first_draft_at - self.started_at, 3) if self.first_draft_at is not None else None
+            )
+        }
+
+
+class Personalizer:
+    """
+    Writes one tailored subject and body per recipient from a base email.
+
+    Recipients are packed `batch_size` at a time into a single structured prompt, and
+    up to `max_batches_in_flight` batches are generated concurrently. `stream` yields
+    drafts as soon as each batch completes, so sending can start long before the
+    whole list has been generated. Drafts are cached per recipient, so resuming a
+    campaign does not pay for the same draft twice. A recipient the model still
+    leaves out after a retry on its own, or whose batch the generator gave up on,
+    gets an exception instead of a draft, so the sender records it as failed and
+    carries on with the others.
+    """
+    def __init__(self, generator: GeminiEmailGenerator, batch_size: int = 5, max_batches_in_flight: Optional[int] = None):
+        self.generator = generator
+        self.batch_size = max(1, int(batch_size))
+        self.max_batches_in_flight = max(1, int(max_batches_in_flight or generator.max_concurrency))
+        self.metrics = PersonalizationMetrics()
+
+    @property
+    def _ready_limit(self) -> int:
+        return self.batch_size * self.max_batches_in_flight
+
+    def build_batch_prompt(self, subject: str, body: str, recipients: List[Dict[str, str]]) -> str:
+        """`recipients` are the recipient fields, each with an "id" used to match replies."""
+        return f"""
+        You are an expert email writing assistant. Personalize the base email below for each recipient listed, using their details (name, company, role, ...) where they make the email more relevant.
+
+        **Base Subject:**
+        "{subject}"
+
+        **Base Body (HTML):**
+        {body}
+
+        **Recipients:**
+        {RECIPIENTS_START}
+        {json.dumps(recipients, ensure_ascii=False)}
+        {RECIPIENTS_END}
+
+        **Your Task:**
+        1. Keep the purpose, facts, links and signature of the base email. Do NOT invent details that are not provided.
+        2. The body MUST stay clean HTML, using `<p>` for paragraphs and `<br>` inside the signature block.
+        3. **Output**: Return a single, minified JSON array with exactly one object per recipient and the keys "id", "subject" and "body".
+        4. Do not include any text, markdown, or code block formatting like ```json before or after the JSON array itself. Just the raw JSON.
+        """
+
+    def _cache_key(self, subject: str, body: str, email: str, fields: Dict[str, str]) -> str:
+        details = json.dumps(fields, sort_keys=True)
+        return cache_key("personalize", subject, body, email, details, self.generator.model_name)
+
+    def _parse_batch(self, text: str) -> Dict[str, Draft]:
+        try:
+            items = json.loads(strip_code_fence(text))
+        except json.JSONDecodeError:
+            return {}
+        drafts = {}
+        for item in items if isinstance(items, list) else ():
+            if isinstance(item, dict) and item.get("subject") and item.get("body"):
+                drafts[str(item.get("id"))] = {"subject": item["subject"], "body": item["body"]}
+        return drafts
+
+    async def _run_batch(
+        self, subject: str, body: str, batch: List[Tuple[str, Dict[str, str], str]], retry: bool = True
+    ) -> List[Tuple[str, Union[Draft, Exception]]]:
+        self.metrics.batches += 1
+        self.metrics.model_calls += 1
+        details = [dict(fields, id=str(i), email=email) for i, (email, fields, _) in enumerate(batch)]
+        try:
+            text = await self.generator.generate_text_async(self.build_batch_prompt(subject, body, details))
+        except Exception as e:
+            # The generator has already retried; only this batch's recipients fail.
+            self.metrics.failed_recipients += len(batch)
+            return [(email, e) for email, _, _ in batch]
+        replies = self._parse_batch(text)
+
+        results, missing = [], []
+        for i, (email, fields, key) in enumerate(batch):
+            draft = replies.get(str(i))
+            if draft is None:
+                missing.append((email, fields, key))
+                continue
+            self.generator.cache.set(key, draft)
+            results.append((email, draft))
+        self.metrics.record_drafts(len(results))
+
+        if missing:
+            if not retry:
+                self.metrics.failed_recipients += len(missing)
+                return results + [
+                    (email, RuntimeError("Failed to personalize the email: the AI reply was incomplete."))
+                    for email, _, _ in missing
+                ]
+            # Ask again one recipient at a time; small prompts rarely come back malformed.
+            self.metrics.retried_recipients += len(missing)
+            retried = await asyncio.gather(*(self._run_batch(subject, body, [row], retry=False) for row in missing))
+            for drafts in retried:
+                results.extend(drafts)
+        return results
+
+    def _next_batch(
+        self, rows: Iterator[Tuple[str, Dict[str, str]]], subject: str, body: str, ready: List[Tuple[str, Draft]]
+    ) -> Tuple[List[Tuple[str, Dict[str, str], str]], bool]:
+        """Collects up to `batch_size` uncached recipients; cached drafts go to `ready`."""
+        batch = []
+        for email, fields in rows:
+            key = self._cache_key(subject, body, email, fields)
+            found, draft = self.generator.cache.get(key)
+            if found:
+                self.metrics.cache_hits += 1
+                self.metrics.record_drafts(1)
+                ready.append((email, draft))
+                if len(ready) >= self._ready_limit:
+                    # Hand cached drafts to the sender instead of scanning the whole list first.
+                    return batch, False
+                continue
+            batch.append((email, fields, key))
+            if len(batch) >= self.batch_size:
+                return batch, False
+        return batch, True
+
+    async def stream(
+        self, recipients: Iterable[Tuple[str, Dict[str, str]]], subject: str, body: str
+    ) -> AsyncIterator[Tuple[str, Union[Draft, Exception]]]:
+        """
+        Yields (email, {"subject", "body"}) for every recipient, in completion order,
+        or (email, exception) for a recipient that could not be personalized.
+        """
+        self.metrics = PersonalizationMetrics()
+        rows = iter(recipients)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                ready: List[Tuple[str, Draft]] = []
+                while not exhausted and len(pending) < self.max_batches_in_flight and len(ready) < self._ready_limit:
+                    batch, exhausted = self._next_batch(rows, subject, body, ready)
+                    if batch:
+                        pending.add(asyncio.create_task(self._run_batch(subject, body, batch)))
+                for item in ready:
+                    yield item
+                if not pending:
+                    if exhausted:
+                        return
+                    continue
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for item in task.result():
+                        yield item
+        finally:
+            for task in pending:
+                task.cancel()
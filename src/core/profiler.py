@@ -0,0 +1,90 @@
+# src/core/profiler.py
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Optional, Tuple
+
+# Deeper frames than this are cut off (the outermost ones are kept).
+MAX_DEPTH = 64
+
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for one thread: a background thread records the target's call
+    stack every `interval` seconds, so the profiled code runs at full speed apart from
+    the brief sampling. On the API's event loop the samples cover everything the loop
+    ran meanwhile, including other campaigns and time spent waiting in `select`.
+
+    `dump` writes the stacks in the collapsed format ("outer;inner count" per line) read
+    by flamegraph.pl, speedscope and similar tools.
+    """
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> Optional[Tuple[str, ...]]:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return None
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        return tuple(reversed(stack[-MAX_DEPTH:]))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            stack = self._sample()
+            if stack is not None:
+                self._stacks[stack] += 1
+                self.samples += 1
+
+    def start(self) -> "SamplingProfiler":
+        self.started_at = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="automail-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.duration = time.perf_counter() - self.started_at
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def top(self, limit: int = 10):
+        """The functions most often on top of the stack, as [(frame, share of samples)]."""
+        leaves = Counter()
+        for stack, count in self._stacks.items():
+            leaves[stack[-1]] += count
+        return [(frame, count / self.samples) for frame, count in leaves.most_common(limit)]
+
+    def dump(self, path: str) -> str:
+        """Writes the collapsed stacks to `path` and returns it."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+        return path
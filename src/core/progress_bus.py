@@ -0,0 +1,161 @@
+# src/core/progress_bus.py
+
+import asyncio
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+TERMINAL_STATUSES = {"completed", "failed", "interrupted"}
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+
+def _encode(state: dict) -> bytes:
+    return b"data: " + json.dumps(state).encode("utf-8") + b"\n\n"
+
+
+class _Topic:
+    """Latest progress of one task plus the watchers waiting for it to change."""
+    __slots__ = ("state", "payload", "terminal", "version", "changed", "subscribers", "last_flush", "flush_handle", "refresher")
+
+    def __init__(self):
+        self.state: Optional[dict] = None
+        self.payload = b""
+        self.terminal = False
+        self.version = 0
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+        self.last_flush = float("-inf")
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.refresher: Optional[asyncio.Task] = None
+
+
+class ProgressBus:
+    """
+    In-process pub/sub for campaign progress, streamed to browsers as Server-Sent Events.
+
+    Publishers may call `publish` on every delivery; each task emits at most one event
+    per `min_interval` seconds carrying the newest state. The event is encoded once and
+    shared by all watchers, and a watcher that falls behind skips straight to the newest
+    state, so the cost per window is one wake-up per watcher regardless of send rate.
+    Tasks nobody is watching are not tracked at all.
+    """
+    def __init__(self, min_interval: float = 0.25, keepalive: float = 15.0):
+        self.min_interval = min_interval
+        self.keepalive = keepalive
+        self._topics: Dict[str, _Topic] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def publish(self, task_id: str, state: dict):
+        """Records a new state for `task_id`. Safe to call from any thread."""
+        state = dict(state)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            self._publish(task_id, state)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._publish, task_id, state)
+
+    def _publish(self, task_id: str, state: dict):
+        topic = self._topics.get(task_id)
+        if topic is None:
+            return
+        topic.state = state
+        if state.get("status") in TERMINAL_STATUSES:
+            # Final states go out immediately so watchers never wait for the window.
+            if topic.flush_handle is not None:
+                topic.flush_handle.cancel()
+            self._flush(topic)
+            return
+        if topic.flush_handle is not None:
+            return  # The scheduled flush will carry this state.
+        delay = topic.last_flush + self.min_interval - self._loop.time()
+        if delay <= 0:
+            self._flush(topic)
+        else:
+            topic.flush_handle = self._loop.call_later(delay, self._flush, topic)
+
+    def _flush(self, topic: _Topic):
+        topic.flush_handle = None
+        topic.last_flush = self._loop.time()
+        topic.payload = _encode(topic.state)
+        topic.terminal = topic.state.get("status") in TERMINAL_STATUSES
+        topic.version += 1
+        changed, topic.changed = topic.changed, asyncio.Event()
+        changed.set()
+
+    async def _refresh(self, task_id: str, fetch: Callable[[], Awaitable[Optional[dict]]], interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            state = await fetch()
+            if state is None:
+                return
+            self._publish(task_id, state)
+            if state.get("status") in TERMINAL_STATUSES:
+                return
+
+    async def stream(
+        self,
+        task_id: str,
+        initial: dict,
+        refresh: Optional[Callable[[], Awaitable[Optional[dict]]]] = None,
+        refresh_interval: float = 1.0,
+        current: Optional[Callable[[], Awaitable[Optional[dict]]]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields SSE frames for `task_id`: `initial` first, then every coalesced update,
+        ending after a terminal status. For tasks published by another process, pass
+        `refresh` to poll the state; one poller is shared by all watchers of the task.
+
+        Updates published before the watcher subscribed are not tracked, so `current`
+        should read the task's state: it is checked once subscribed and again on every
+        keepalive, so a final state published meanwhile still ends the stream.
+        """
+        self._loop = asyncio.get_running_loop()
+        if initial.get("status") in TERMINAL_STATUSES:
+            yield _encode(initial)
+            return
+
+        topic = self._topics.get(task_id)
+        if topic is None:
+            topic = self._topics[task_id] = _Topic()
+        topic.subscribers += 1
+        seen = topic.version
+        try:
+            yield _encode(initial)
+            if current is not None:
+                await self._catch_up(task_id, topic, initial, current)
+            if refresh is not None and topic.refresher is None:
+                topic.refresher = asyncio.create_task(self._refresh(task_id, refresh, refresh_interval))
+            while True:
+                if topic.version == seen:
+                    try:
+                        await asyncio.wait_for(topic.changed.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        if current is not None:
+                            await self._catch_up(task_id, topic, initial, current)
+                        if topic.version == seen:
+                            yield KEEPALIVE_FRAME
+                        continue
+                seen = topic.version
+                yield topic.payload
+                if topic.terminal:
+                    return
+        finally:
+            topic.subscribers -= 1
+            if topic.subscribers == 0 and self._topics.get(task_id) is topic:
+                del self._topics[task_id]
+                if topic.flush_handle is not None:
+                    topic.flush_handle.cancel()
+                if topic.refresher is not None:
+                    topic.refresher.cancel()
+
+    async def _catch_up(self, task_id: str, topic: _Topic, initial: dict, current: Callable[[], Awaitable[Optional[dict]]]):
+        """Publishes the task's state read from `current` if the topic has not seen it."""
+        state = await current()
+        if state is not None and state != (topic.state if topic.state is not None else initial):
+            self._publish(task_id, state)
+
+    def watchers(self, task_id: str) -> int:
+        topic = self._topics.get(task_id)
+        return topic.subscribers if topic else 0
@@ -0,0 +1,291 @@
+# src/core/progress_store.py
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .progress_bus import TERMINAL_STATUSES
+
+
+class ProgressRecord:
+    """Progress of one task: the fixed fields every task has, plus rarely used extras."""
+    __slots__ = ("status", "sent", "total", "message", "extra", "touched_at", "flushed_at")
+
+    def __init__(self, status: str = "running", sent: int = 0, total: int = 0, message: str = ""):
+        self.status = status
+        self.sent = sent
+        self.total = total
+        self.message = message
+        self.extra: Optional[dict] = None
+        self.touched_at = time.monotonic()
+        self.flushed_at = float("-inf")
+
+    def apply(self, fields: dict):
+        for name, value in fields.items():
+            if name in ("status", "sent", "total", "message"):
+                setattr(self, name, value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[name] = value
+        self.touched_at = time.monotonic()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def as_dict(self) -> dict:
+        state = {"status": self.status, "sent": self.sent, "total": self.total, "message": self.message}
+        if self.extra:
+            state.update(self.extra)
+        return state
+
+
+class FileProgressBackend:
+    """Shares progress between processes on one host: one JSON file per task."""
+    def __init__(self, directory: str, ttl: float = 24 * 3600.0):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, task_id: str) -> str:
+        # Task IDs come from URLs; keep them from escaping the directory.
+        return os.path.join(self.directory, os.path.basename(task_id) + ".json")
+
+    def save(self, task_id: str, state: dict):
+        path = self._path(task_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def load(self, task_id: str) -> Optional[dict]:
+        path = self._path(task_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+class RedisProgressBackend:
+    """
+    Shares progress between processes and hosts through a Redis-compatible server.
+    `client` needs only `set(key, value, ex=...)` and `get(key)`, as in redis-py.
+    """
+    def __init__(self, client, prefix: str = "automail:progress:", ttl: float = 24 * 3600.0):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def save(self, task_id: str, state: dict):
+        self.client.set(self.prefix + task_id, json.dumps(state), ex=int(self.ttl))
+
+    def load(self, task_id: str) -> Optional[dict]:
+        value = self.client.get(self.prefix + task_id)
+        return json.loads(value) if value else None
+
+
+def backend_from_url(url: Optional[str]):
+    """`file:///path/to/dir` or `redis://host:port/db`; empty means no shared backend."""
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PROGRESS_STORE_URL points to Redis, but the 'redis' package is not installed.")
+        return RedisProgressBackend(redis.Redis.from_url(url))
+    if url.startswith("file://"):
+        return FileProgressBackend(url[len("file://"):])
+    raise ValueError(f"Unsupported progress store URL: {url}")
+
+
+class _Shard:
+    __slots__ = ("lock", "records")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records: "OrderedDict[str, ProgressRecord]" = OrderedDict()
+
+
+class ProgressStore:
+    """
+    Thread-safe, bounded store for the progress of the campaigns this process runs.
+
+    Tasks are spread over `shards` independently locked maps, so updates from many
+    campaigns do not contend on one lock. Finished tasks are dropped `ttl` seconds
+    after their last update, and once a shard holds its share of `max_entries` the
+    least recently used finished tasks go first; running tasks are never evicted.
+
+    With a `backend` (see `backend_from_url`), every state is also written through,
+    at most once per `flush_interval` seconds per task plus always on finishing, and
+    `get` falls back to it for tasks run by other processes.
+    """
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        shards: int = 16,
+        backend=None,
+        flush_interval: float = 1.0
+    ):
+        self.ttl = ttl
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._shards: List[_Shard] = [_Shard() for _ in range(max(1, int(shards)))]
+        self._shard_capacity = max(1, int(max_entries) // len(self._shards))
+        self._stats_lock = threading.Lock()
+        self.evictions = 0
+        self.backend_reads = 0
+        self.backend_writes = 0
+        self.backend_errors = 0
+
+    def _shard(self, task_id: str) -> _Shard:
+        return self._shards[hash(task_id) % len(self._shards)]
+
+    def _evict(self, shard: _Shard):
+        """Drops expired finished tasks, then the oldest finished ones over capacity."""
+        now = time.monotonic()
+        evicted = 0
+        for task_id in [
+            task_id for task_id, record in shard.records.items()
+            if record.finished and now - record.touched_at > self.ttl
+        ]:
+            del shard.records[task_id]
+            evicted += 1
+        if len(shard.records) > self._shard_capacity:
+            for task_id in [task_id for task_id, record in shard.records.items() if record.finished]:
+                del shard.records[task_id]
+                evicted += 1
+                if len(shard.records) <= self._shard_capacity:
+                    break
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def _write_through(self, task_id: str, record: ProgressRecord, state: dict):
+        if self.backend is None:
+            return
+        now = time.monotonic()
+        if state.get("status") not in TERMINAL_STATUSES and now - record.flushed_at < self.flush_interval:
+            return
+        record.flushed_at = now
+        try:
+            self.backend.save(task_id, state)
+            with self._stats_lock:
+                self.backend_writes += 1
+        except Exception as e:
+            # A shared store being unreachable must not fail the campaign itself.
+            with self._stats_lock:
+                self.backend_errors += 1
+            print(f"Warning: could not save progress of {task_id}: {e}")
+
+    def start(self, task_id: str, **fields) -> dict:
+        """Starts tracking `task_id` (replacing any earlier state) and returns its state."""
+        shard = self._shard(task_id)
+        record = ProgressRecord()
+        with shard.lock:
+            record.apply(fields)
+            shard.records[task_id] = record
+            shard.records.move_to_end(task_id)
+            self._evict(shard)
+            state = record.as_dict()
+        self._write_through(task_id, record, state)
+        return state
+
+    def update(self, task_id: str, **fields) -> dict:
+        """Sets fields of a tracked task atomically and returns the new state."""
+        shard = self._shard(task_id)
+        with shard.lock:
+            record = shard.records.get(task_id)
+            if record is None:
+                record = shard.records[task_id] = ProgressRecord()
+            record.apply(fields)
+            shard.records.move_to_end(task_id)
+            state = record.as_dict()
+        self._write_through(task_id, record, state)
+        return state
+
+    def increment(self, task_id: str, field: str = "sent", amount: int = 1) -> int:
+        """Adds `amount` to a counter of a tracked task atomically and returns its new value."""
+        shard = self._shard(task_id)
+        with shard.lock:
+            record = shard.records.get(task_id)
+            if record is None:
+                record = shard.records[task_id] = ProgressRecord()
+            if field in ("sent", "total"):
+                value = getattr(record, field) + amount
+            else:
+                value = ((record.extra or {}).get(field) or 0) + amount
+            record.apply({field: value})
+            shard.records.move_to_end(task_id)
+            state = record.as_dict()
+        self._write_through(task_id, record, state)
+        return value
+
+    def __contains__(self, task_id: str) -> bool:
+        """Whether this process tracks `task_id` (its bus then carries live updates)."""
+        shard = self._shard(task_id)
+        with shard.lock:
+            record = shard.records.get(task_id)
+            if record is not None and record.finished and time.monotonic() - record.touched_at > self.ttl:
+                del shard.records[task_id]
+                record = None
+            return record is not None
+
+    def get(self, task_id: str) -> Optional[dict]:
+        """A copy of the task's state, from this process or else from the shared backend."""
+        if task_id in self:
+            shard = self._shard(task_id)
+            with shard.lock:
+                record = shard.records.get(task_id)
+                if record is not None:
+                    shard.records.move_to_end(task_id)
+                    return record.as_dict()
+        if self.backend is None:
+            return None
+        try:
+            state = self.backend.load(task_id)
+        except Exception as e:
+            with self._stats_lock:
+                self.backend_errors += 1
+            print(f"Warning: could not load progress of {task_id}: {e}")
+            return None
+        with self._stats_lock:
+            self.backend_reads += 1
+        return state
+
+    def __len__(self) -> int:
+        return sum(len(shard.records) for shard in self._shards)
+
+    def stats(self) -> Dict[str, int]:
+        running = 0
+        for shard in self._shards:
+            with shard.lock:
+                running += sum(1 for record in shard.records.values() if not record.finished)
+        return {
+            "tasks": len(self),
+            "running": running,
+            "evictions": self.evictions,
+            "backend_reads": self.backend_reads,
+            "backend_writes": self.backend_writes,
+            "backend_errors": self.backend_errors
+        }
+
+
+def progress_store_from_env() -> ProgressStore:
+    """Builds the store from PROGRESS_MAX_TASKS, PROGRESS_TTL and PROGRESS_STORE_URL."""
+    return ProgressStore(
+        max_entries=int(os.getenv("PROGRESS_MAX_TASKS", "1024")),
+        ttl=float(os.getenv("PROGRESS_TTL", "3600")),
+        backend=backend_from_url(os.getenv("PROGRESS_STORE_URL"))
+    )
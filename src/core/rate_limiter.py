@@ -0,0 +1,261 @@
+# src/core/rate_limiter.py
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from .metrics import SMTP_THROTTLES
+
+# Connection and transaction replies that mean "this account is sending too fast".
+# Per-mailbox 4xx replies to RCPT (450 busy, 452 full) are not: they concern one recipient.
+THROTTLE_CODES = {421, 451, 454}
+
+
+class DailyQuotaExceeded(RuntimeError):
+    """Raised when a sender has used up its rolling 24-hour sending quota."""
+    def __init__(self, message: str, retry_at: float):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+
+def _reply_code(error: Exception) -> Optional[int]:
+    # smtplib uses `smtp_code`, aiosmtplib uses `code`.
+    code = getattr(error, "smtp_code", None)
+    if code is None:
+        code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """
+    Returns True if an SMTP exception is a throttling reply to the connection or the
+    transaction (421, 451, 454). Recipients refused at RCPT are left to the delivery
+    engine, which retries them per recipient.
+    """
+    if getattr(error, "recipients", None) is not None or getattr(error, "recipient", None) is not None:
+        return False
+    return _reply_code(error) in THROTTLE_CODES
+
+
+class TokenBucket:
+    """
+    Classic token bucket: refills at `rate` tokens per second up to `burst` tokens.
+    Not thread-safe on its own; `SenderRateLimiter` guards it with a lock.
+    """
+    def __init__(self, rate: float, burst: float):
+        if rate <= 0 or burst <= 0:
+            raise ValueError("Token bucket rate and burst must be positive.")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self._updated = now
+
+    def reserve(self, now: float, tokens: float = 1.0) -> float:
+        """Takes `tokens` if available and returns 0, otherwise returns the seconds to wait."""
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+
+class DailyQuota:
+    """
+    Rolling 24-hour quota, tracked in one-minute buckets so memory stays constant
+    no matter how many messages are sent.
+    """
+    WINDOW = 24 * 60 * 60
+    SLOT = 60
+
+    def __init__(self, limit: int):
+        if limit <= 0:
+            raise ValueError("Daily quota must be positive.")
+        self.limit = limit
+        self.used = 0
+        self._slots: deque = deque()  # [slot_start, count]
+
+    def _expire(self, now: float):
+        cutoff = now - self.WINDOW
+        while self._slots and self._slots[0][0] + self.SLOT <= cutoff:
+            _, count = self._slots.popleft()
+            self.used -= count
+
+    def remaining(self, now: float) -> int:
+        self._expire(now)
+        return self.limit - self.used
+
+    def retry_at(self, now: float, count: int) -> float:
+        """Wall-clock (time.time based) moment when `count` more sends fit in the window."""
+        self._expire(now)
+        freed = self.limit - self.used
+        for slot_start, slot_count in self._slots:
+            freed += slot_count
+            if freed >= count:
+                return slot_start + self.SLOT + self.WINDOW
+        return now + self.WINDOW
+
+    def consume(self, now: float, count: int):
+        slot = now - (now % self.SLOT)
+        if self._slots and self._slots[-1][0] == slot:
+            self._slots[-1][1] += count
+        else:
+            self._slots.append([slot, count])
+        self.used += count
+
+
+class SenderRateLimiter:
+    """
+    Rate limiting for one sending account: a sustained rate with bursts, an optional
+    rolling daily quota, and adaptive backoff when the server answers with throttling
+    replies. One instance is shared by every sender using the same account in the process.
+    """
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: float = 10.0,
+        daily_quota: Optional[int] = None,
+        min_rate_factor: float = 0.05,
+        base_backoff: float = 2.0,
+        max_backoff: float = 300.0
+    ):
+        self._lock = threading.Lock()
+        self.min_rate_factor = min_rate_factor
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._rate_factor = 1.0
+        self._paused_until = 0.0
+        self._consecutive_throttles = 0
+        self.bucket = None
+        self.quota = None
+        self.configure(rate, burst, daily_quota)
+
+    def configure(self, rate: float, burst: float, daily_quota: Optional[int] = None):
+        with self._lock:
+            self.rate = rate
+            if self.bucket is None:
+                self.bucket = TokenBucket(rate * self._rate_factor, burst)
+            else:
+                self.bucket.rate = rate * self._rate_factor
+                self.bucket.burst = burst
+                self.bucket.tokens = min(self.bucket.tokens, burst)
+            if daily_quota:
+                if self.quota is None or self.quota.limit != daily_quota:
+                    self.quota = DailyQuota(daily_quota)
+            else:
+                self.quota = None
+
+    @property
+    def effective_rate(self) -> float:
+        return self.bucket.rate
+
+    def paused_for(self) -> float:
+        """Seconds left of the backoff pause after a throttling reply (0 when not paused)."""
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def _try_acquire(self, messages: int, recipients: int) -> float:
+        """Takes the permits if possible and returns 0, otherwise returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._paused_until - now
+            if wait > 0:
+                return wait
+            if self.quota is not None:
+                wall = time.time()
+                if self.quota.remaining(wall) < recipients:
+                    retry_at = self.quota.retry_at(wall, recipients)
+                    raise DailyQuotaExceeded(
+                        f"Daily sending quota of {self.quota.limit} reached. "
+                        f"Capacity frees up at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(retry_at))}.",
+                        retry_at
+                    )
+            wait = self.bucket.reserve(now, messages)
+            if wait <= 0 and self.quota is not None:
+                self.quota.consume(time.time(), recipients)
+            return wait
+
+    def acquire(self, messages: int = 1, recipients: int = 1):
+        """
+        Blocks until `messages` sends are allowed by the token bucket and any adaptive
+        backoff pause. Raises DailyQuotaExceeded if the rolling quota has no room for
+        `recipients` more addresses.
+        """
+        while True:
+            wait = self._try_acquire(messages, recipients)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self, messages: int = 1, recipients: int = 1):
+        """Same as `acquire`, but waits on the event loop instead of blocking a thread."""
+        while True:
+            wait = self._try_acquire(messages, recipients)
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+    def record_success(self):
+        """Additively recovers the send rate after a successful delivery."""
+        with self._lock:
+            self._consecutive_throttles = 0
+            if self._rate_factor < 1.0:
+                self._rate_factor = min(1.0, self._rate_factor + 0.05)
+                self.bucket.rate = self.rate * self._rate_factor
+
+    def record_throttle(self) -> float:
+        """
+        Halves the send rate and pauses all senders on this account for an exponentially
+        growing, jittered interval. Returns the pause length in seconds.
+        """
+        SMTP_THROTTLES.inc()
+        with self._lock:
+            self._consecutive_throttles += 1
+            self._rate_factor = max(self.min_rate_factor, self._rate_factor / 2)
+            self.bucket.rate = self.rate * self._rate_factor
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._consecutive_throttles - 1))
+            backoff *= random.uniform(0.5, 1.0)
+            self._paused_until = max(self._paused_until, time.monotonic() + backoff)
+            return backoff
+
+
+_limiters: Dict[str, SenderRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    sender_key: str,
+    rate: Optional[float] = None,
+    burst: Optional[float] = None,
+    daily_quota: Optional[int] = None
+) -> SenderRateLimiter:
+    """
+    Returns the process-wide limiter for a sender account, creating it on first use.
+    Passing settings for an existing limiter reconfigures it.
+    """
+    key = sender_key.strip().lower()
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = SenderRateLimiter(
+                rate=rate or 5.0,
+                burst=burst or 10.0,
+                daily_quota=daily_quota
+            )
+            _limiters[key] = limiter
+            return limiter
+    if rate is not None or burst is not None or daily_quota is not None:
+        limiter.configure(
+            rate if rate is not None else limiter.rate,
+            burst if burst is not None else limiter.bucket.burst,
+            daily_quota if daily_quota is not None else (limiter.quota.limit if limiter.quota else None)
+        )
+    return limiter
@@ -0,0 +1,192 @@
+# src/core/response_cache.py
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def cache_key(*parts: str) -> str:
+    """Content address for a request: SHA-256 over the length-prefixed parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = (part or "").encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for JSON-serializable responses.
+
+    The memory tier is an LRU of at most `max_entries` items that expire after `ttl`
+    seconds. When `directory` is set, entries are also written there (one JSON file per
+    key) and survive restarts for `disk_ttl` seconds. `get_or_compute` coalesces
+    concurrent requests for the same key into a single computation.
+    """
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 3600.0,
+        directory: Optional[str] = None,
+        disk_ttl: float = 7 * 24 * 3600.0
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.directory = directory
+        self.disk_ttl = disk_ttl
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_async: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _read_disk(self, key: str) -> Tuple[bool, Any]:
+        if not self.directory:
+            return False, None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return False, None
+        if time.time() - entry.get("stored_at", 0) > self.disk_ttl:
+            return False, None
+        return True, entry.get("value")
+
+    def _write_disk(self, key: str, value: Any):
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": time.time(), "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            # A read-only or full disk only costs us the persistent tier.
+            pass
+
+    def _remember(self, key: str, value: Any):
+        with self._lock:
+            self._memory[key] = (time.monotonic() + self.ttl, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns (found, value), checking memory first and then disk."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._memory[key]
+        found, value = self._read_disk(key)
+        if found:
+            self._remember(key, value)
+            with self._lock:
+                self.hits += 1
+        return found, value
+
+    def set(self, key: str, value: Any):
+        self._remember(key, value)
+        self._write_disk(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for `key`, or runs `compute()` and caches its result.
+        Callers asking for a key that is already being computed wait for that result
+        instead of starting their own call. Exceptions are shared but never cached.
+        """
+        found, value = self.get(key)
+        if found:
+            return value
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                # Finished by another caller since our lookup.
+                return entry[1]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of `get_or_compute`: awaits `compute()` on a miss, and callers
+        on the same event loop asking for a key in flight share that one awaitable.
+        Disk reads and writes run in a worker thread.
+        """
+        if self.directory:
+            found, value = await asyncio.to_thread(self.get, key)
+        else:
+            found, value = self.get(key)
+        if found:
+            return value
+
+        future = self._in_flight_async.get(key)
+        if future is not None:
+            # shield: one waiter giving up must not cancel the call for everyone else.
+            return await asyncio.shield(future)
+        future = self._in_flight_async[key] = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self.misses += 1
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case nobody else was waiting.
+            future.exception()
+            raise
+        else:
+            self._remember(key, value)
+            if self.directory:
+                await asyncio.to_thread(self._write_disk, key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._in_flight_async.pop(key, None)
+
+
+def cache_from_env() -> ResponseCache:
+    """Builds the AI response cache from AI_CACHE_SIZE, AI_CACHE_TTL and AI_CACHE_DIR."""
+    return ResponseCache(
+        max_entries=int(os.getenv("AI_CACHE_SIZE", "256")),
+        ttl=float(os.getenv("AI_CACHE_TTL", "3600")),
+        directory=os.getenv("AI_CACHE_DIR", ".automail_cache/ai") or None
+    )
@@ -0,0 +1,372 @@
+# src/core/sender_pool.py
+
+import os
+import json
+import time
+import asyncio
+from typing import Dict, List, Optional, Sequence, Union
+
+from .async_email_sender import AsyncDelivery, AsyncEmailSender
+from .message_builder import MessageTemplate, MergeMessageTemplate
+from .rate_limiter import DailyQuotaExceeded, _reply_code, is_throttle_error
+from .delivery import TRANSIENT, classify_failure, is_sender_error, refused_by
+from .metrics import REGISTRY
+
+ACCOUNT_SENDS = REGISTRY.counter(
+    "automail_account_sends_total", "Messages handed to the SMTP server, by sending account.", ["account"]
+)
+ACCOUNT_FAILOVERS = REGISTRY.counter(
+    "automail_account_failovers_total",
+    "Messages moved to another account, by reason (sender, quota, throttle, connection).",
+    ["reason"]
+)
+
+
+class SenderAccount:
+    """
+    One sending account (or SMTP relay) of a `SenderPool`: its sender, scheduling
+    weight and health. An account whose login fails is disabled for good; one that
+    has used up its daily quota is suspended until capacity frees up; and one that
+    fails to connect `failure_threshold` times in a row is suspended for a cooldown
+    that doubles on every further trip, up to `max_cooldown` seconds.
+    """
+    def __init__(
+        self,
+        sender: AsyncEmailSender,
+        weight: float = 1.0,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0
+    ):
+        if weight <= 0:
+            raise ValueError("Sender account weight must be positive.")
+        self.sender = sender
+        self.name = sender.sender_email
+        self.weight = float(weight)
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.in_flight = 0
+        self.sent = 0
+        self.failures = 0
+        self.trips = 0
+        self.disabled = False
+        self.suspended_until = 0.0
+        self.quota_error: Optional[DailyQuotaExceeded] = None
+        self.last_error: Optional[Exception] = None
+
+    def over_quota(self, now: float) -> bool:
+        return self.quota_error is not None and self.suspended_until > now
+
+    def available_in(self, now: float) -> Optional[float]:
+        """Seconds until the account can send again (0 if it can now), or None if it is disabled."""
+        if self.disabled:
+            return None
+        return max(0.0, self.suspended_until - now, self.sender.rate_limiter.paused_for())
+
+    def record_success(self, recipients: int):
+        self.sent += recipients
+        self.failures = 0
+        self.trips = 0
+        self.quota_error = None
+
+    def record_connection_failure(self, error: Exception, now: float):
+        self.last_error = error
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.failures = 0
+            self.trips += 1
+            self.suspended_until = now + min(self.max_cooldown, self.cooldown * 2 ** (self.trips - 1))
+
+    def record_quota(self, error: DailyQuotaExceeded, now: float):
+        self.last_error = self.quota_error = error
+        self.suspended_until = now + max(0.0, error.retry_at - time.time())
+
+    def disable(self, error: Exception):
+        self.last_error = error
+        self.disabled = True
+
+    def as_dict(self) -> dict:
+        if self.disabled:
+            state = "disabled"
+        elif self.available_in(time.monotonic()):
+            state = "suspended"
+        else:
+            state = "healthy"
+        return {
+            "account": self.name,
+            "state": state,
+            "weight": self.weight,
+            "sent": self.sent,
+            "in_flight": self.in_flight,
+            "last_error": str(self.last_error) if self.last_error is not None else None
+        }
+
+
+class LeastLoadedScheduler:
+    """Picks the account with the fewest messages in flight per unit of weight."""
+    def pick(self, accounts: Sequence[SenderAccount]) -> SenderAccount:
+        return min(accounts, key=lambda account: ((account.in_flight + 1) / account.weight, account.sent / account.weight))
+
+
+class WeightedScheduler:
+    """
+    Smooth weighted round robin: over any stretch of picks each account gets its share
+    of the weight, interleaved rather than in runs.
+    """
+    def __init__(self):
+        self._current: Dict[int, float] = {}
+
+    def pick(self, accounts: Sequence[SenderAccount]) -> SenderAccount:
+        total = sum(account.weight for account in accounts)
+        for account in accounts:
+            self._current[id(account)] = self._current.get(id(account), 0.0) + account.weight
+        chosen = max(accounts, key=lambda account: self._current[id(account)])
+        self._current[id(chosen)] -= total
+        return chosen
+
+
+SCHEDULERS = {"least_loaded": LeastLoadedScheduler, "weighted": WeightedScheduler}
+
+
+class _PooledTemplate:
+    """
+    A campaign message compiled for each account on first use, so every copy carries
+    the From header of the account that sends it.
+    """
+    def __init__(self, pool: "SenderPool", subject: str, body: str, attachment_path: Optional[str], merge: bool):
+        self._pool = pool
+        self._args = (subject, body, attachment_path)
+        self._merge = merge
+        self._templates: Dict[str, MessageTemplate] = {}
+        self._lock = asyncio.Lock()
+
+    async def for_account(self, account: SenderAccount) -> MessageTemplate:
+        template = self._templates.get(account.name)
+        if template is None:
+            async with self._lock:
+                template = self._templates.get(account.name)
+                if template is None:
+                    template = await self._pool._compile(account, *self._args, merge=self._merge)
+                    self._templates[account.name] = template
+        return template
+
+    def render(self, to: Union[str, List[str]], fields: Optional[Dict[str, str]] = None) -> "_PendingMessage":
+        return _PendingMessage(self, to, fields)
+
+
+class _PendingMessage:
+    """A copy to render once the pool has picked the account that sends it."""
+    __slots__ = ("template", "to", "fields")
+
+    def __init__(self, template: _PooledTemplate, to: Union[str, List[str]], fields: Optional[Dict[str, str]]):
+        self.template = template
+        self.to = to
+        self.fields = fields
+
+    async def render(self, account: SenderAccount) -> bytes:
+        template = await self.template.for_account(account)
+        if isinstance(template, MergeMessageTemplate):
+            return template.render(self.to, self.fields)
+        return template.render(self.to)
+
+
+class SenderPool(AsyncDelivery):
+    """
+    Spreads a campaign over several sending accounts or SMTP relays, each with its own
+    connections, rate limiter and daily quota, so throughput grows with the number of
+    accounts instead of stopping at one mailbox's limits.
+
+    It shares `AsyncEmailSender`'s delivery loops and takes the same calls; only the
+    account is chosen per message, by `strategy` ("least_loaded" or "weighted"). An
+    account that is throttled, over its quota, failing to connect or refused at login
+    is skipped and its messages go to the others. The run only stops like a single
+    sender's would once no account is left to send with.
+    """
+    def __init__(
+        self,
+        accounts: Sequence[SenderAccount],
+        strategy: str = "least_loaded",
+        max_throttle_retries: int = 5,
+        max_delivery_retries: int = 3,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0
+    ):
+        if not accounts:
+            raise ValueError("A sender pool needs at least one account.")
+        if strategy not in SCHEDULERS:
+            raise ValueError(f"Unknown sender pool strategy {strategy!r}; use one of {sorted(SCHEDULERS)}.")
+        super().__init__(
+            sum(account.sender.max_concurrency for account in accounts),
+            max_throttle_retries, max_delivery_retries, retry_delay, max_retry_delay
+        )
+        self.accounts = list(accounts)
+        self.scheduler = SCHEDULERS[strategy]()
+        self.sender_email = self.accounts[0].name
+        for account in self.accounts:
+            # Throttling replies are handled here by moving on to another account.
+            account.sender.max_throttle_retries = 0
+
+    async def connect(self):
+        """Logs in to every account; those that fail are left out. Raises only if none can send."""
+        async def login(account: SenderAccount) -> bool:
+            try:
+                async with account.sender._connection():
+                    pass
+            except Exception as e:
+                if is_sender_error(e):
+                    account.disable(e)
+                else:
+                    account.record_connection_failure(e, time.monotonic())
+                return False
+            return True
+
+        if not any(await asyncio.gather(*(login(account) for account in self.accounts))):
+            raise ConnectionError(
+                f"Failed to connect to SMTP server. Check your credentials. Error: {self.accounts[0].last_error}"
+            )
+
+    async def close(self):
+        await asyncio.gather(*(account.sender.close() for account in self.accounts))
+
+    def health(self) -> List[dict]:
+        return [account.as_dict() for account in self.accounts]
+
+    async def _compile(self, account: SenderAccount, subject: str, body: str, attachment_path: Optional[str], merge: bool):
+        # The attachment is encoded once for the pool, not once per account.
+        attachment = await self._attachment(attachment_path)
+        if merge:
+            return await asyncio.to_thread(MergeMessageTemplate.from_yagmail, account.sender._builder, subject, body, attachment)
+        return await asyncio.to_thread(MessageTemplate.from_yagmail, account.sender._builder, subject, body, attachment)
+
+    async def compile_message(self, subject: str, body: str, attachment_path: str = None) -> _PooledTemplate:
+        await self._attachment(attachment_path)
+        return _PooledTemplate(self, subject, body, attachment_path, merge=False)
+
+    async def compile_merge_message(self, subject: str, body: str, attachment_path: str = None) -> _PooledTemplate:
+        await self._attachment(attachment_path)
+        return _PooledTemplate(self, subject, body, attachment_path, merge=True)
+
+    def _unavailable_error(self, now: float) -> Optional[Exception]:
+        """
+        Why no account can take messages any more: the last login error once all are
+        disabled, or the quota that frees up first once the rest are over their quotas.
+        """
+        live = [account for account in self.accounts if not account.disabled]
+        if not live:
+            return self.accounts[-1].last_error or ConnectionError("Every sender account has been disabled.")
+        if all(account.over_quota(now) for account in live):
+            return min((account.quota_error for account in live), key=lambda error: error.retry_at)
+        return None
+
+    async def _acquire_account(self, tried: set) -> Optional[SenderAccount]:
+        """
+        The next account to send with, skipping those in `tried`. Waits while every
+        candidate is paused or cooling down; returns None when no candidate is left.
+        """
+        while True:
+            now = time.monotonic()
+            error = self._unavailable_error(now)
+            if error is not None:
+                raise error
+            ready, waits = [], []
+            for account in self.accounts:
+                # Accounts over their quota free up in hours, not worth waiting for here.
+                if id(account) in tried or account.over_quota(now):
+                    continue
+                wait = account.available_in(now)
+                if wait is None:
+                    continue
+                if wait <= 0:
+                    ready.append(account)
+                else:
+                    waits.append(wait)
+            if ready:
+                account = self.scheduler.pick(ready)
+                account.in_flight += 1
+                return account
+            if not waits:
+                return None
+            await asyncio.sleep(min(min(waits), 1.0))
+
+    def _fail_over(self, account: SenderAccount, error: Exception) -> Optional[str]:
+        """
+        Records an account-level failure and returns its reason, or None when `error`
+        concerns the recipients (the delivery engine classifies those as usual).
+        """
+        if refused_by(error) or getattr(error, "recipient", None) is not None:
+            # Refused mailboxes would be refused whichever account sent to them.
+            return None
+        if isinstance(error, DailyQuotaExceeded):
+            account.record_quota(error, time.monotonic())
+            return "quota"
+        if is_sender_error(error):
+            account.disable(error)
+            return "sender"
+        if is_throttle_error(error):
+            account.last_error = error
+            account.sender.rate_limiter.record_throttle()
+            return "throttle"
+        if _reply_code(error) is None and classify_failure(error) == TRANSIENT:
+            account.record_connection_failure(error, time.monotonic())
+            return "connection"
+        return None
+
+    async def _send_limited(self, envelope: List[str], msg_string) -> dict:
+        """Sends through the chosen account, moving on to another one after an account-level failure."""
+        tried = set()
+        throttles = 0
+        last_error: Optional[Exception] = None
+        while True:
+            account = await self._acquire_account(tried)
+            if account is None:
+                if last_error is not None and is_throttle_error(last_error) and throttles <= self.max_throttle_retries:
+                    # Every account is throttled: wait for the first pause to end and go round again.
+                    tried.clear()
+                    continue
+                if last_error is not None and is_sender_error(last_error):
+                    # Other accounts are still up; let the engine retry instead of stopping the run.
+                    raise ConnectionError(f"No sender account could take the message: {last_error}")
+                raise last_error or ConnectionError("No sender account could take the message.")
+            try:
+                message = await msg_string.render(account) if isinstance(msg_string, _PendingMessage) else msg_string
+                refused = await account.sender._send_limited(envelope, message)
+            except Exception as e:
+                reason = self._fail_over(account, e)
+                if reason is None:
+                    raise
+                ACCOUNT_FAILOVERS.inc(reason=reason)
+                if reason == "throttle":
+                    throttles += 1
+                tried.add(id(account))
+                last_error = e
+                continue
+            finally:
+                account.in_flight -= 1
+            account.record_success(len(envelope) - len(refused or {}))
+            ACCOUNT_SENDS.inc(account=account.name)
+            return refused
+
+
+def load_accounts(spec: str) -> List[dict]:
+    """
+    Sender account settings from `spec`: a JSON list, or the path of a file holding
+    one. Each entry needs "email" and "password" and may set "host", "port",
+    "use_tls", "weight", "rate", "burst", "daily_quota" and "max_concurrency".
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return []
+    if not spec.startswith("["):
+        with open(os.path.expanduser(spec), encoding="utf-8") as f:
+            spec = f.read()
+    try:
+        accounts = json.loads(spec)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"SENDER_ACCOUNTS is not valid JSON: {e}")
+    if not isinstance(accounts, list):
+        raise ValueError("SENDER_ACCOUNTS must be a list of accounts.")
+    for account in accounts:
+        if not isinstance(account, dict) or not account.get("email") or not account.get("password"):
+            raise ValueError("Every sender account needs an email and a password.")
+    return accounts
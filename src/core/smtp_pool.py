@@ -0,0 +1,152 @@
+# src/core/smtp_pool.py
+
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from .pipelining import pipelined_sendmail
+from .metrics import time_stage
+
+
+class PooledConnection:
+    """
+    A single authenticated SMTP session owned by the pool.
+
+    Wraps a yagmail client so the login happens once per connection instead of once per
+    message, and enforces an optional per-connection send rate.
+    """
+    def __init__(self, client_factory: Callable, rate_per_connection: Optional[float] = None):
+        self._client_factory = client_factory
+        self._min_interval = 1.0 / rate_per_connection if rate_per_connection else 0.0
+        self._last_send = 0.0
+        self.client = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.client is not None and self.client.smtp is not None
+
+    def connect(self):
+        """Opens (or re-opens) the SMTP session and authenticates."""
+        self.close()
+        with time_stage("smtp_connect"):
+            client = self._client_factory()
+            client.login()
+        self.client = client
+
+    def close(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+
+    def _wait_for_slot(self):
+        if self._min_interval:
+            delay = self._last_send + self._min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _send(self, recipients: List[str], msg_string, pipelined: bool):
+        if pipelined:
+            return pipelined_sendmail(self.client.smtp, self.client.user, recipients, msg_string)
+        return self.client.smtp.sendmail(self.client.user, recipients, msg_string)
+
+    def sendmail(self, recipients: List[str], msg_string, pipelined: bool = False):
+        """
+        Sends a prepared message, reconnecting once if the session was dropped.
+        With `pipelined`, the envelope is sent in one round trip when the server allows it.
+        """
+        if not self.is_connected:
+            self.connect()
+        self._wait_for_slot()
+        try:
+            result = self._send(recipients, msg_string, pipelined)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            self.connect()
+            result = self._send(recipients, msg_string, pipelined)
+        finally:
+            self._last_send = time.monotonic()
+        return result
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` authenticated SMTP connections open and hands them out to workers.
+
+    Connections are created lazily the first time they are needed and are reused for the
+    lifetime of the pool. A connection whose session drops is transparently reconnected.
+    """
+    def __init__(self, client_factory: Callable, size: int = 4, rate_per_connection: Optional[float] = None):
+        if size < 1:
+            raise ValueError("SMTP pool size must be at least 1.")
+        self.size = size
+        self._client_factory = client_factory
+        self._rate_per_connection = rate_per_connection
+        self._idle: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all: List[PooledConnection] = []
+
+    def _new_connection(self) -> PooledConnection:
+        conn = PooledConnection(self._client_factory, self._rate_per_connection)
+        conn.connect()
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def warm_up(self, count: int = 1):
+        """Opens `count` connections up front, e.g. to validate credentials early."""
+        for _ in range(min(count, self.size)):
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._new_connection())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def _checkout(self) -> PooledConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._new_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        """Checks a connection out of the pool for the duration of the `with` block."""
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            connections, self._all = self._all, []
+            self._created = 0
+        for conn in connections:
+            conn.close()
+        while not self._idle.empty():
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
@@ -1,38 +1,74 @@
 import os
 import uuid
-from typing import List, Optional, Dict
+import time
+from itertools import chain
+from typing import List, Optional
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-import uvicorn
 import json
-import pypdf
+from contextlib import asynccontextmanager
 
-from src.core.email_sender import EmailSender
+from src.core.job_store import JobStore
+from src.core.campaign import attachment_spool, build_sender, profile_path, run_job
+from src.core.metrics import REGISTRY, time_stage
+from src.core.progress_bus import ProgressBus
+from src.core.progress_store import progress_store_from_env
 from src.core.ai_generator import GeminiEmailGenerator
-from src.utils.recipient_parser import parse_from_text, parse_from_csv
+from src.core.context_extractor import extractor_from_env
+from src.utils.recipient_parser import RecipientStream, stream_from_csv
+from src.utils.email_validator import EmailValidator, CachingResolver, DNSResolver
 
 load_dotenv()
 
-app = FastAPI(title="Auto-Mail API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # The resume parser runs in a worker process; stop it with the server.
+    context_extractor.close()
+
+app = FastAPI(title="Auto-Mail API", lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="src/static"), name="static")
-task_progress: Dict[str, Dict] = {}
+# Progress of the campaigns this process runs; PROGRESS_STORE_URL shares it between processes.
+task_progress = progress_store_from_env()
+# Pushes coalesced progress updates to /api/task-events watchers.
+progress_bus = ProgressBus(min_interval=float(os.getenv("PROGRESS_EVENT_INTERVAL", "0.25")))
+job_store = JobStore(os.getenv("JOB_STORE_PATH", "automail_jobs.db"))
+
+# "inline" sends from this process; "worker" only enqueues jobs for `python worker.py`.
+EXECUTION_MODE = os.getenv("AUTOMAIL_EXECUTION_MODE", "inline")
+WORKER_STALE_AFTER = 120.0
+
+# Gauges read from this process's state on every /metrics scrape.
+REGISTRY.gauge("automail_jobs_queued", "Campaigns waiting for a worker.", function=lambda: job_store.count_jobs("queued"))
+REGISTRY.gauge(
+    "automail_campaigns_running", "Campaigns this process is sending.", function=lambda: task_progress.stats()["running"]
+)
+
+# Recipient validation; set EMAIL_MX_CHECK=1 to also reject domains without mail servers.
+email_validator = EmailValidator(
+    resolver=CachingResolver(DNSResolver()) if os.getenv("EMAIL_MX_CHECK") == "1" else None
+)
 
 # Models
 class AIRequest(BaseModel):
     prompt: str
 
-# Initialize AI Generator
+# Initialize AI Generator; the Gemini client itself is only created for the first draft.
 try:
     ai_generator = GeminiEmailGenerator()
 except Exception as e:
     print(f"Warning: AI Generator could not be initialized: {e}")
     ai_generator = None
 
+# Resume text for AI prompts, cached by file content and parsed in a worker process.
+context_extractor = extractor_from_env()
+
 @app.get("/")
 async def read_root():
     return FileResponse("src/static/index.html")
@@ -48,147 +84,241 @@ async def generate_email(
     context_text = ""
     if resume:
         try:
-            if resume.filename.endswith(".pdf"):
-                reader = pypdf.PdfReader(resume.file)
-                for page in reader.pages:
-                    context_text += page.extract_text() + "\n"
-            elif resume.filename.endswith(".txt"):
-                content = await resume.read()
-                context_text = content.decode("utf-8")
-            else:
-                # Try to read as text for other formats or just ignore
-                pass
+            content = await resume.read()
+            context_text = await context_extractor.extract_async(content, resume.filename)
         except Exception as e:
             print(f"Error reading resume: {e}")
             # Continue without context if reading fails
             pass
 
     try:
-        email_content = ai_generator.generate_email(prompt, context_text)
+        email_content = await ai_generator.generate_email_async(prompt, context_text)
         return email_content
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/parse-csv")
 async def parse_csv_endpoint(file: UploadFile = File(...)):
+    """
+    Streams the upload's email column (plus its other columns, for personalization)
+    into a server-side recipient list and returns only its ID, counts and a short preview.
+    """
     try:
-        temp_filename = f"temp_{file.filename}"
-        with open(temp_filename, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        with open(temp_filename, "r") as f:
-             import pandas as pd
-             df = pd.read_csv(temp_filename)
-             if 'Email' not in df.columns:
-                 cols = [c.lower() for c in df.columns]
-                 if 'email' in cols:
-                     email_col = df.columns[cols.index('email')]
-                     emails = df[email_col].dropna().unique().tolist()
-                 else:
-                     raise ValueError("CSV must have an 'Email' column")
-             else:
-                 emails = df['Email'].dropna().unique().tolist()
-        
-        os.remove(temp_filename)
-        return {"recipients": emails, "count": len(emails)}
+        list_id = str(uuid.uuid4())
+        stream = stream_from_csv(file.file, validator=email_validator, with_fields=True)
+        # CSV parsing is CPU-bound; run it off the event loop.
+        with time_stage("csv_parse"):
+            await run_in_threadpool(job_store.create_recipient_list, list_id, stream, file.filename)
+        return {"list_id": list_id, **stream.summary()}
         
     except Exception as e:
-        if os.path.exists(f"temp_{file.filename}"):
-             os.remove(f"temp_{file.filename}")
         raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {str(e)}")
 
+def iter_campaign_recipients(recipients: Optional[str], recipient_list_id: Optional[str]) -> RecipientStream:
+    """Manually entered recipients followed by an uploaded list, validated and without duplicates."""
+    sources = []
+    if recipients:
+        sources.append(json.loads(recipients))
+    if recipient_list_id:
+        if not job_store.recipient_list_exists(recipient_list_id):
+            raise ValueError("Recipient list not found. Please upload the CSV again.")
+        sources.append(job_store.iter_recipient_list(recipient_list_id, with_fields=True))
+    return RecipientStream(chain.from_iterable(sources), email_validator)
+
+def progress_reporter(task_id):
+    def report(**fields):
+        progress_bus.publish(task_id, task_progress.update(task_id, **fields))
+    return report
+
+def start_campaign(background_tasks, task_id, email_sender, sending_mode, profile=False):
+    job = job_store.get_job(task_id)
+    state = task_progress.start(
+        task_id,
+        status="running",
+        sent=job["sent"],
+        total=job["total"],
+        message="Starting..."
+    )
+    progress_bus.publish(task_id, state)
+    background_tasks.add_task(run_job, job_store, job, email_sender, progress_reporter(task_id), ai_generator, profile)
+
 @app.post("/api/send-email")
 async def send_email_endpoint(
     sender_email: str = Form(...),
     sender_password: str = Form(...),
-    recipients: str = Form(...), # JSON string of list
+    recipients: Optional[str] = Form(None), # JSON string of list
+    recipient_list_id: Optional[str] = Form(None), # returned by /api/parse-csv
     subject: str = Form(...),
     body: str = Form(...),
     sending_mode: str = Form(...),
     attachment: Optional[UploadFile] = File(None),
+    profile: bool = Form(False), # sample the campaign; see /api/profile/{task_id}
     background_tasks: BackgroundTasks = None
 ):
     try:
-        recipient_list = json.loads(recipients)
-        
-        email_sender = EmailSender(sender_email, sender_password)
-        
-        attachment_path = None
-        if attachment:
-            attachment_path = os.path.join(os.getcwd(), attachment.filename)
-            with open(attachment_path, "wb") as f:
-                content = await attachment.read()
-                f.write(content)
+        if sending_mode == "personalized" and not ai_generator and EXECUTION_MODE != "worker":
+            raise ValueError("Personalized mode needs the AI Generator. Check API Key.")
+        recipient_source = iter_campaign_recipients(recipients, recipient_list_id)
         
-        task_id = str(uuid.uuid4())
-        task_progress[task_id] = {
-            "status": "running",
-            "sent": 0,
-            "total": len(recipient_list),
-            "message": "Starting..."
-        }
-
-        if sending_mode == "batch":
-            # Batch is fast, but we can still wrap it to be consistent
-            background_tasks.add_task(process_batch_email, task_id, email_sender, recipient_list, subject, body, attachment_path)
-        else:
-            background_tasks.add_task(process_individual_emails, task_id, email_sender, recipient_list, subject, body, attachment_path)
-            
+        email_sender = None
+        try:
+            if EXECUTION_MODE != "worker":
+                email_sender = build_sender(sender_email, sender_password)
+                await email_sender.connect()
+
+            task_id = str(uuid.uuid4())
+            attachment_path = None
+            if attachment:
+                # Streamed to the spool in chunks; identical uploads are stored once.
+                attachment_path = await run_in_threadpool(
+                    attachment_spool.store, attachment.file, attachment.filename, task_id
+                )
+
+            try:
+                total = await run_in_threadpool(
+                    job_store.create_job, task_id, sender_email, subject, body, sending_mode, recipient_source, attachment_path
+                )
+                if not total:
+                    job_store.set_status(task_id, "failed", "No recipients have been added.")
+                    raise ValueError("No recipients have been added.")
+            except Exception:
+                attachment_spool.release(attachment_path, task_id)
+                raise
+        except Exception:
+            # The campaign never started, so nothing else will log the sender out.
+            if email_sender is not None:
+                await email_sender.close()
+            raise
+        if EXECUTION_MODE == "worker":
+            job_store.enqueue(task_id, sender_password)
+            return {"task_id": task_id, "message": "Email campaign queued"}
+
+        start_campaign(background_tasks, task_id, email_sender, sending_mode, profile)
         return {"task_id": task_id, "message": "Email sending started"}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/task-status/{task_id}")
-async def get_task_status(task_id: str):
-    if task_id not in task_progress:
+@app.post("/api/resume/{task_id}")
+async def resume_campaign_endpoint(
+    task_id: str,
+    sender_password: str = Form(...),
+    profile: bool = Form(False),
+    background_tasks: BackgroundTasks = None
+):
+    """Continues a stored campaign from its first unsent recipient."""
+    job = job_store.get_job(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task_progress[task_id]
+    if job_status(job) in ("running", "queued"):
+        raise HTTPException(status_code=409, detail="Task is already running")
+    if job["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Task has already completed")
+    if job["attachment_path"] and not os.path.exists(job["attachment_path"]):
+        raise HTTPException(status_code=410, detail="The campaign's attachment is no longer available")
+
+    if EXECUTION_MODE == "worker":
+        job_store.enqueue(task_id, sender_password)
+        return {"task_id": task_id, "remaining": job["total"] - job["sent"], "message": "Campaign queued for resume"}
 
-def process_batch_email(task_id, sender, recipients, subject, body, attachment_path):
+    email_sender = None
     try:
-        sender.send_batch_email(recipients, subject, body, attachment_path)
-        task_progress[task_id]["status"] = "completed"
-        task_progress[task_id]["sent"] = len(recipients)
-        task_progress[task_id]["message"] = "Batch email sent successfully!"
+        email_sender = build_sender(job["sender_email"], sender_password)
+        await email_sender.connect()
     except Exception as e:
-        task_progress[task_id]["status"] = "failed"
-        task_progress[task_id]["message"] = str(e)
-    finally:
-        if attachment_path and os.path.exists(attachment_path):
-            os.remove(attachment_path)
+        if email_sender is not None:
+            await email_sender.close()
+        raise HTTPException(status_code=500, detail=str(e))
 
-def process_individual_emails(task_id, sender, recipients, subject, body, attachment_path):
-    try:
-        total = len(recipients)
-        for i, recipient in enumerate(recipients):
-            # Update progress
-            task_progress[task_id]["sent"] = i
-            task_progress[task_id]["message"] = f"Sending to {recipient}..."
-            pass 
-        
-        def progress_callback(index, total, current_recipient):
-            task_progress[task_id]["sent"] = index + 1
-            task_progress[task_id]["message"] = f"Sent to {current_recipient}"
+    job_store.set_status(task_id, "running")
+    start_campaign(background_tasks, task_id, email_sender, job["sending_mode"], profile)
+    return {"task_id": task_id, "remaining": job["total"] - job["sent"], "message": "Campaign resumed"}
 
-        sender.send_individual_emails(recipients, subject, body, attachment_path, progress_callback=progress_callback)
-        
-        task_progress[task_id]["status"] = "completed"
-        task_progress[task_id]["message"] = "All emails sent successfully!"
-        
-    except Exception as e:
-        task_progress[task_id]["status"] = "failed"
-        task_progress[task_id]["message"] = str(e)
-    finally:
-        if attachment_path and os.path.exists(attachment_path):
-            os.remove(attachment_path)
+def job_status(job):
+    """Status of a stored job, detecting runs whose process has gone away."""
+    status = job["status"]
+    if status != "running":
+        return status
+    if EXECUTION_MODE == "worker":
+        # Workers heartbeat while sending; a silent job belongs to a dead worker.
+        return "interrupted" if time.time() - job["updated_at"] > WORKER_STALE_AFTER else "running"
+    if (task_progress.get(job["id"]) or {}).get("status") == "running":
+        return "running"
+    return "interrupted"
+
+def stored_task_status(task_id):
+    """Progress of a task this process is not running, read from the job store."""
+    job = job_store.get_job(task_id)
+    if job is None:
+        return None
+    status = job_status(job)
+    message = job["message"]
+    if status == "interrupted":
+        message = "Campaign was interrupted. It can be resumed."
+    elif status == "running":
+        message = f"Sent {job['sent']} of {job['total']}"
+    return {
+        "status": status,
+        "sent": job["sent"],
+        "total": job["total"],
+        "message": message or ""
+    }
+
+def shared_task_status(task_id):
+    """Progress of a task run elsewhere: the shared progress store, else the job store."""
+    return task_progress.get(task_id) or stored_task_status(task_id)
+
+@app.get("/api/task-status/{task_id}")
+async def get_task_status(task_id: str):
+    status = task_progress.get(task_id)
+    if status is not None:
+        return status
+    # Not tracked by this process (worker mode, or after a restart): read the job store.
+    status = stored_task_status(task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return status
+
+@app.get("/api/task-events/{task_id}")
+async def task_events(task_id: str):
+    """Streams a task's progress as Server-Sent Events until it finishes."""
+    refresh = None
+    # Re-read after subscribing: updates published before then are not streamed.
+    current = lambda: run_in_threadpool(task_progress.get, task_id)
+    if task_id in task_progress:
+        initial = task_progress.get(task_id)
+    else:
+        initial = await run_in_threadpool(shared_task_status, task_id)
+        if initial is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        # Sent from another process: poll its state once for all watchers of the task.
+        refresh = current = lambda: run_in_threadpool(shared_task_status, task_id)
+    return StreamingResponse(
+        progress_bus.stream(task_id, initial, refresh=refresh, current=current),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Send pipeline metrics of this process in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/profile/{task_id}")
+async def get_profile(task_id: str):
+    """The sampled profile (collapsed stacks) of a campaign started with `profile` set."""
+    path = profile_path(task_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No profile for this task")
+    return FileResponse(path, media_type="text/plain", filename=f"{task_id}.collapsed")
 
 # if __name__ == "__main__":
 #     uvicorn.run("src.main:app", host="0.0.0.0", port=8000, reload=False)
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     port = int(os.environ.get("PORT", 8000))  
     uvicorn.run(
         "src.main:app",
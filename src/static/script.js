@@ -16,6 +16,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // State
     let recipients = [];
+    let recipientList = null; // server-side list from CSV upload: { id, count }
     let attachmentFile = null;
     let resumeFile = null;
 
@@ -93,16 +94,21 @@ document.addEventListener('DOMContentLoaded', () => {
                 body: formData
             });
 
-            if (!response.ok) throw new Error('Failed to parse CSV');
+            if (!response.ok) {
+                const err = await response.json();
+                throw new Error(err.detail || 'Failed to parse CSV');
+            }
 
             const data = await response.json();
-            addRecipients(data.recipients);
+            recipientList = { id: data.list_id, count: data.count };
+            renderRecipients();
 
-            document.getElementById('filename').textContent = file.name;
+            document.getElementById('filename').textContent =
+                `${file.name} (${data.count} recipients, ${data.duplicates} duplicates, ${data.invalid} invalid)`;
             document.getElementById('file-info').classList.remove('hidden');
             document.getElementById('drop-zone').classList.add('hidden');
 
-            showToast(`Imported ${data.recipients.length} recipients from CSV`, 'success');
+            showToast(`Imported ${data.count} recipients from CSV`, 'success');
         } catch (error) {
             showToast(error.message, 'error');
         } finally {
@@ -114,6 +120,8 @@ document.addEventListener('DOMContentLoaded', () => {
         document.getElementById('file-info').classList.add('hidden');
         document.getElementById('drop-zone').classList.remove('hidden');
         fileInput.value = '';
+        recipientList = null;
+        renderRecipients();
     });
 
     // Recipient Management
@@ -140,9 +148,10 @@ document.addEventListener('DOMContentLoaded', () => {
             list.appendChild(chip);
         });
 
-        count.textContent = `${recipients.length} recipients`;
+        const total = recipients.length + (recipientList ? recipientList.count : 0);
+        count.textContent = `${total} recipients`;
 
-        if (recipients.length > 0) {
+        if (total > 0) {
             clearBtn.classList.remove('hidden');
         } else {
             clearBtn.classList.add('hidden');
@@ -156,6 +165,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     document.getElementById('clear-recipients-btn').addEventListener('click', () => {
         recipients = [];
+        if (recipientList) document.getElementById('remove-file').click();
         renderRecipients();
     });
 
@@ -218,7 +228,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const sendingMode = document.querySelector('input[name="sending-mode"]:checked').value;
 
         if (!senderEmail || !senderPassword) return showToast('Please provide sender credentials', 'error');
-        if (recipients.length === 0) return showToast('Please add at least one recipient', 'error');
+        if (recipients.length === 0 && !recipientList) return showToast('Please add at least one recipient', 'error');
         if (!subject) return showToast('Please enter a subject', 'error');
         if (quill.getText().trim().length === 0 && !attachmentFile) return showToast('Email body cannot be empty', 'error');
 
@@ -226,6 +236,9 @@ document.addEventListener('DOMContentLoaded', () => {
         formData.append('sender_email', senderEmail);
         formData.append('sender_password', senderPassword);
         formData.append('recipients', JSON.stringify(recipients));
+        if (recipientList) {
+            formData.append('recipient_list_id', recipientList.id);
+        }
         formData.append('subject', subject);
         formData.append('body', body);
         formData.append('sending_mode', sendingMode);
@@ -251,8 +264,8 @@ document.addEventListener('DOMContentLoaded', () => {
             const data = await response.json();
             const taskId = data.task_id;
 
-            // Start polling
-            pollProgress(taskId);
+            // Follow progress (pushed over SSE, polling as a fallback)
+            watchProgress(taskId);
 
         } catch (error) {
             showToast(error.message, 'error');
@@ -260,30 +273,59 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    let currentTaskId = null;
+
+    function watchProgress(taskId) {
+        currentTaskId = taskId;
+        document.getElementById('resume-progress-btn').classList.add('hidden');
+        if (!window.EventSource) return pollProgress(taskId);
+
+        const events = new EventSource(`/api/task-events/${taskId}`);
+        let received = false;
+        events.onmessage = (event) => {
+            received = true;
+            if (handleProgress(JSON.parse(event.data))) events.close();
+        };
+        events.onerror = () => {
+            // EventSource reconnects by itself after a dropped stream; only fall back
+            // to polling when the stream could not be opened at all.
+            if (!received || events.readyState === EventSource.CLOSED) {
+                events.close();
+                pollProgress(taskId);
+            }
+        };
+    }
+
     function pollProgress(taskId) {
         const interval = setInterval(async () => {
             try {
                 const res = await fetch(`/api/task-status/${taskId}`);
                 if (!res.ok) return;
 
-                const status = await res.json();
-                updateProgressUI(status);
-
-                if (status.status === 'completed' || status.status === 'failed') {
-                    clearInterval(interval);
-                    document.getElementById('close-progress-btn').classList.remove('hidden');
-                    if (status.status === 'completed') {
-                        showToast('All emails sent!', 'success');
-                    } else {
-                        showToast('Sending failed: ' + status.message, 'error');
-                    }
-                }
+                if (handleProgress(await res.json())) clearInterval(interval);
             } catch (e) {
                 console.error(e);
             }
         }, 1000);
     }
 
+    // Updates the modal and returns true once the task has finished.
+    function handleProgress(status) {
+        updateProgressUI(status);
+
+        if (status.status === 'completed' || status.status === 'failed' || status.status === 'interrupted') {
+            document.getElementById('close-progress-btn').classList.remove('hidden');
+            if (status.status === 'completed') {
+                showToast('All emails sent!', 'success');
+            } else {
+                document.getElementById('resume-progress-btn').classList.remove('hidden');
+                showToast('Sending failed: ' + status.message, 'error');
+            }
+            return true;
+        }
+        return false;
+    }
+
     function updateProgressUI(status) {
         const bar = document.getElementById('progress-bar');
         const text = document.getElementById('progress-text');
@@ -308,6 +350,31 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    document.getElementById('resume-progress-btn').addEventListener('click', async () => {
+        const senderPassword = document.getElementById('sender-password').value;
+        if (!senderPassword) return showToast('Please provide the sender password to resume', 'error');
+
+        const formData = new FormData();
+        formData.append('sender_password', senderPassword);
+
+        try {
+            const response = await fetch(`/api/resume/${currentTaskId}`, {
+                method: 'POST',
+                body: formData
+            });
+
+            if (!response.ok) {
+                const err = await response.json();
+                throw new Error(err.detail || 'Resume failed');
+            }
+
+            document.getElementById('close-progress-btn').classList.add('hidden');
+            watchProgress(currentTaskId);
+        } catch (error) {
+            showToast(error.message, 'error');
+        }
+    });
+
     document.getElementById('close-progress-btn').addEventListener('click', () => {
         showProgressModal(false);
     });
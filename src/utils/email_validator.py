@@ -0,0 +1,162 @@
+# src/utils/email_validator.py
+
+import re
+import time
+import socket
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional, Tuple
+
+# Rejection reasons reported by EmailValidator.check
+INVALID_SYNTAX = "invalid_syntax"
+DISPOSABLE = "disposable"
+NO_MX = "no_mx"
+
+# One flat character class keeps the per-address match cheap; dot placement is checked separately.
+_ADDRESS = re.compile(r"([A-Za-z0-9!#$%&'*+/=?^_`{|}~.-]{1,64})@([^@\s]+)")
+_DOMAIN = re.compile(r"^(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+(?:[a-z]{2,63}|xn--[a-z0-9-]{1,59})$")
+
+DISPOSABLE_DOMAINS = frozenset({
+    "10minutemail.com", "20minutemail.com", "33mail.com", "burnermail.io", "discard.email",
+    "dispostable.com", "emailondeck.com", "fakeinbox.com", "getairmail.com", "getnada.com",
+    "guerrillamail.com", "guerrillamail.net", "guerrillamail.org", "guerrillamailblock.com",
+    "harakirimail.com", "inboxkitten.com", "mailcatch.com", "maildrop.cc", "mailinator.com",
+    "mailinator.net", "mailnesia.com", "mintemail.com", "moakt.com", "mohmal.com",
+    "mytemp.email", "sharklasers.com", "spam4.me", "spamgourmet.com", "temp-mail.org",
+    "tempail.com", "tempmail.com", "tempmailo.com", "tempr.email", "throwawaymail.com",
+    "trashmail.com", "trashmail.de", "yopmail.com", "yopmail.net",
+})
+
+
+class MXResolver(ABC):
+    """Answers whether a domain can receive mail. Subclass to plug in a resolver."""
+    @abstractmethod
+    def has_mail_exchanger(self, domain: str) -> bool:
+        """True if `domain` (normalized, IDNA-encoded) accepts mail."""
+
+
+class StaticResolver(MXResolver):
+    """Resolver backed by a fixed set of deliverable domains; useful as a local stub in tests."""
+    def __init__(self, deliverable_domains: Iterable[str]):
+        self.deliverable_domains = {d.lower() for d in deliverable_domains}
+        self.lookups = 0
+
+    def has_mail_exchanger(self, domain: str) -> bool:
+        self.lookups += 1
+        return domain in self.deliverable_domains
+
+
+class DNSResolver(MXResolver):
+    """
+    Looks up MX records with dnspython when it is installed. Without it, falls back to an
+    address lookup, which is what SMTP itself does for domains without MX records.
+    """
+    def __init__(self, timeout: float = 3.0):
+        self.timeout = timeout
+        try:
+            import dns.resolver
+            self._dns = dns.resolver
+        except ImportError:
+            self._dns = None
+
+    def has_mail_exchanger(self, domain: str) -> bool:
+        if self._dns is not None:
+            try:
+                answers = self._dns.resolve(domain, "MX", lifetime=self.timeout)
+                return len(answers) > 0
+            except self._dns.NXDOMAIN:
+                return False
+            except Exception:
+                pass
+        try:
+            return bool(socket.getaddrinfo(domain, 25, proto=socket.IPPROTO_TCP))
+        except socket.gaierror:
+            return False
+
+
+class CachingResolver(MXResolver):
+    """Caches domain-level answers so each domain is resolved at most once per TTL."""
+    def __init__(self, resolver: MXResolver, ttl: float = 3600.0, negative_ttl: float = 300.0):
+        self.resolver = resolver
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache: Dict[str, Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+
+    def has_mail_exchanger(self, domain: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(domain)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        answer = self.resolver.has_mail_exchanger(domain)
+        expires = now + (self.ttl if answer else self.negative_ttl)
+        with self._lock:
+            self._cache[domain] = (answer, expires)
+        return answer
+
+
+class EmailValidator:
+    """
+    Validates and normalizes email addresses: syntax check, lower-casing, IDN domains
+    converted to ASCII (punycode), optional disposable-domain filtering and an optional
+    MX check. Domain-level verdicts are cached, so large lists spend almost all their
+    time on the precompiled local-part check.
+    """
+    MAX_CACHED_DOMAINS = 100000
+
+    def __init__(
+        self,
+        resolver: Optional[MXResolver] = None,
+        disposable_domains: Optional[Iterable[str]] = DISPOSABLE_DOMAINS,
+        lowercase_local_part: bool = True
+    ):
+        self.resolver = resolver
+        self.disposable_domains = frozenset(disposable_domains or ())
+        self.lowercase_local_part = lowercase_local_part
+        self._domains: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+    def _check_domain(self, raw_domain: str) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (ascii_domain, None) or (None, reason). Cached per raw domain."""
+        verdict = self._domains.get(raw_domain)
+        if verdict is not None:
+            return verdict
+        domain = raw_domain.lower().rstrip(".")
+        if not domain.isascii():
+            try:
+                domain = domain.encode("idna").decode("ascii")
+            except UnicodeError:
+                domain = ""
+        if len(domain) > 253 or not _DOMAIN.match(domain):
+            verdict = (None, INVALID_SYNTAX)
+        elif domain in self.disposable_domains:
+            verdict = (None, DISPOSABLE)
+        elif self.resolver is not None and not self.resolver.has_mail_exchanger(domain):
+            verdict = (None, NO_MX)
+        else:
+            verdict = (domain, None)
+        if len(self._domains) >= self.MAX_CACHED_DOMAINS:
+            self._domains.clear()
+        self._domains[raw_domain] = verdict
+        return verdict
+
+    def check(self, raw: str) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (normalized_address, None) for a valid address, else (None, reason)."""
+        # Entries of a JSON recipients list can be numbers, nulls, ...
+        if not isinstance(raw, str):
+            return None, INVALID_SYNTAX
+        match = _ADDRESS.fullmatch(raw.strip())
+        if match is None:
+            return None, INVALID_SYNTAX
+        local, raw_domain = match.groups()
+        if local[0] == "." or local[-1] == "." or ".." in local:
+            return None, INVALID_SYNTAX
+        domain, reason = self._check_domain(raw_domain)
+        if reason is not None:
+            return None, reason
+        if self.lowercase_local_part:
+            local = local.lower()
+        return local + "@" + domain, None
+
+    def normalize(self, raw: str) -> Optional[str]:
+        return self.check(raw)[0]
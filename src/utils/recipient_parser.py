@@ -1,24 +1,171 @@
 # src/utils/recipient_parser.py
 
-import pandas as pd
-from typing import List, IO
+import io
+import csv
+from typing import Dict, Iterable, Iterator, List, IO, Optional, Tuple, Union
 
-def parse_from_text(text: str) -> List[str]:
-    """Parses a comma-separated string of emails into a list."""
+from .email_validator import EmailValidator
+
+def parse_from_text(text: str, validator: Optional[EmailValidator] = None) -> List[str]:
+    """Parses a comma-separated string of emails into a list of valid, unique addresses."""
     if not text:
         return []
-    return [email.strip() for email in text.split(",") if email.strip()]
+    return list(RecipientStream((email.strip() for email in text.split(",") if email.strip()), validator))
+
+def _text_stream(file: IO) -> IO:
+    """Wraps binary uploads (e.g. FastAPI/Streamlit files) in a streaming text reader."""
+    if isinstance(file, io.TextIOBase):
+        return file
+    return io.TextIOWrapper(file, encoding="utf-8-sig", newline="", errors="replace")
+
+def iter_csv_column(file: IO, column: str = "Email") -> Iterator[str]:
+    """
+    Streams the values of one column out of a CSV file, row by row, without loading
+    the file into memory. The column name is matched case-insensitively.
+    """
+    stream = _text_stream(file)
+    try:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"CSV file must have a column named '{column}'.")
+        names = [name.strip().lower() for name in header]
+        if column.lower() not in names:
+            raise ValueError(f"CSV file must have a column named '{column}'.")
+        index = names.index(column.lower())
+        for row in reader:
+            if len(row) > index:
+                value = row[index].strip()
+                if value:
+                    yield value
+    finally:
+        if stream is not file:
+            # Don't let the wrapper close the caller's file when it is garbage collected.
+            stream.detach()
+
+def field_name(header: str) -> str:
+    """Normalizes a CSV header into a field name: "First Name" -> "first_name"."""
+    return "_".join(header.strip().lower().split())
+
+def iter_csv_rows(file: IO, column: str = "Email") -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Streams (email, fields) pairs out of a CSV file, where `fields` maps the other
+    columns' normalized names (see `field_name`) to their non-empty values.
+    """
+    stream = _text_stream(file)
+    try:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        names = [field_name(name) for name in header or ()]
+        if field_name(column) not in names:
+            raise ValueError(f"CSV file must have a column named '{column}'.")
+        index = names.index(field_name(column))
+        others = [(i, name) for i, name in enumerate(names) if i != index and name]
+        for row in reader:
+            if len(row) > index:
+                value = row[index].strip()
+                if value:
+                    fields = {}
+                    for i, name in others:
+                        if i < len(row) and row[i].strip():
+                            fields[name] = row[i].strip()
+                    yield value, fields
+    finally:
+        if stream is not file:
+            stream.detach()
+
+class SeenSet:
+    """
+    Compact duplicate filter: stores a 64-bit fingerprint per address instead of the
+    address itself, which keeps millions of entries in a small fraction of the memory.
+    """
+    def __init__(self):
+        self._seen = set()
+
+    def add(self, email: str) -> bool:
+        """Adds a normalized `email` and returns True if it had not been seen before."""
+        # The built-in string hash is 64-bit and stable within a process, which is all we need.
+        key = hash(email)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        return True
+
+    def __len__(self):
+        return len(self._seen)
+
+class RecipientStream:
+    """
+    Validates, normalizes and de-duplicates addresses lazily while they are read.
+    Items may also be (email, fields) pairs, which are yielded back with the
+    normalized address. Counters are final once the stream has been fully consumed.
+    """
+    def __init__(self, emails: Iterable[Union[str, Tuple[str, Dict[str, str]]]], validator: Optional[EmailValidator] = None, preview_size: int = 20):
+        self._emails = emails
+        self.validator = validator or EmailValidator()
+        self.preview_size = preview_size
+        self.valid = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.rejected: Dict[str, int] = {}
+        self.preview: List[str] = []
+        self.invalid_preview: List[str] = []
+
+    def __iter__(self) -> Iterator[Union[str, Tuple[str, Dict[str, str]]]]:
+        seen = SeenSet()
+        check = self.validator.check
+        for item in self._emails:
+            fields = None
+            if type(item) is tuple:
+                raw, fields = item
+            else:
+                raw = item
+            email, reason = check(raw)
+            if reason is not None:
+                self.invalid += 1
+                self.rejected[reason] = self.rejected.get(reason, 0) + 1
+                if len(self.invalid_preview) < self.preview_size:
+                    self.invalid_preview.append(raw)
+                continue
+            if not seen.add(email):
+                self.duplicates += 1
+                continue
+            self.valid += 1
+            if len(self.preview) < self.preview_size:
+                self.preview.append(email)
+            yield email if fields is None else (email, fields)
+
+    def summary(self) -> dict:
+        return {
+            "count": self.valid,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "preview": self.preview,
+            "invalid_preview": self.invalid_preview
+        }
+
+def stream_from_csv(
+    file: IO,
+    column: str = "Email",
+    validator: Optional[EmailValidator] = None,
+    preview_size: int = 20,
+    with_fields: bool = False
+) -> RecipientStream:
+    """
+    Returns a lazily validated, de-duplicated stream of the CSV's email column, or of
+    (email, fields) pairs carrying the other columns when `with_fields` is set.
+    """
+    source = iter_csv_rows(file, column) if with_fields else iter_csv_column(file, column)
+    return RecipientStream(source, validator, preview_size)
 
-def parse_from_csv(file: IO) -> List[str]:
-    """Parses a CSV file for an 'Email' column and returns a list of emails."""
+def parse_from_csv(file: IO, with_fields: bool = False) -> List[Union[str, Tuple[str, Dict[str, str]]]]:
+    """
+    Parses a CSV file for an 'Email' column and returns a list of emails, or of
+    (email, fields) pairs with the other columns when `with_fields` is set.
+    """
     try:
-        df = pd.read_csv(file)
-        if 'Email' in df.columns:
-            # Drop any missing values and convert to a list
-            return df['Email'].dropna().tolist()
-        else:
-            # Raise an error if the required column is missing
-            raise ValueError("CSV file must have a column named 'Email'.")
+        return list(stream_from_csv(file, with_fields=with_fields))
     except Exception as e:
         # Re-raise with a more specific message for easier debugging
-        raise ValueError(f"Error reading or parsing the CSV file: {e}")
\ No newline at end of file
+        raise ValueError(f"Error reading or parsing the CSV file: {e}")
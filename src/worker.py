@@ -0,0 +1,119 @@
+import os
+import uuid
+import socket
+import signal
+import asyncio
+import argparse
+import multiprocessing
+from dotenv import load_dotenv
+
+from src.core.job_store import JobStore
+from src.core.campaign import build_sender, run_job
+
+load_dotenv()
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "automail_jobs.db")
+HEARTBEAT_INTERVAL = 15.0
+
+
+async def heartbeat(store: JobStore, job_id: str):
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        store.touch(job_id)
+
+
+async def process_job(store: JobStore, job: dict, password: str):
+    job_id = job["id"]
+
+    def report(**fields):
+        # Workers report through the job store; the API reads status from there.
+        pass
+
+    beat = asyncio.create_task(heartbeat(store, job_id))
+    try:
+        sender = build_sender(job["sender_email"], password)
+        await sender.connect()
+    except Exception as e:
+        store.set_status(job_id, "failed", str(e))
+        store.discard_credentials(job_id)
+        beat.cancel()
+        return
+
+    try:
+        print(f"[worker {os.getpid()}] Sending job {job_id} ({job['total']} recipients)")
+        await run_job(store, job, sender, report)
+    finally:
+        store.discard_credentials(job_id)
+        beat.cancel()
+
+
+async def worker_loop(store: JobStore, worker_id: str, poll_interval: float, stop: asyncio.Event):
+    while not stop.is_set():
+        claimed = store.claim_next(worker_id)
+        if claimed is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        job, password = claimed
+        await process_job(store, job, password)
+
+
+async def run_worker(jobs_per_process: int, poll_interval: float):
+    store = JobStore(JOB_STORE_PATH)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    print(f"[worker {os.getpid()}] Ready, polling {JOB_STORE_PATH}")
+    await asyncio.gather(*(worker_loop(store, worker_id, poll_interval, stop) for _ in range(jobs_per_process)))
+    store.close()
+
+
+def worker_process(jobs_per_process: int, poll_interval: float):
+    asyncio.run(run_worker(jobs_per_process, poll_interval))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-Mail sending worker")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 1)),
+                        help="Number of worker processes to start.")
+    parser.add_argument("--jobs-per-process", type=int, default=int(os.getenv("WORKER_JOBS_PER_PROCESS", "1")),
+                        help="Campaigns each process sends concurrently.")
+    parser.add_argument("--poll-interval", type=float, default=float(os.getenv("WORKER_POLL_INTERVAL", "1.0")),
+                        help="Seconds between queue polls when idle.")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        worker_process(args.jobs_per_process, args.poll_interval)
+        return
+
+    processes = [
+        multiprocessing.Process(target=worker_process, args=(args.jobs_per_process, args.poll_interval))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def shutdown(signum, frame):
+        # Children stop after their current job on SIGTERM; ignore repeated signals meanwhile.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
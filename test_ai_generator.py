@@ -0,0 +1,107 @@
+import asyncio
+import json
+import time
+
+from src.core.ai_generator import GeminiEmailGenerator
+from src.core.fake_model import FakeGenerativeModel, FakeResponse
+from src.core.response_cache import ResponseCache
+
+
+def make_generator(model, **kwargs):
+    kwargs.setdefault("retry_backoff", 0.001)
+    return GeminiEmailGenerator(model=model, cache=ResponseCache(), **kwargs)
+
+
+class CountingModel(FakeGenerativeModel):
+    """Fake async model that records how many calls overlap."""
+    def __init__(self, latency):
+        super().__init__(respond=lambda prompt: json.dumps({"subject": prompt[-8:], "body": "B"}), latency=latency)
+        self.active = 0
+        self.peak = 0
+
+    async def generate_content_async(self, prompt):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().generate_content_async(prompt)
+        finally:
+            self.active -= 1
+
+
+def test_async_generation_bounds_concurrency_and_coalesces():
+    model = CountingModel(latency=0.02)
+    generator = make_generator(model, max_concurrency=3)
+
+    async def run():
+        prompts = [f"prompt {i}" for i in range(12)] * 2
+        return await asyncio.gather(*(generator.generate_email_async(p) for p in prompts))
+
+    results = asyncio.run(run())
+
+    assert len(results) == 24
+    assert model.calls == 12
+    assert model.peak <= 3
+
+
+def test_timeouts_are_retried_then_reported():
+    class SlowThenFast(FakeGenerativeModel):
+        async def generate_content_async(self, prompt):
+            self.calls += 1
+            if self.calls == 1:
+                await asyncio.sleep(1)
+            return FakeResponse(json.dumps({"subject": "S", "body": "B"}))
+
+    model = SlowThenFast()
+    generator = make_generator(model, timeout=0.05, max_retries=1)
+    assert asyncio.run(generator.generate_email_async("p")) == {"subject": "S", "body": "B"}
+    assert model.calls == 2
+
+    generator = make_generator(FakeGenerativeModel(latency=1), timeout=0.02, max_retries=1)
+    try:
+        asyncio.run(generator.generate_email_async("p"))
+    except RuntimeError as e:
+        assert "did not answer" in str(e)
+    else:
+        raise AssertionError("expected a timeout")
+
+
+def test_permanent_errors_are_not_retried():
+    class Rejecting(FakeGenerativeModel):
+        async def generate_content_async(self, prompt):
+            self.calls += 1
+            error = Exception("400 API key not valid")
+            error.code = 400
+            raise error
+
+    model = Rejecting()
+    generator = make_generator(model, max_retries=3)
+    try:
+        asyncio.run(generator.generate_email_async("p"))
+    except RuntimeError:
+        pass
+    assert model.calls == 1
+
+
+def test_sync_models_run_off_the_event_loop():
+    class SyncOnlyModel:
+        def generate_content(self, prompt):
+            time.sleep(0.05)
+            return FakeResponse(json.dumps({"subject": "S", "body": "B"}))
+
+    generator = make_generator(SyncOnlyModel())
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        await generator.generate_email_async("p")
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) > 3
@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import pytest
+
+import src.core.async_email_sender as async_sender_module
+from src.core.async_email_sender import AsyncDelivery, AsyncEmailSender
+from src.core.rate_limiter import SenderRateLimiter
+
+
+class FakeAsyncSMTP:
+    """Stands in for aiosmtplib.SMTP without touching the network."""
+    instances = []
+    outbox = []
+    active = 0
+    peak = 0
+
+    def __init__(self, hostname=None, port=None, use_tls=False):
+        self.is_connected = False
+        FakeAsyncSMTP.instances.append(self)
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def login(self, user, password):
+        pass
+
+    async def sendmail(self, sender, recipients, message):
+        FakeAsyncSMTP.active += 1
+        FakeAsyncSMTP.peak = max(FakeAsyncSMTP.peak, FakeAsyncSMTP.active)
+        await asyncio.sleep(0.001)
+        FakeAsyncSMTP.active -= 1
+        FakeAsyncSMTP.outbox.append(list(recipients))
+        return {}, "OK"
+
+    async def quit(self):
+        self.is_connected = False
+
+
+def make_sender(monkeypatch, **kwargs):
+    FakeAsyncSMTP.instances = []
+    FakeAsyncSMTP.outbox = []
+    FakeAsyncSMTP.active = FakeAsyncSMTP.peak = 0
+    monkeypatch.setattr(async_sender_module.aiosmtplib, "SMTP", FakeAsyncSMTP)
+    kwargs.setdefault("rate_limiter", SenderRateLimiter(rate=1e6, burst=1e6))
+    return AsyncEmailSender("me@example.com", "secret", **kwargs)
+
+
+def test_individual_emails_respect_concurrency_limit(monkeypatch):
+    sender = make_sender(monkeypatch, max_concurrency=3)
+    recipients = [f"user{i}@example.com" for i in range(30)]
+    progress = []
+
+    async def run():
+        await sender.connect()
+        await sender.send_individual_emails(
+            recipients, "Hi", "<p>Hello</p>",
+            progress_callback=lambda i, total, r: progress.append(i)
+        )
+        await sender.close()
+
+    asyncio.run(run())
+
+    assert sorted(r[0] for r in FakeAsyncSMTP.outbox) == sorted(recipients)
+    assert FakeAsyncSMTP.peak <= 3
+    assert len(FakeAsyncSMTP.instances) <= 3
+    assert progress == list(range(30))
+
+
+def test_batch_email_sends_one_message(monkeypatch):
+    sender = make_sender(monkeypatch)
+    asyncio.run(sender.send_batch_email(["a@example.com", "b@example.com"], "Hi", "Body"))
+    assert FakeAsyncSMTP.outbox == [["a@example.com", "b@example.com"]]
+
+
+def test_envelope_batched_emails_group_recipients_by_domain(monkeypatch):
+    sender = make_sender(monkeypatch, max_concurrency=2)
+    recipients = [f"user{i}@{domain}" for i in range(5) for domain in ("a.com", "b.org")]
+    progress = []
+
+    async def run():
+        await sender.send_envelope_batched_emails(
+            recipients, "Hi", "Body", envelope_size=3,
+            progress_callback=lambda i, total, r: progress.append(r)
+        )
+        await sender.close()
+
+    asyncio.run(run())
+
+    assert len(FakeAsyncSMTP.outbox) == 4
+    for envelope in FakeAsyncSMTP.outbox:
+        assert len({r.split("@")[1] for r in envelope}) == 1
+    assert sorted(progress) == sorted(recipients)
+
+
+def test_batch_email_is_split_into_undisclosed_chunks(monkeypatch):
+    sender = make_sender(monkeypatch, max_concurrency=2)
+    messages = []
+    original = FakeAsyncSMTP.sendmail
+
+    async def capture(self, sender_email, recipients, message):
+        messages.append(message)
+        return await original(self, sender_email, recipients, message)
+
+    monkeypatch.setattr(FakeAsyncSMTP, "sendmail", capture)
+    recipients = [f"user{i}@example.com" for i in range(250)]
+    report = asyncio.run(sender.send_batch_email(recipients, "Hi", "Body", chunk_size=100))
+
+    assert sorted(len(envelope) for envelope in FakeAsyncSMTP.outbox) == [50, 100, 100]
+    assert all(b"To: undisclosed-recipients:;" in message for message in messages)
+    assert report.sent == 250
+
+
+def test_delivery_subclass_missing_a_method_fails_at_construction():
+    class Incomplete(AsyncDelivery):
+        async def connect(self):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        Incomplete()
+
+
+def test_message_build_does_not_block_the_event_loop(monkeypatch):
+    sender = make_sender(monkeypatch)
+    build = async_sender_module.MessageTemplate.from_yagmail
+    building = []
+
+    def slow_build(*args):
+        started = time.monotonic()
+        time.sleep(0.2)
+        building.append((started, time.monotonic()))
+        return build(*args)
+
+    monkeypatch.setattr(async_sender_module.MessageTemplate, "from_yagmail", slow_build)
+    ticks = []
+
+    async def ticker():
+        for _ in range(10):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    async def run():
+        await asyncio.gather(sender.compile_message("Hi", "<p>Hello</p>"), ticker())
+
+    asyncio.run(run())
+    started, finished = building[0]
+    assert any(started < tick < finished for tick in ticks)
@@ -0,0 +1,133 @@
+import asyncio
+import io
+import os
+import time
+import threading
+
+import src.core.attachment_spool as spool_module
+import src.core.campaign as campaign
+from src.core.attachment_spool import AttachmentSpool, safe_filename, spool_from_env
+from src.core.job_store import JobStore
+from test_async_email_sender import make_sender
+
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    spool = AttachmentSpool(str(tmp_path), chunk_size=7)
+    first = spool.store(io.BytesIO(b"resume contents" * 10), "cv.pdf", "task-1")
+    second = spool.store(io.BytesIO(b"resume contents" * 10), "cv.pdf", "task-2")
+    renamed = spool.store(io.BytesIO(b"resume contents" * 10), "other.pdf", "task-3")
+
+    assert first == second
+    assert os.path.dirname(renamed) == os.path.dirname(first)
+    assert open(renamed, "rb").read() == b"resume contents" * 10
+    assert spool.references(first) == 3
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".upload-")]
+
+
+def test_files_are_removed_with_their_last_reference(tmp_path):
+    spool = AttachmentSpool(str(tmp_path))
+    path = spool.store(io.BytesIO(b"data"), "a.txt", "task-1")
+    spool.store(io.BytesIO(b"data"), "a.txt", "task-2")
+
+    spool.release(path, "task-1")
+    spool.release(path, "task-1")
+    assert os.path.exists(path)
+    spool.release(path, "task-2")
+    assert not os.path.exists(os.path.dirname(path))
+
+    outside = tmp_path.parent / "keep.txt"
+    outside.write_text("x")
+    spool.release(str(outside), "task-1")
+    assert outside.exists()
+
+
+def test_client_filenames_cannot_escape_the_spool():
+    assert safe_filename("../../etc/passwd") == "passwd"
+    assert safe_filename("C:\\Users\\me\\CV final.pdf") == "CV final.pdf"
+    assert safe_filename("..") == "attachment"
+    assert safe_filename(None) == "attachment"
+
+
+def test_separate_spools_on_one_directory_do_not_lose_shared_files(tmp_path):
+    # Stands in for the API and a worker, each with its own spool on the same directory.
+    spools = [AttachmentSpool(str(tmp_path)) for _ in range(4)]
+    errors = []
+
+    def churn(spool, worker):
+        try:
+            for i in range(200):
+                path = spool.store(io.BytesIO(b"shared"), "a.txt", f"{worker}-{i}")
+                assert open(path, "rb").read() == b"shared"
+                spool.release(path, f"{worker}-{i}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=churn, args=(spool, n)) for n, spool in enumerate(spools)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert [name for name in os.listdir(tmp_path) if not name.startswith(".")] == []
+
+
+def test_sweep_expires_stale_references(tmp_path):
+    spool = AttachmentSpool(str(tmp_path), ttl=60)
+    stale = spool.store(io.BytesIO(b"old"), "old.txt", "failed-task")
+    fresh = spool.store(io.BytesIO(b"new"), "new.txt", "running-task")
+    past = time.time() - 120
+    os.utime(os.path.join(os.path.dirname(stale), ".refs", "failed-task"), (past, past))
+
+    assert spool.sweep() == 1
+    assert not os.path.exists(os.path.dirname(stale))
+    assert os.path.exists(fresh)
+
+    spool.refresh(fresh, "running-task")
+    assert spool.sweep(now=time.time() + 30) == 0
+    assert spool.sweep(now=time.time() + 120) == 1
+    assert not os.path.exists(os.path.dirname(fresh))
+
+
+def test_spool_from_env_is_shared(tmp_path, monkeypatch):
+    monkeypatch.setenv("ATTACHMENT_SPOOL_DIR", str(tmp_path))
+    assert spool_from_env() is spool_from_env()
+
+
+def test_sweep_ignores_files_that_vanish_while_it_runs(tmp_path, monkeypatch):
+    spool = AttachmentSpool(str(tmp_path), ttl=60)
+    path = spool.store(io.BytesIO(b"data"), "a.txt", "task-1")
+    open(os.path.join(str(tmp_path), ".upload-abc"), "wb").close()
+    scandir = os.scandir
+    raced = set()
+
+    def racing_scandir(directory):
+        if not isinstance(directory, str) or directory in raced or not (
+            directory == str(tmp_path) or directory.endswith(".refs")
+        ):
+            return scandir(directory)
+        raced.add(directory)
+        # Another process finishes its upload and releases its reference meanwhile.
+        entries = list(scandir(directory))
+        for entry in entries:
+            if entry.name.startswith(".upload-") or entry.name == "task-1":
+                os.remove(entry.path)
+        return iter(entries)
+
+    monkeypatch.setattr(spool_module.os, "scandir", racing_scandir)
+    assert spool.sweep() == 0
+    assert not os.path.exists(os.path.dirname(path))
+
+
+def test_failing_sweep_does_not_change_the_campaign_outcome(tmp_path, monkeypatch):
+    def broken_sweep():
+        raise OSError("spool unavailable")
+
+    monkeypatch.setattr(campaign.attachment_spool, "sweep", broken_sweep)
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.create_job("job-1", "me@example.com", "Hi", "Body", "individual", ["a@example.com"])
+    sender = make_sender(monkeypatch)
+
+    asyncio.run(campaign.run_job(store, store.get_job("job-1"), sender, lambda **fields: None))
+
+    assert store.get_job("job-1")["status"] == "completed"
@@ -0,0 +1,63 @@
+import threading
+
+from src.core.background_sends import BackgroundSends
+from src.core.delivery import DeliveryOutcome, DeliveryReport
+
+
+def report(sent=0, failed=0):
+    delivery = DeliveryReport()
+    delivery.sent, delivery.failed = sent, failed
+    return delivery
+
+
+def wait_for(sends, send_id):
+    sends.shutdown(wait=True)
+    return sends.status(send_id)
+
+
+def test_send_runs_in_the_background_and_reports_progress():
+    sends = BackgroundSends(max_workers=1)
+    release = threading.Event()
+    cleaned = []
+
+    def send(progress_callback, failure_callback):
+        release.wait(5)
+        progress_callback(1, 2, "a@example.com")
+        failure_callback(DeliveryOutcome("b@example.com", "failed", "550 No such user", 1))
+        return report(sent=1, failed=1)
+
+    sends.submit("s1", 2, send, "Sending", cleanup=lambda: cleaned.append("s1"))
+    assert sends.status("s1")["status"] in ("queued", "running")
+    assert sends.running() == 1
+    release.set()
+
+    state = wait_for(sends, "s1")
+    assert state["status"] == "completed"
+    assert state["sent"] == 1 and state["failed"] == 1 and state["total"] == 2
+    assert "1 could not be delivered" in state["message"]
+    assert [f.recipient for f in sends.failures("s1")] == ["b@example.com"]
+    assert cleaned == ["s1"]
+    assert sends.running() == 0
+
+
+def test_an_error_marks_the_send_failed_and_still_cleans_up():
+    sends = BackgroundSends()
+    cleaned = []
+
+    def send(progress_callback, failure_callback):
+        raise ConnectionError("Failed to login to SMTP server.")
+
+    sends.submit("s2", 3, send, cleanup=lambda: cleaned.append(True))
+    state = wait_for(sends, "s2")
+    assert state["status"] == "failed"
+    assert state["message"] == "Failed to login to SMTP server."
+    assert cleaned == [True]
+
+
+def test_only_the_latest_failure_lists_are_kept():
+    sends = BackgroundSends(keep_failures=1)
+    for send_id in ("old", "new"):
+        sends.submit(send_id, 0, lambda progress, failure: report())
+    sends.shutdown()
+    assert sends.failures("old") == []
+    assert sends.status("old")["status"] == "completed"
@@ -0,0 +1,72 @@
+import smtplib
+
+from src.benchmarks.smtp_sink import SMTPSink
+from src.benchmarks.suite import BenchmarkOptions, compare, percentiles, run_scenario, run_suite
+
+
+def test_sink_accepts_mail_and_injects_faults():
+    with SMTPSink(error_rate=1.0) as sink:
+        client = smtplib.SMTP(sink.host, sink.port)
+        client.login("me@x.com", "secret")
+        try:
+            client.sendmail("me@x.com", ["a@x.com"], "Subject: Hi\r\n\r\nBody")
+        except smtplib.SMTPRecipientsRefused as e:
+            assert e.recipients["a@x.com"][0] == 550
+        else:
+            raise AssertionError("recipient was not refused")
+        sink.error_rate = 0.0
+        assert client.sendmail("me@x.com", ["a@x.com", "b@x.com"], "Subject: Hi\r\n\r\nBody") == {}
+        client.quit()
+        assert sink.stats()["messages"] == 1 and sink.stats()["recipients"] == 2
+
+    with SMTPSink(throttle_rate=1.0) as sink:
+        client = smtplib.SMTP(sink.host, sink.port)
+        try:
+            client.sendmail("me@x.com", ["a@x.com"], "Subject: Hi\r\n\r\nBody")
+        except smtplib.SMTPSenderRefused as e:
+            assert e.smtp_code == 451
+        else:
+            raise AssertionError("transaction was not throttled")
+        client.quit()
+
+
+def test_scenarios_report_throughput_latency_and_resources():
+    options = BenchmarkOptions(error_rate=0.1, batch_size=10)
+    scenarios = ["individual", "batch", "csv", "generation"]
+    report = run_suite(scenarios, sizes=[50], options=options, isolate=False, log=lambda line: None)
+    results = {r["scenario"]: r for r in report["results"]}
+
+    assert set(results) == set(scenarios)
+    assert results["individual"]["messages"] + results["individual"]["failed"] == 50
+    assert results["batch"]["messages"] == 5
+    assert results["csv"]["duplicates"] == 1 and results["csv"]["invalid"] == 1
+    assert results["generation"]["drafts"] == 50
+    for result in results.values():
+        assert result["per_second"] > 0 and result["cpu_seconds"] >= 0
+    assert results["csv"]["latency_ms"] is None
+    assert set(results["individual"]["latency_ms"]) == {"p50", "p90", "p99", "max"}
+    assert report["options"]["error_rate"] == 0.1
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    def report(per_second, p99, rss):
+        return {"results": [{
+            "scenario": "individual", "size": 1000, "per_second": per_second,
+            "latency_ms": {"p99": p99}, "peak_rss_mb": rss
+        }]}
+
+    assert compare(report(1000, 5.0, 100), report(900, 5.5, 110)) == []
+    regressions = compare(report(1000, 5.0, 100), report(700, 8.0, 100))
+    assert [r.split(": ")[1].split(" ")[0] for r in regressions] == ["throughput", "p99"]
+
+    slow_start = report(1000, 5.0, 100)
+    slow_start["results"][0]["heavy_modules"] = ["pypdf"]
+    assert compare(report(1000, 5.0, 100), slow_start) == ["individual @ 1,000: now imports pypdf at startup"]
+    assert percentiles([0.001, 0.002, 0.003, 0.004]) == {"p50": 3.0, "p90": 4.0, "p99": 4.0, "max": 4.0}
+
+
+def test_api_cold_start_skips_heavy_imports():
+    result = run_scenario("startup_api", 1, BenchmarkOptions())
+    assert result["module"] == "src.main"
+    assert result["heavy_modules"] == []
+    assert result["seconds"] > 0
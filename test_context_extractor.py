@@ -0,0 +1,87 @@
+import asyncio
+
+import pypdf
+
+from src.core import context_extractor
+from src.core.context_extractor import ContextExtractor, extract_pdf_text
+
+
+def make_pdf(pages):
+    """A minimal PDF with one line of Helvetica text per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = b"BT /F1 12 Tf 72 720 Td (" + text.encode("latin-1") + b") Tj ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % len(objects)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def test_pdf_extraction_stops_at_the_page_budget():
+    data = make_pdf([f"Page {n}" for n in range(1, 6)])
+    text = extract_pdf_text(data, max_chars=1000, max_pages=2)
+    assert "Page 1" in text and "Page 2" in text
+    assert "Page 3" not in text
+
+
+def test_pdf_extraction_stops_at_the_character_budget(monkeypatch):
+    data = make_pdf(["A" * 50, "B" * 50, "C" * 50])
+    visited = []
+    original = pypdf.PageObject.extract_text
+
+    def counting_extract_text(page, *args, **kwargs):
+        visited.append(page)
+        return original(page, *args, **kwargs)
+
+    monkeypatch.setattr(pypdf.PageObject, "extract_text", counting_extract_text)
+    text = extract_pdf_text(data, max_chars=60, max_pages=10)
+    assert len(text) == 60
+    assert text.startswith("A" * 50)
+    # The third page is never parsed.
+    assert len(visited) == 2
+
+
+def test_repeated_uploads_are_extracted_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(context_extractor, "extract_plain_text", lambda data, max_chars: calls.append(1) or "resume")
+    extractor = ContextExtractor(workers=0)
+    assert extractor.extract(b"same bytes", "cv.txt") == "resume"
+    assert extractor.extract(b"same bytes", "renamed.txt") == "resume"
+    assert extractor.extract(b"other bytes", "cv.txt") == "resume"
+    assert len(calls) == 2
+
+
+def test_plain_text_and_unsupported_uploads():
+    extractor = ContextExtractor(max_chars=5, workers=0)
+    assert extractor.extract("héllo world".encode("utf-8"), "cv.txt") == "héllo"
+    assert extractor.extract(b"\x00\x01", "photo.png") == ""
+
+
+def test_async_extraction_runs_in_the_process_pool():
+    extractor = ContextExtractor(max_pages=1, workers=1)
+    data = make_pdf(["First page", "Second page"])
+
+    async def run():
+        return await asyncio.gather(*(extractor.extract_async(data, "cv.pdf") for _ in range(3)))
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        extractor.close()
+    assert all("First page" in text and "Second page" not in text for text in results)
+    assert extractor.cache.misses == 1
@@ -0,0 +1,104 @@
+import asyncio
+import smtplib
+
+import aiosmtplib
+
+from src.core.delivery import (
+    DeliveryEngine, RetryScheduler, PERMANENT, TRANSIENT, classify_failure, is_sender_error
+)
+from test_async_email_sender import FakeAsyncSMTP, make_sender as make_async_sender
+from test_email_sender import FakeClient, FakeSMTPSession, make_sender
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_failures_are_classified_by_reply_code_and_kind():
+    assert classify_failure(code=550) == PERMANENT
+    assert classify_failure(code=451) == TRANSIENT
+    assert classify_failure(smtplib.SMTPDataError(554, b"Rejected")) == PERMANENT
+    assert classify_failure(smtplib.SMTPServerDisconnected("gone")) == TRANSIENT
+    assert classify_failure(aiosmtplib.SMTPReadTimeoutError("slow")) == TRANSIENT
+    assert classify_failure(KeyError("first_name")) == PERMANENT
+    assert is_sender_error(smtplib.SMTPAuthenticationError(535, b"Bad credentials"))
+    assert not is_sender_error(smtplib.SMTPSenderRefused(421, b"Try later", "me@x.com"))
+
+
+def test_scheduler_returns_retries_in_due_order():
+    clock = FakeClock()
+    scheduler = RetryScheduler(base_delay=10, max_delay=100, clock=clock)
+    scheduler.schedule((["late@x.com"], None, 3))
+    scheduler.schedule((["soon@x.com"], None, 1))
+    assert scheduler.pop_due() is None
+    assert 0 < scheduler.wait_time() <= 10
+    clock.now = 10
+    assert scheduler.pop_due()[0] == ["soon@x.com"]
+    assert scheduler.pop_due() is None
+    clock.now = 40
+    assert scheduler.pop_due()[0] == ["late@x.com"]
+    assert len(scheduler) == 0
+
+
+def test_engine_retries_transient_refusals_and_defers_after_the_limit():
+    clock = FakeClock()
+    failures = []
+    engine = DeliveryEngine(
+        [(["a@x.com", "b@x.com"], None)], 2, failure_callback=failures.append,
+        max_retries=1, scheduler=RetryScheduler(base_delay=1, clock=clock)
+    )
+    attempt, _ = engine.next()
+    engine.delivered(attempt, {"b@x.com": (451, b"Mailbox busy")})
+    assert engine.next() == (None, engine.scheduler.wait_time())
+
+    clock.now = 10
+    retry, _ = engine.next()
+    assert retry == (["b@x.com"], None, 1)
+    engine.failed(retry, smtplib.SMTPServerDisconnected("gone"))
+    assert engine.next() == (None, None)
+    assert [(f.recipient, f.status, f.attempts) for f in failures] == [("b@x.com", "deferred", 2)]
+    assert engine.report.as_dict() == {"sent": 1, "failed": 0, "deferred": 1, "retries": 1}
+
+
+def test_sender_keeps_going_past_bad_recipients(monkeypatch):
+    sender = make_sender(monkeypatch, max_workers=2, retry_delay=0.001, max_throttle_retries=0)
+    original = FakeSMTPSession.sendmail
+    flaky = {"busy@x.com": 1}
+
+    def sendmail(self, sender_email, recipients, msg):
+        recipient = recipients[0]
+        if recipient == "gone@x.com":
+            raise smtplib.SMTPRecipientsRefused({recipient: (550, b"No such user")})
+        if flaky.get(recipient):
+            flaky[recipient] -= 1
+            raise smtplib.SMTPRecipientsRefused({recipient: (450, b"Mailbox busy")})
+        return original(self, sender_email, recipients, msg)
+
+    monkeypatch.setattr(FakeSMTPSession, "sendmail", sendmail)
+    failures = []
+    recipients = ["a@x.com", "gone@x.com", "busy@x.com"] + [f"u{i}@x.com" for i in range(10)]
+    report = sender.send_individual_emails(recipients, "Hi", "Body", failure_callback=failures.append)
+
+    delivered = sorted(r[0] for _, r in FakeClient.outbox)
+    assert delivered == sorted(r for r in recipients if r != "gone@x.com")
+    assert [(f.recipient, f.status) for f in failures] == [("gone@x.com", "failed")]
+    assert (report.sent, report.failed, report.retries) == (12, 1, 1)
+
+
+def test_async_sender_stops_only_on_account_errors(monkeypatch):
+    sender = make_async_sender(monkeypatch, max_concurrency=2)
+
+    async def sendmail(self, sender_email, recipients, message):
+        raise aiosmtplib.SMTPAuthenticationError(535, "Bad credentials")
+
+    monkeypatch.setattr(FakeAsyncSMTP, "sendmail", sendmail)
+    try:
+        asyncio.run(sender.send_individual_emails([f"u{i}@x.com" for i in range(20)], "Hi", "Body"))
+    except RuntimeError as e:
+        assert "Bad credentials" in str(e)
+    else:
+        raise AssertionError("authentication failure did not stop the run")
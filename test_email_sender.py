@@ -0,0 +1,191 @@
+import smtplib
+import threading
+
+import pytest
+
+import src.core.email_sender as email_sender_module
+from src.core.email_sender import EmailSender
+from src.core.rate_limiter import SenderRateLimiter
+
+
+class FakeSMTPSession:
+    def __init__(self, outbox, drop_first=False):
+        self.outbox = outbox
+        self.drop_first = drop_first
+        self.throttle_next = FakeClient.throttle_next
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def has_extn(self, name):
+        return False
+
+    def sendmail(self, sender, recipients, msg):
+        if self.throttle_next:
+            self.throttle_next -= 1
+            raise smtplib.SMTPSenderRefused(421, b"4.7.0 Try again later", sender)
+        if self.drop_first:
+            self.drop_first = False
+            raise smtplib.SMTPServerDisconnected("connection dropped")
+        self.outbox.append((sender, list(recipients)))
+        return {}
+
+    def quit(self):
+        pass
+
+
+class FakeClient:
+    """Stands in for yagmail.SMTP without touching the network."""
+    logins = 0
+    lock = threading.Lock()
+    outbox = []
+    drop_first = False
+    throttle_next = 0
+
+    def __init__(self, user, password, **kwargs):
+        self.user = user
+        self.password = password
+        self.smtp = None
+
+    def login(self):
+        if self.password == "wrong":
+            raise smtplib.SMTPAuthenticationError(535, b"Bad credentials")
+        with FakeClient.lock:
+            FakeClient.logins += 1
+            drop = FakeClient.drop_first
+            FakeClient.drop_first = False
+        self.smtp = FakeSMTPSession(FakeClient.outbox, drop_first=drop)
+
+    def close(self):
+        self.smtp = None
+
+    def prepare_send(self, to=None, subject=None, contents=None, attachments=None):
+        recipients = to if isinstance(to, list) else [to]
+        return recipients, f"Subject: {subject}\n\n{contents}"
+
+
+def make_sender(monkeypatch, **kwargs):
+    FakeClient.logins = 0
+    FakeClient.outbox = []
+    FakeClient.drop_first = False
+    FakeClient.throttle_next = 0
+    monkeypatch.setattr(email_sender_module.yagmail, "SMTP", FakeClient)
+    kwargs.setdefault("rate_limiter", SenderRateLimiter(rate=1e6, burst=1e6))
+    return EmailSender("me@example.com", "secret", **kwargs)
+
+
+def test_individual_emails_use_pooled_connections(monkeypatch):
+    sender = make_sender(monkeypatch, max_workers=3, rate_per_connection=None)
+    recipients = [f"user{i}@example.com" for i in range(50)]
+    progress = []
+
+    sender.send_individual_emails(
+        recipients, "Hi", "<p>Hello</p>",
+        progress_callback=lambda i, total, r: progress.append((i, total))
+    )
+
+    assert sorted(r[0] for _, r in FakeClient.outbox) == sorted(recipients)
+    assert FakeClient.logins <= 3
+    assert [i for i, _ in progress] == list(range(50))
+    assert all(total == 50 for _, total in progress)
+
+
+def test_progress_is_reported_after_delivery_from_worker_threads(monkeypatch):
+    sender = make_sender(monkeypatch, max_workers=2, rate_per_connection=None)
+    calls = []
+
+    def progress(index, total, recipient):
+        delivered = any(recipient in r for _, r in FakeClient.outbox)
+        calls.append((delivered, threading.current_thread() is threading.main_thread()))
+
+    sender.send_individual_emails([f"user{i}@example.com" for i in range(6)], "Hi", "Body", progress_callback=progress)
+
+    assert calls == [(True, False)] * 6
+
+
+def test_login_switches_to_a_new_password_once_it_works(monkeypatch):
+    sender = make_sender(monkeypatch, max_workers=1, rate_per_connection=None)
+    with pytest.raises(ConnectionError):
+        sender.login("wrong")
+    sender.login("rotated")
+    sender.pool.close()
+    with sender.pool.connection() as conn:
+        assert conn.client.password == "rotated"
+
+
+def test_dropped_session_is_reconnected(monkeypatch):
+    sender = make_sender(monkeypatch, max_workers=1, rate_per_connection=None)
+    sender.pool.close()
+    FakeClient.drop_first = True
+
+    sender.send_individual_emails(["a@example.com", "b@example.com"], "Hi", "Body")
+
+    assert [r[0] for _, r in FakeClient.outbox] == ["a@example.com", "b@example.com"]
+    assert FakeClient.logins == 3
+
+
+def test_batch_email_sends_single_message(monkeypatch):
+    sender = make_sender(monkeypatch)
+    sender.send_batch_email(["a@example.com", "b@example.com"], "Hi", "Body")
+    assert FakeClient.outbox == [("me@example.com", ["a@example.com", "b@example.com"])]
+
+
+def test_throttling_reply_backs_off_and_retries(monkeypatch):
+    limiter = SenderRateLimiter(rate=1e6, burst=1e6, base_backoff=0.01)
+    sender = make_sender(monkeypatch, max_workers=1, rate_limiter=limiter)
+    sender.pool.close()
+    FakeClient.throttle_next = 2
+
+    sender.send_individual_emails(["a@example.com"], "Hi", "Body")
+
+    assert [r[0] for _, r in FakeClient.outbox] == ["a@example.com"]
+    assert limiter.effective_rate < 1e6
+
+
+def test_envelope_batched_emails_report_refused_recipients(monkeypatch):
+    sender = make_sender(monkeypatch, max_workers=1)
+    original = FakeSMTPSession.sendmail
+
+    def refuse_bob(self, sender_email, recipients, msg):
+        original(self, sender_email, recipients, msg)
+        return {"bob@b.org": (550, b"No such user")} if "bob@b.org" in recipients else {}
+
+    monkeypatch.setattr(FakeSMTPSession, "sendmail", refuse_bob)
+    progress, failures = [], []
+    report = sender.send_envelope_batched_emails(
+        ["ann@a.com", "bob@b.org", "cat@a.com", "dan@b.org"], "Hi", "Body",
+        progress_callback=lambda i, total, r: progress.append(r),
+        failure_callback=failures.append
+    )
+
+    assert [r for _, r in FakeClient.outbox][0] == ["ann@a.com", "cat@a.com"]
+    assert "dan@b.org" in progress and "bob@b.org" not in progress
+    assert [(f.recipient, f.status) for f in failures] == [("bob@b.org", "failed")]
+    assert (report.sent, report.failed, report.deferred) == (3, 1, 0)
+
+
+def test_batch_email_is_chunked_and_only_failed_chunks_are_retried(monkeypatch):
+    sender = make_sender(monkeypatch, max_workers=2, max_throttle_retries=0, retry_delay=0.001)
+    original = FakeSMTPSession.sendmail
+    failures_left = {"c@example.com": 1}
+
+    def fail_second_chunk_once(self, sender_email, recipients, msg):
+        if failures_left.get(recipients[0]):
+            failures_left[recipients[0]] -= 1
+            raise smtplib.SMTPDataError(451, b"Local error in processing")
+        return original(self, sender_email, recipients, msg)
+
+    monkeypatch.setattr(FakeSMTPSession, "sendmail", fail_second_chunk_once)
+    recipients = [f"{name}@example.com" for name in "abcdefg"]
+    chunks = []
+    report = sender.send_batch_email(
+        recipients, "Hi", "Body", chunk_size=2,
+        chunk_callback=lambda index, total, chunk: chunks.append((index, total))
+    )
+
+    assert sorted(r for _, r in FakeClient.outbox) == [
+        ["a@example.com", "b@example.com"], ["c@example.com", "d@example.com"],
+        ["e@example.com", "f@example.com"], ["g@example.com"]
+    ]
+    assert sorted(chunks) == [(0, 4), (1, 4), (2, 4), (3, 4)]
+    assert (report.sent, report.retries) == (7, 1)
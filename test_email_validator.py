@@ -0,0 +1,55 @@
+import json
+import time
+
+from src.utils.email_validator import (
+    DISPOSABLE, INVALID_SYNTAX, NO_MX, CachingResolver, EmailValidator, StaticResolver
+)
+from src.utils.recipient_parser import RecipientStream, parse_from_text
+
+
+def test_normalizes_case_and_idn_domains():
+    validator = EmailValidator()
+    assert validator.check("  John.Doe@Example.COM ") == ("john.doe@example.com", None)
+    assert validator.check("info@bücher.de") == ("info@xn--bcher-kva.de", None)
+
+
+def test_rejects_bad_syntax_and_disposable_domains():
+    validator = EmailValidator()
+    for raw in ["plainaddress", "a@b", "two@@example.com", "dot.@example.com", "x@-bad-.com", "a b@example.com"]:
+        assert validator.check(raw) == (None, INVALID_SYNTAX), raw
+    assert validator.check("someone@mailinator.com") == (None, DISPOSABLE)
+
+
+def test_mx_results_are_cached_per_domain():
+    stub = StaticResolver(["example.com"])
+    validator = EmailValidator(resolver=CachingResolver(stub))
+    assert validator.normalize("a@example.com") == "a@example.com"
+    assert validator.normalize("b@example.com") == "b@example.com"
+    assert validator.check("c@nowhere.test") == (None, NO_MX)
+    assert stub.lookups == 2
+
+
+def test_stream_counts_rejections_and_duplicates():
+    stream = RecipientStream(["A@example.com", "a@example.com", "bad", "x@yopmail.com"])
+    assert list(stream) == ["a@example.com"]
+    assert stream.duplicates == 1
+    assert stream.rejected == {INVALID_SYNTAX: 1, DISPOSABLE: 1}
+
+
+def test_non_string_entries_are_rejected_as_malformed():
+    stream = RecipientStream(json.loads('[123, null, "a@example.com", ["b@example.com"]]'))
+    assert list(stream) == ["a@example.com"]
+    assert stream.rejected == {INVALID_SYNTAX: 3}
+
+
+def test_parse_from_text_validates_and_dedupes():
+    assert parse_from_text("a@example.com, A@Example.com, nope") == ["a@example.com"]
+
+
+def test_million_addresses_in_seconds():
+    addresses = (f"user{i}@domain{i % 500}.com" for i in range(1_000_000))
+    start = time.perf_counter()
+    count = sum(1 for _ in RecipientStream(addresses))
+    elapsed = time.perf_counter() - start
+    assert count == 1_000_000
+    assert elapsed < 15
@@ -0,0 +1,156 @@
+import os
+import threading
+
+import pytest
+
+from src.core.job_store import JobStore, DEFERRED, FAILED, SENT
+
+
+def make_store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def test_resume_continues_from_first_unsent_recipient(tmp_path):
+    store = make_store(tmp_path)
+    recipients = [f"user{i}@example.com" for i in range(10)]
+    assert store.create_job("job-1", "me@example.com", "Hi", "Body", "individual", recipients) == 10
+
+    recorder = store.recorder("job-1", flush_every=3)
+    for email in recipients[:4]:
+        recorder.record(email, SENT)
+    recorder.record(recipients[4], FAILED, "550 no such user")
+    recorder.flush()
+
+    job = store.get_job("job-1")
+    assert (job["sent"], job["failed"], job["total"]) == (4, 1, 10)
+    assert store.unsent_recipients("job-1") == recipients[5:]
+
+
+def test_state_survives_reopening_the_store(tmp_path):
+    store = make_store(tmp_path)
+    store.create_job("job-2", "me@example.com", "Hi", "Body", "batch", ["a@example.com", "b@example.com"])
+    store.mark_all("job-2", SENT)
+    store.set_status("job-2", "completed", "done")
+    store.close()
+
+    reopened = make_store(tmp_path)
+    job = reopened.get_job("job-2")
+    assert (job["status"], job["sent"]) == ("completed", 2)
+    assert reopened.unsent_recipients("job-2") == []
+
+
+def test_large_job_is_paged(tmp_path):
+    store = make_store(tmp_path)
+    recipients = [f"user{i}@example.com" for i in range(20000)]
+    store.create_job("job-3", "me@example.com", "Hi", "Body", "individual", recipients)
+    assert list(store.iter_unsent("job-3", batch_size=1000)) == recipients
+
+
+def test_queued_jobs_are_claimed_once(tmp_path):
+    store = make_store(tmp_path)
+    other = make_store(tmp_path)
+    store.create_job("job-4", "me@example.com", "Hi", "Body", "individual", ["a@example.com"], status="queued")
+    store.enqueue("job-4", "secret")
+
+    job, password = store.claim_next("worker-a")
+    assert (job["id"], job["status"], password) == ("job-4", "running", "secret")
+    assert other.claim_next("worker-b") is None
+
+    store.discard_credentials("job-4")
+    store.enqueue("job-4", "new-secret")
+    assert other.claim_next("worker-b")[1] == "new-secret"
+
+
+def test_recipient_fields_round_trip(tmp_path):
+    store = make_store(tmp_path)
+    store.create_recipient_list("list-1", [("a@example.com", {"name": "Ann"}), "b@example.com"])
+    assert list(store.iter_recipient_list("list-1")) == ["a@example.com", "b@example.com"]
+
+    store.create_job(
+        "job-5", "me@example.com", "Hi", "Body", "personalized",
+        store.iter_recipient_list("list-1", with_fields=True)
+    )
+    assert store.unsent_recipients("job-5", with_fields=True) == [
+        ("a@example.com", {"name": "Ann"}), ("b@example.com", {})
+    ]
+
+
+def test_queued_passwords_are_encrypted_and_expire(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path, credentials_key="worker-secret", credentials_ttl=60)
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    store.create_job("job-5", "me@example.com", "Hi", "Body", "individual", ["a@example.com"], status="queued")
+    store.enqueue("job-5", "hunter2")
+
+    for name in (path, path + "-wal"):
+        if os.path.exists(name):
+            with open(name, "rb") as f:
+                assert b"hunter2" not in f.read()
+
+    # A worker without the key cannot use the password.
+    assert JobStore(path, credentials_key="", credentials_ttl=60).claim_next("worker-a") is None
+    store.enqueue("job-5", "hunter2")
+    assert JobStore(path, credentials_key="worker-secret", credentials_ttl=60).claim_next("worker-a")[1] == "hunter2"
+
+    # Passwords a dead worker left behind are purged once they expire.
+    store.enqueue("job-5", "hunter2")
+    store._conn.execute("UPDATE job_credentials SET created_at = created_at - 120")
+    store._conn.commit()
+    assert store.purge_credentials() == 1
+
+
+def test_counts_follow_retries_and_duplicate_addresses(tmp_path):
+    store = make_store(tmp_path)
+    recipients = ["a@example.com", "b@example.com", "b@example.com", "c@example.com", "d@example.com"]
+    store.create_job("job-6", "me@example.com", "Hi", "Body", "individual", recipients)
+
+    recorder = store.recorder("job-6", flush_every=100)
+    recorder.record("a@example.com", FAILED, "451 try later")
+    recorder.record("b@example.com", FAILED, "550 no such user")
+    recorder.record("a@example.com", SENT)
+    recorder.record("c@example.com", DEFERRED, "452 mailbox full")
+    recorder.record("a@example.com", FAILED, "late failure for a sent recipient")
+    recorder.flush()
+    recorder.record("c@example.com", FAILED, "452 mailbox full")
+    recorder.flush()
+    store.mark_all("job-6", SENT)
+
+    job = store.get_job("job-6")
+    recount = dict(store._conn.execute(
+        "SELECT state, COUNT(*) FROM recipients WHERE job_id = 'job-6' GROUP BY state"
+    ).fetchall())
+    assert (job["sent"], job["failed"]) == (recount[SENT], recount[FAILED]) == (2, 3)
+
+
+def test_streamed_jobs_commit_in_chunks(tmp_path):
+    store = make_store(tmp_path)
+    other_thread_done = []
+
+    def recipients():
+        for i in range(25):
+            if i == 15:
+                # A chunk has been written; the store must not be locked while the next one is read.
+                thread = threading.Thread(target=store.count_jobs, args=("queued",))
+                thread.start()
+                thread.join(timeout=2)
+                other_thread_done.append(not thread.is_alive())
+            yield f"user{i}@example.com"
+
+    assert store.create_job("job-7", "me@example.com", "Hi", "Body", "individual", recipients(), chunk_size=10) == 25
+    assert other_thread_done == [True]
+    assert store.get_job("job-7")["total"] == 25
+
+
+def test_failed_upload_leaves_nothing_behind(tmp_path):
+    store = make_store(tmp_path)
+
+    def broken():
+        yield "a@example.com"
+        raise ValueError("bad row")
+
+    with pytest.raises(ValueError):
+        store.create_job("job-8", "me@example.com", "Hi", "Body", "individual", broken(), chunk_size=1)
+    with pytest.raises(ValueError):
+        store.create_recipient_list("list-2", broken(), chunk_size=1)
+    assert store.get_job("job-8") is None and not store.recipient_list_exists("list-2")
+    assert store._conn.execute("SELECT COUNT(*) FROM recipients").fetchone()[0] == 0
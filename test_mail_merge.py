@@ -0,0 +1,85 @@
+import email
+import time
+
+import yagmail
+
+from src.core.mail_merge import compile_template, has_placeholders, render_stream
+from src.core.message_builder import MergeMessageTemplate
+from test_email_sender import FakeClient, make_sender
+
+
+# Captured before any test replaces yagmail.SMTP with a fake.
+_YAGMAIL_SMTP = yagmail.SMTP
+
+
+class MimeBuilder:
+    """Builds real yagmail MIME output without a connection."""
+    user = "me@example.com"
+
+    def prepare_send(self, **kwargs):
+        return _YAGMAIL_SMTP("me@example.com", "x").prepare_send(**kwargs)
+
+
+def test_template_fills_fields_and_defaults():
+    template = compile_template("Hi {{ First Name | there }}, welcome to {{company}}!")
+    assert template.fields == ["first_name", "company"]
+    assert template.render({"first_name": "Ann", "company": "Acme"}) == "Hi Ann, welcome to Acme!"
+    assert template.render({}) == "Hi there, welcome to !"
+    assert compile_template("<p>{{name}}</p>").render({"name": "<b>"}, escape=True) == "<p>&lt;b&gt;</p>"
+    assert not has_placeholders("plain text", None)
+
+
+def test_render_stream_is_lazy():
+    def rows():
+        yield "a@x.com", {"name": "Ann"}
+        raise AssertionError("rendered ahead of consumption")
+
+    stream = render_stream("Hi {{name}}", "<p>{{name}}</p>", rows())
+    assert next(stream) == ("a@x.com", "Hi Ann", "<p>Ann</p>")
+
+
+def test_merge_message_renders_each_recipient():
+    template = MergeMessageTemplate.from_yagmail(
+        MimeBuilder(), "Hello {{name}} é", "<p>Dear {{name|friend}} at {{company}}</p>"
+    )
+
+    msg = email.message_from_bytes(template.render("ann@x.com", {"name": "Ann", "company": "A & B"}))
+    parts = {p.get_content_type(): p.get_payload(decode=True).decode() for p in msg.walk() if not p.is_multipart()}
+    assert str(email.header.make_header(email.header.decode_header(msg["Subject"]))) == "Hello Ann é"
+    assert msg["To"] == "ann@x.com"
+    # Only the HTML part escapes merged values.
+    assert "Dear Ann at A &amp; B" in parts["text/html"]
+    assert "Dear Ann at A & B" in parts["text/plain"]
+
+    other = email.message_from_bytes(template.render("bob@x.com", {}))
+    assert "Dear friend at " in other.get_payload(0).get_payload(0).get_payload(decode=True).decode()
+
+
+def test_rendering_many_copies_is_fast():
+    template = MergeMessageTemplate.from_yagmail(MimeBuilder(), "Hi {{name}}", "<p>Hello {{name}}</p>" * 20)
+    started = time.perf_counter()
+    for i in range(20000):
+        template.render(f"user{i}@x.com", {"name": f"User {i}"})
+    assert time.perf_counter() - started < 5
+
+
+def test_sender_merges_csv_fields(monkeypatch):
+    sender = make_sender(monkeypatch, max_workers=2)
+    sender._builder = MimeBuilder()
+    rows = iter([("a@x.com", {"name": "Ann"}), ("b@x.com", {"name": "Bob"})])
+
+    sender.send_merged_emails(rows, "Hi {{name}}", "<p>{{name}}</p>", total_recipients=2)
+
+    assert sorted(r[0] for _, r in FakeClient.outbox) == ["a@x.com", "b@x.com"]
+
+
+def test_merge_message_carries_binary_attachment(tmp_path):
+    attachment = tmp_path / "logo.png"
+    attachment.write_bytes(bytes(range(256)) * 40)
+    template = MergeMessageTemplate.from_yagmail(MimeBuilder(), "Hi {{name}}", "<p>{{name}}</p>", str(attachment))
+
+    msg = email.message_from_bytes(template.render("ann@x.com", {"name": "Ann"}))
+    attached = [p for p in msg.walk() if p.get_filename()]
+    assert [p.get_filename() for p in attached] == ["logo.png"]
+    assert attached[0].get_payload(decode=True) == attachment.read_bytes()
+    assert "<p>Ann</p>" in msg.get_payload(0).get_payload(0).get_payload(decode=True).decode()
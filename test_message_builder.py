@@ -0,0 +1,56 @@
+from email import message_from_bytes
+
+import yagmail
+
+from src.core.message_builder import MergeMessageTemplate, MessageTemplate
+
+
+def test_template_is_built_once_and_patched_per_recipient(tmp_path, monkeypatch):
+    attachment = tmp_path / "report.pdf"
+    attachment.write_bytes(b"%PDF-1.4 fake pdf" * 100)
+    client = yagmail.SMTP("me@example.com", "secret")
+    calls = []
+    original = client.prepare_send
+    monkeypatch.setattr(client, "prepare_send", lambda **kw: calls.append(kw) or original(**kw))
+
+    template = MessageTemplate.from_yagmail(client, "Hello", "<p>Hi there</p>", str(attachment))
+    first = message_from_bytes(template.render("a@example.com"))
+    second = message_from_bytes(template.render("b@example.com"))
+
+    assert len(calls) == 1
+    assert first["To"] == "a@example.com" and second["To"] == "b@example.com"
+    assert first["Message-ID"] != second["Message-ID"]
+    assert first["Subject"] == "Hello"
+    assert len(first.get_all("To")) == 1 and len(first.get_all("Date")) == 1
+    filenames = [part.get_filename() for part in first.walk() if part.get_filename()]
+    assert filenames == ["report.pdf"]
+    payload = [part for part in first.walk() if part.get_filename()][0].get_payload(decode=True)
+    assert payload == attachment.read_bytes()
+
+
+def test_batch_render_lists_all_recipients():
+    client = yagmail.SMTP("me@example.com", "secret")
+    template = MessageTemplate.from_yagmail(client, "Hello", "Body")
+    message = message_from_bytes(template.render(["a@example.com", "b@example.com"]))
+    assert [a.strip() for a in message["To"].split(",")] == ["a@example.com", "b@example.com"]
+
+
+def test_merged_subject_cannot_inject_headers():
+    client = yagmail.SMTP("me@example.com", "secret")
+    template = MergeMessageTemplate.from_yagmail(client, "Hi {{name}}", "<p>Hello</p>")
+    raw = template.render("a@example.com", {"name": "Bob\r\nBcc: evil@example.com\r\nX-Injected: 1"})
+
+    message = message_from_bytes(raw)
+    assert message["Bcc"] is None
+    assert message["X-Injected"] is None
+    assert message["Subject"] == "Hi Bob Bcc: evil@example.com X-Injected: 1"
+
+
+def test_merged_values_are_escaped_in_the_html_part_only():
+    client = yagmail.SMTP("me@example.com", "secret")
+    template = MergeMessageTemplate.from_yagmail(client, "Hi", "<p>Hello {{name}}</p>")
+    message = message_from_bytes(template.render("a@example.com", {"name": "Tom & <Jerry>"}))
+
+    parts = {p.get_content_type(): p.get_payload(decode=True).decode() for p in message.walk() if not p.is_multipart()}
+    assert "Hello Tom &amp; &lt;Jerry&gt;" in parts["text/html"]
+    assert "Hello Tom & <Jerry>" in parts["text/plain"]
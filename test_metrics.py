@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from src.core.metrics import (
+    EMAILS_SENT, STAGE_SECONDS, Counter, Gauge, Histogram, MetricsRegistry, RollingRate
+)
+from src.core.profiler import SamplingProfiler
+from test_async_email_sender import make_sender
+
+
+def test_registry_renders_prometheus_text_format():
+    registry = MetricsRegistry()
+    sends = registry.register(Counter("sends_total", "Sends.", ["mode"]))
+    latency = registry.register(Histogram("stage_seconds", "Stage latency.", ["stage"], buckets=(0.1, 1.0)))
+    registry.register(Gauge("queued", "Queued jobs.", function=lambda: 3))
+    registry.register(Gauge("broken", "Unavailable.", function=lambda: 1 / 0))
+    sends.inc(2, mode="individual")
+    latency.observe(0.05, stage="send")
+    latency.observe(0.5, stage="send")
+    latency.observe(5, stage="send")
+
+    text = registry.render()
+    assert "# TYPE sends_total counter\nsends_total{mode=\"individual\"} 2\n" in text
+    assert 'stage_seconds_bucket{stage="send",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="send",le="1"} 2' in text
+    assert 'stage_seconds_bucket{stage="send",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="send"} 3' in text
+    assert "\nqueued 3\n" in text
+    assert "# TYPE broken gauge\n" in text and "\nbroken " not in text
+    assert registry.register(Counter("sends_total", "Again.", ["mode"])) is sends
+
+
+def test_rolling_rate_forgets_old_seconds():
+    now = [100.0]
+    rate = RollingRate(window=10, clock=lambda: now[0])
+    rate.add(30)
+    assert rate.rate() == 3
+    now[0] = 105.5
+    rate.add(20)
+    assert rate.rate() == 5
+    now[0] = 112.0
+    assert rate.rate() == 2
+
+
+def test_sender_records_stages_and_counters(monkeypatch):
+    sender = make_sender(monkeypatch, max_concurrency=2)
+    sent_before = EMAILS_SENT.value()
+    sends_before = STAGE_SECONDS.count(stage="send")
+    builds_before = STAGE_SECONDS.count(stage="mime_build")
+    asyncio.run(sender.send_individual_emails([f"u{i}@x.com" for i in range(5)], "Hi", "Body"))
+
+    assert EMAILS_SENT.value() - sent_before == 5
+    assert STAGE_SECONDS.count(stage="send") - sends_before == 5
+    assert STAGE_SECONDS.count(stage="mime_build") - builds_before == 1
+
+
+def test_profiler_samples_the_target_thread(tmp_path):
+    def busy_wait():
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            pass
+
+    with SamplingProfiler(interval=0.002) as profiler:
+        busy_wait()
+
+    assert profiler.samples > 10
+    assert profiler.top(1)[0][0] == "test_metrics.py:busy_wait"
+    path = profiler.dump(str(tmp_path / "profiles" / "task.collapsed"))
+    first = open(path).readline()
+    assert "test_metrics.py:test_profiler_samples_the_target_thread;test_metrics.py:busy_wait" in first
+    assert int(first.rsplit(" ", 1)[1]) > 0
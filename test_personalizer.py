@@ -0,0 +1,139 @@
+import asyncio
+import json
+import time
+
+import src.core.async_email_sender as async_sender_module
+from src.core.ai_generator import GeminiEmailGenerator
+from src.core.async_email_sender import AsyncEmailSender
+from src.core.fake_model import FakeGenerativeModel, fake_reply
+from src.core.personalizer import Personalizer
+from src.core.rate_limiter import SenderRateLimiter
+from src.core.response_cache import ResponseCache
+from test_async_email_sender import FakeAsyncSMTP
+
+
+def make_personalizer(model, batch_size=5, **kwargs):
+    generator = GeminiEmailGenerator(model=model, cache=ResponseCache(max_entries=10000), retry_backoff=0.001, **kwargs)
+    return Personalizer(generator, batch_size=batch_size)
+
+
+def rows(count):
+    return [(f"user{i}@example.com", {"name": f"User {i}", "company": f"Co {i}"}) for i in range(count)]
+
+
+async def collect(personalizer, recipients):
+    return [item async for item in personalizer.stream(recipients, "Hello", "<p>Base</p>")]
+
+
+def test_recipients_are_packed_into_batches():
+    model = FakeGenerativeModel(latency=0.01)
+    personalizer = make_personalizer(model, batch_size=5)
+
+    drafts = dict(asyncio.run(collect(personalizer, rows(23))))
+
+    assert model.calls == 5
+    assert len(drafts) == 23
+    assert "User 7" in drafts["user7@example.com"]["body"]
+    assert personalizer.metrics.drafts == 23
+
+
+def test_cached_drafts_skip_the_model():
+    model = FakeGenerativeModel()
+    personalizer = make_personalizer(model)
+    asyncio.run(collect(personalizer, rows(10)))
+    asyncio.run(collect(personalizer, rows(12)))
+
+    assert model.calls == 3
+    assert personalizer.metrics.cache_hits == 10
+
+
+def test_incomplete_replies_are_retried_per_recipient():
+    def drop_first(prompt):
+        drafts = json.loads(fake_reply(prompt))
+        return json.dumps(drafts[1:] if len(drafts) > 1 else drafts)
+
+    model = FakeGenerativeModel(respond=drop_first)
+    personalizer = make_personalizer(model, batch_size=4)
+
+    drafts = dict(asyncio.run(collect(personalizer, rows(4))))
+
+    assert len(drafts) == 4
+    assert personalizer.metrics.retried_recipients == 1
+
+
+def test_sending_starts_before_generation_finishes(monkeypatch):
+    monkeypatch.setattr(async_sender_module.aiosmtplib, "SMTP", FakeAsyncSMTP)
+    FakeAsyncSMTP.outbox = []
+    sender = AsyncEmailSender(
+        "me@example.com", "secret", max_concurrency=2, rate_limiter=SenderRateLimiter(rate=1e6, burst=1e6)
+    )
+    personalizer = make_personalizer(FakeGenerativeModel(latency=0.05), batch_size=2, max_concurrency=1)
+    # yagmail imports its MIME helpers on first use; keep that out of the timing.
+    asyncio.run(sender.compile_message("Warm up", "<p>Warm up</p>"))
+    first_send = []
+
+    def progress(index, total, recipient):
+        if not first_send:
+            first_send.append(time.monotonic())
+
+    async def run():
+        started = time.monotonic()
+        await sender.send_personalized_emails(
+            personalizer.stream(rows(10), "Hello", "<p>Base</p>"), 10, progress_callback=progress
+        )
+        return started, time.monotonic()
+
+    started, finished = asyncio.run(run())
+
+    assert sorted(r[0] for r in FakeAsyncSMTP.outbox) == sorted(email for email, _ in rows(10))
+    assert first_send[0] - started < (finished - started) / 2
+
+
+def test_recipient_the_model_keeps_dropping_fails_alone(monkeypatch):
+    def drop_user3(prompt):
+        drafts = json.loads(fake_reply(prompt))
+        return json.dumps([draft for draft in drafts if "User 3," not in draft["body"]])
+
+    monkeypatch.setattr(async_sender_module.aiosmtplib, "SMTP", FakeAsyncSMTP)
+    FakeAsyncSMTP.outbox = []
+    sender = AsyncEmailSender(
+        "me@example.com", "secret", max_concurrency=2, rate_limiter=SenderRateLimiter(rate=1e6, burst=1e6)
+    )
+    personalizer = make_personalizer(FakeGenerativeModel(respond=drop_user3), batch_size=4)
+    failures = []
+
+    report = asyncio.run(sender.send_personalized_emails(
+        personalizer.stream(rows(8), "Hello", "<p>Base</p>"), 8, failure_callback=failures.append
+    ))
+
+    assert report.sent == 7 and report.failed == 1
+    assert [outcome.recipient for outcome in failures] == ["user3@example.com"]
+    assert "incomplete" in failures[0].error
+    assert "user3@example.com" not in [r[0] for r in FakeAsyncSMTP.outbox]
+    assert personalizer.metrics.failed_recipients == 1
+
+
+def test_batch_the_generator_gives_up_on_fails_alone(monkeypatch):
+    def blocked(prompt):
+        if "bad@x.com" in prompt:
+            raise ValueError("blocked by safety filter")
+        return fake_reply(prompt)
+
+    monkeypatch.setattr(async_sender_module.aiosmtplib, "SMTP", FakeAsyncSMTP)
+    FakeAsyncSMTP.outbox = []
+    sender = AsyncEmailSender(
+        "me@example.com", "secret", max_concurrency=2, rate_limiter=SenderRateLimiter(rate=1e6, burst=1e6)
+    )
+    personalizer = make_personalizer(FakeGenerativeModel(respond=blocked), batch_size=1, max_retries=0)
+    recipients = [(email, {"name": email}) for email in ("a@x.com", "bad@x.com", "c@x.com")]
+    failures = []
+
+    report = asyncio.run(sender.send_personalized_emails(
+        personalizer.stream(recipients, "Hello", "<p>Base</p>"), 3, failure_callback=failures.append
+    ))
+
+    assert report.sent == 2 and report.failed == 1
+    assert [outcome.recipient for outcome in failures] == ["bad@x.com"]
+    assert "safety filter" in failures[0].error
+    assert sorted(r[0] for r in FakeAsyncSMTP.outbox) == ["a@x.com", "c@x.com"]
+    assert personalizer.metrics.failed_recipients == 1
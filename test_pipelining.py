@@ -0,0 +1,71 @@
+import smtplib
+
+from src.core.pipelining import group_by_domain, pipelined_sendmail
+
+
+class ScriptedSession:
+    """Records what the client writes and answers with canned SMTP replies."""
+    def __init__(self, replies, extensions=("pipelining", "size")):
+        self.replies = list(replies)
+        self.extensions = extensions
+        self.writes = []
+        self.reset = False
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def has_extn(self, name):
+        return name in self.extensions
+
+    def send(self, data):
+        self.writes.append(data if isinstance(data, bytes) else data.encode("ascii"))
+
+    def getreply(self):
+        return self.replies.pop(0)
+
+    def rset(self):
+        self.reset = True
+
+    def sendmail(self, sender, recipients, msg):
+        self.writes.append(("sendmail", sender, tuple(recipients)))
+        return {}
+
+
+def test_envelope_is_sent_in_one_write():
+    session = ScriptedSession([(250, b"OK"), (250, b"OK"), (250, b"OK"), (354, b"Go"), (250, b"Queued")])
+    refused = pipelined_sendmail(session, "me@x.com", ["a@y.com", "b@y.com"], b"Subject: Hi\r\n\r\n.hidden\r\n")
+
+    assert refused == {}
+    assert session.writes[0] == (
+        b"MAIL FROM:<me@x.com> SIZE=24\r\nRCPT TO:<a@y.com>\r\nRCPT TO:<b@y.com>\r\nDATA\r\n"
+    )
+    assert session.writes[1] == b"Subject: Hi\r\n\r\n..hidden\r\n.\r\n"
+
+
+def test_partially_refused_envelope_still_delivers():
+    session = ScriptedSession([(250, b"OK"), (550, b"Unknown"), (250, b"OK"), (354, b"Go"), (250, b"Queued")])
+    refused = pipelined_sendmail(session, "me@x.com", ["a@y.com", "b@y.com"], b"Body")
+    assert refused == {"a@y.com": (550, b"Unknown")}
+    assert session.writes[-1] == b"Body\r\n.\r\n"
+
+
+def test_fully_refused_envelope_raises_and_resets():
+    session = ScriptedSession([(250, b"OK"), (550, b"Unknown"), (554, b"No valid recipients")])
+    try:
+        pipelined_sendmail(session, "me@x.com", ["a@y.com"], b"Body")
+    except smtplib.SMTPRecipientsRefused as e:
+        assert e.recipients == {"a@y.com": (550, b"Unknown")}
+    else:
+        raise AssertionError("expected SMTPRecipientsRefused")
+    assert session.reset
+
+
+def test_falls_back_without_pipelining():
+    session = ScriptedSession([], extensions=())
+    pipelined_sendmail(session, "me@x.com", ["a@y.com"], b"Body")
+    assert session.writes == [("sendmail", "me@x.com", ("a@y.com",))]
+
+
+def test_group_by_domain_caps_envelope_size():
+    recipients = ["a@x.com", "b@y.com", "c@X.com", "d@x.com"]
+    assert group_by_domain(recipients, 2) == [["a@x.com", "c@X.com"], ["d@x.com"], ["b@y.com"]]
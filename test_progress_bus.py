@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from src.core.progress_bus import ProgressBus
+
+
+def decode(frame):
+    return json.loads(frame[len(b"data: "):])
+
+
+async def collect(bus, task_id, initial, **kwargs):
+    return [decode(frame) async for frame in bus.stream(task_id, initial, **kwargs)]
+
+
+def test_rapid_updates_are_coalesced():
+    bus = ProgressBus(min_interval=0.05)
+
+    async def run():
+        watchers = [asyncio.create_task(collect(bus, "t", {"status": "running", "sent": 0})) for _ in range(200)]
+        await asyncio.sleep(0)
+        for sent in range(1, 1001):
+            bus.publish("t", {"status": "running", "sent": sent})
+            if sent % 100 == 0:
+                await asyncio.sleep(0.01)
+        bus.publish("t", {"status": "completed", "sent": 1000})
+        return await asyncio.gather(*watchers)
+
+    results = asyncio.run(run())
+
+    for frames in results:
+        assert frames[0]["sent"] == 0
+        assert frames[-1] == {"status": "completed", "sent": 1000}
+        assert len(frames) < 10
+    assert bus.watchers("t") == 0
+
+
+def test_finished_task_sends_one_frame():
+    bus = ProgressBus()
+    frames = asyncio.run(collect(bus, "t", {"status": "completed", "sent": 3}))
+    assert frames == [{"status": "completed", "sent": 3}]
+
+
+def test_refresh_is_shared_between_watchers():
+    bus = ProgressBus(min_interval=0)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"status": "running" if len(calls) < 3 else "completed", "sent": len(calls)}
+
+    async def run():
+        return await asyncio.gather(*(
+            collect(bus, "t", {"status": "running", "sent": 0}, refresh=fetch, refresh_interval=0.01)
+            for _ in range(50)
+        ))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 3
+    assert all(frames[-1]["status"] == "completed" for frames in results)
+
+
+def test_publish_from_another_thread():
+    bus = ProgressBus(min_interval=0)
+
+    async def run():
+        watcher = asyncio.create_task(collect(bus, "t", {"status": "running", "sent": 0}))
+        await asyncio.sleep(0)
+        await asyncio.to_thread(bus.publish, "t", {"status": "completed", "sent": 1})
+        return await watcher
+
+    assert asyncio.run(run())[-1] == {"status": "completed", "sent": 1}
+
+
+def test_final_state_published_before_subscribing_ends_the_stream():
+    bus = ProgressBus(keepalive=0.05)
+    latest = {"status": "running", "sent": 0}
+
+    async def current():
+        return latest
+
+    async def run():
+        frames = bus.stream("t", dict(latest), current=current)
+        first = await frames.__anext__()
+        # The task finishes while the watcher is between its snapshot and subscribing.
+        latest.update(status="completed", sent=5)
+        return [decode(first)] + [decode(frame) async for frame in frames]
+
+    frames = asyncio.run(asyncio.wait_for(run(), 2))
+    assert frames == [{"status": "running", "sent": 0}, {"status": "completed", "sent": 5}]
+
+
+def test_final_state_missed_by_publish_is_found_on_keepalive():
+    bus = ProgressBus(keepalive=0.05)
+    latest = {"status": "running", "sent": 0}
+
+    async def current():
+        return dict(latest)
+
+    async def run():
+        watcher = asyncio.create_task(collect(bus, "t", dict(latest), current=current))
+        await asyncio.sleep(0.01)
+        latest.update(status="completed", sent=2)  # never published
+        return await asyncio.wait_for(watcher, 2)
+
+    assert asyncio.run(run())[-1] == {"status": "completed", "sent": 2}
@@ -0,0 +1,84 @@
+import threading
+
+from src.core.progress_store import FileProgressBackend, ProgressStore, RedisProgressBackend, backend_from_url
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode("utf-8")
+
+    def get(self, key):
+        return self.data.get(key)
+
+
+def test_updates_keep_fixed_fields_and_extras():
+    store = ProgressStore()
+    store.start("t", status="running", sent=0, total=3, message="Starting...")
+    state = store.update("t", sent=1, message="Sent to a@example.com", personalization={"drafts": 1})
+    assert state == {
+        "status": "running", "sent": 1, "total": 3,
+        "message": "Sent to a@example.com", "personalization": {"drafts": 1}
+    }
+    assert store.get("t") == state
+    assert store.get("missing") is None
+
+
+def test_finished_tasks_expire_but_running_ones_stay():
+    store = ProgressStore(ttl=-1)
+    store.start("done", status="completed")
+    store.start("busy", status="running")
+    assert "done" not in store
+    assert "busy" in store
+
+
+def test_least_recently_used_finished_tasks_are_evicted_first():
+    store = ProgressStore(max_entries=2, shards=1)
+    store.start("running", status="running")
+    store.start("old", status="completed")
+    store.start("new", status="completed")
+    assert "old" not in store
+    assert "running" in store and "new" in store
+    assert store.stats()["evictions"] == 1
+
+
+def test_concurrent_increments_are_not_lost():
+    store = ProgressStore()
+    store.start("t", status="running", total=8000)
+
+    def work():
+        for _ in range(1000):
+            store.increment("t")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get("t")["sent"] == 8000
+
+
+def test_file_backend_shares_progress_between_stores(tmp_path):
+    writer = ProgressStore(backend=FileProgressBackend(str(tmp_path)), flush_interval=60)
+    reader = ProgressStore(backend=FileProgressBackend(str(tmp_path)))
+    writer.start("t", status="running", sent=0, total=2)
+    writer.update("t", sent=1)
+    # Throttled: the intermediate update is not written yet.
+    assert reader.get("t")["sent"] == 0
+    writer.update("t", sent=2, status="completed")
+    assert reader.get("t")["status"] == "completed"
+    assert "t" not in reader
+
+
+def test_redis_backend_round_trips_state():
+    client = FakeRedis()
+    store = ProgressStore(backend=RedisProgressBackend(client))
+    store.start("t", status="failed", message="boom")
+    assert ProgressStore(backend=RedisProgressBackend(client)).get("t")["message"] == "boom"
+
+
+def test_backend_from_url(tmp_path):
+    assert backend_from_url("") is None
+    assert isinstance(backend_from_url(f"file://{tmp_path}"), FileProgressBackend)
@@ -0,0 +1,54 @@
+import smtplib
+import time
+
+import pytest
+
+from src.core.rate_limiter import (
+    DailyQuota, DailyQuotaExceeded, SenderRateLimiter, TokenBucket, get_rate_limiter, is_throttle_error
+)
+
+
+def test_token_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=10, burst=3)
+    now = time.monotonic()
+    assert [bucket.reserve(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(now) == pytest.approx(0.1, rel=0.05)
+
+
+def test_daily_quota_rolls_over():
+    quota = DailyQuota(limit=5)
+    start = 1_000_000.0
+    quota.consume(start, 5)
+    assert quota.remaining(start) == 0
+    assert quota.remaining(start + DailyQuota.WINDOW + DailyQuota.SLOT) == 5
+
+
+def test_limiter_raises_when_daily_quota_is_used_up():
+    limiter = SenderRateLimiter(rate=1000, burst=1000, daily_quota=3)
+    limiter.acquire(recipients=3)
+    with pytest.raises(DailyQuotaExceeded):
+        limiter.acquire()
+
+
+def test_throttle_halves_rate_and_success_recovers():
+    limiter = SenderRateLimiter(rate=8, burst=8, base_backoff=0.001)
+    limiter.record_throttle()
+    assert limiter.effective_rate == pytest.approx(4)
+    for _ in range(20):
+        limiter.record_success()
+    assert limiter.effective_rate == pytest.approx(8)
+
+
+def test_limiters_are_shared_per_sender():
+    assert get_rate_limiter("Shared@Example.com") is get_rate_limiter("shared@example.com")
+
+
+def test_throttle_error_classification():
+    assert is_throttle_error(smtplib.SMTPSenderRefused(421, b"slow down", "me@example.com"))
+    assert is_throttle_error(smtplib.SMTPDataError(451, b"try later"))
+    assert not is_throttle_error(smtplib.SMTPDataError(550, b"no such user"))
+    assert not is_throttle_error(ValueError("boom"))
+    # Temporary refusals of single mailboxes are not the account's problem.
+    assert not is_throttle_error(smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"mailbox busy")}))
+    assert not is_throttle_error(smtplib.SMTPRecipientsRefused({"a@example.com": (452, b"mailbox full")}))
+    assert not is_throttle_error(smtplib.SMTPDataError(452, b"insufficient storage"))
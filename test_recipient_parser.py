@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+from src.utils.recipient_parser import parse_from_csv, parse_from_text, stream_from_csv
+
+
+def test_parse_from_text_strips_and_skips_empty():
+    assert parse_from_text(" a@example.com, ,b@example.com ") == ["a@example.com", "b@example.com"]
+
+
+def test_stream_reads_only_email_column_and_reports_counts():
+    data = b"Name,EMAIL,Company\nAnn,ann@example.com,Acme\nBob,not-an-email,Acme\nAnn,ANN@example.com,Acme\n,,\n"
+    stream = stream_from_csv(io.BytesIO(data))
+
+    assert list(stream) == ["ann@example.com"]
+    summary = stream.summary()
+    assert (summary["count"], summary["invalid"], summary["duplicates"]) == (1, 1, 1)
+    assert summary["invalid_preview"] == ["not-an-email"]
+
+
+def test_stream_does_not_close_the_upload():
+    upload = io.BytesIO(b"Email\na@example.com\n")
+    list(stream_from_csv(upload))
+    assert not upload.closed
+
+
+def test_large_csv_is_streamed():
+    rows = "".join(f"user{i}@example.com\n" for i in range(200000))
+    stream = stream_from_csv(io.BytesIO(("Email\n" + rows).encode()))
+    assert sum(1 for _ in stream) == 200000
+    assert len(stream.preview) == 20
+
+
+def test_parse_from_csv_requires_email_column():
+    with pytest.raises(ValueError):
+        parse_from_csv(io.BytesIO(b"Name\nAnn\n"))
+
+
+def test_csv_rows_keep_other_columns():
+    data = b"First Name,EMAIL,Company\nAnn,ANN@example.com,Acme\nBob,bob@example.com,\n"
+    stream = stream_from_csv(io.BytesIO(data), with_fields=True)
+
+    assert list(stream) == [
+        ("ann@example.com", {"first_name": "Ann", "company": "Acme"}),
+        ("bob@example.com", {"first_name": "Bob"}),
+    ]
@@ -0,0 +1,64 @@
+import json
+import threading
+
+from src.core.ai_generator import GeminiEmailGenerator
+from src.core.fake_model import FakeGenerativeModel
+from src.core.response_cache import ResponseCache, cache_key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("b") == (False, None)
+
+
+def test_expired_entries_are_recomputed():
+    cache = ResponseCache(ttl=-1)
+    calls = []
+    cache.get_or_compute("k", lambda: calls.append(1) or "v")
+    cache.get_or_compute("k", lambda: calls.append(1) or "v")
+    assert len(calls) == 2
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResponseCache(directory=str(tmp_path)).set("k", {"subject": "Hi"})
+    assert ResponseCache(directory=str(tmp_path)).get("k") == (True, {"subject": "Hi"})
+
+
+def test_cache_key_separates_parts():
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+
+
+def test_concurrent_identical_requests_share_one_model_call():
+    model = FakeGenerativeModel(latency=0.05)
+    generator = GeminiEmailGenerator(model=model, cache=ResponseCache())
+    results = []
+
+    def generate():
+        results.append(generator.generate_email("Ask for a day off", "Resume"))
+
+    threads = [threading.Thread(target=generate) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.calls == 1
+    assert len(results) == 20 and all(r == results[0] for r in results)
+    generator.generate_email("Ask for a day off", "Other resume")
+    assert model.calls == 2
+
+
+def test_failures_are_not_cached():
+    answers = iter(["not json", json.dumps({"subject": "S", "body": "B"})])
+    model = FakeGenerativeModel(respond=lambda prompt: next(answers))
+    generator = GeminiEmailGenerator(model=model, cache=ResponseCache())
+    try:
+        generator.generate_email("Prompt")
+    except RuntimeError:
+        pass
+    assert generator.generate_email("Prompt") == {"subject": "S", "body": "B"}
@@ -0,0 +1,177 @@
+import asyncio
+from collections import Counter
+
+import aiosmtplib
+import pytest
+
+import src.core.async_email_sender as async_sender_module
+from src.core.async_email_sender import AsyncEmailSender
+from src.core.campaign import build_sender
+from src.core.rate_limiter import SenderRateLimiter
+from src.core.sender_pool import SenderAccount, SenderPool, WeightedScheduler, load_accounts
+
+
+class FakeAccountSMTP:
+    """aiosmtplib.SMTP stand-in that remembers which account each message went out on."""
+    outbox = []
+    bad_logins = set()
+    throttled = set()
+
+    def __init__(self, hostname=None, port=None, use_tls=False):
+        self.is_connected = False
+        self.user = None
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def login(self, user, password):
+        if user in FakeAccountSMTP.bad_logins:
+            raise aiosmtplib.SMTPAuthenticationError(535, "Bad credentials")
+        self.user = user
+
+    async def sendmail(self, sender, recipients, message):
+        if self.user in FakeAccountSMTP.throttled:
+            raise aiosmtplib.SMTPResponseException(451, "Slow down")
+        await asyncio.sleep(0.001)
+        FakeAccountSMTP.outbox.append((self.user, list(recipients), message))
+        return {}, "OK"
+
+    async def quit(self):
+        self.is_connected = False
+
+
+def make_pool(monkeypatch, names, strategy="least_loaded", weights=None, quotas=None):
+    FakeAccountSMTP.outbox = []
+    FakeAccountSMTP.bad_logins = set()
+    FakeAccountSMTP.throttled = set()
+    monkeypatch.setattr(async_sender_module.aiosmtplib, "SMTP", FakeAccountSMTP)
+    accounts = []
+    for name in names:
+        limiter = SenderRateLimiter(rate=1e6, burst=1e6, daily_quota=(quotas or {}).get(name), base_backoff=0.01)
+        sender = AsyncEmailSender(f"{name}@example.com", "secret", max_concurrency=2, rate_limiter=limiter, retry_delay=0)
+        accounts.append(SenderAccount(sender, weight=(weights or {}).get(name, 1.0)))
+    return SenderPool(accounts, strategy=strategy, retry_delay=0)
+
+
+def sent_by():
+    return Counter(user.partition("@")[0] for user, _, _ in FakeAccountSMTP.outbox)
+
+
+def test_recipients_are_spread_over_accounts_with_their_own_from(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b", "c"])
+    recipients = [f"user{i}@example.com" for i in range(60)]
+
+    async def run():
+        await pool.connect()
+        report = await pool.send_individual_emails(recipients, "Hi", "<p>Hello</p>")
+        await pool.close()
+        return report
+
+    report = asyncio.run(run())
+    assert report.sent == 60
+    assert sorted(r[0] for _, r, _ in FakeAccountSMTP.outbox) == sorted(recipients)
+    assert set(sent_by()) == {"a", "b", "c"}
+    assert min(sent_by().values()) >= 10
+    for user, _, message in FakeAccountSMTP.outbox:
+        assert f"From: \"{user}\" <{user}>".encode() in message
+
+
+def test_merged_copies_are_rendered_for_the_sending_account(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b"])
+    rows = [(f"user{i}@example.com", {"name": f"User {i}"}) for i in range(10)]
+    report = asyncio.run(pool.send_merged_emails(rows, "Hi {{name}}", "<p>Hello {{name}}</p>"))
+    assert report.sent == 10
+    subjects = {recipients[0]: message for _, recipients, message in FakeAccountSMTP.outbox}
+    assert b"Subject: Hi User 3" in subjects["user3@example.com"]
+
+
+def test_weighted_scheduler_interleaves_picks_by_weight(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b"], weights={"a": 3})
+    scheduler = WeightedScheduler()
+    picks = [scheduler.pick(pool.accounts).name for _ in range(8)]
+    assert Counter(picks) == {"a@example.com": 6, "b@example.com": 2}
+    assert picks[:4] != ["a@example.com"] * 3 + ["b@example.com"]
+
+
+def test_accounts_failing_login_are_left_out(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b"])
+    FakeAccountSMTP.bad_logins = {"a@example.com"}
+
+    async def run():
+        await pool.connect()
+        return await pool.send_individual_emails([f"user{i}@example.com" for i in range(6)], "Hi", "Body")
+
+    assert asyncio.run(run()).sent == 6
+    assert set(sent_by()) == {"b"}
+    assert [account["state"] for account in pool.health()] == ["disabled", "healthy"]
+
+
+def test_connect_fails_when_no_account_can_log_in(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b"])
+    FakeAccountSMTP.bad_logins = {"a@example.com", "b@example.com"}
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.connect())
+
+
+def test_throttled_account_fails_over_to_the_others(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b"])
+    FakeAccountSMTP.throttled = {"a@example.com"}
+    report = asyncio.run(pool.send_individual_emails([f"user{i}@example.com" for i in range(8)], "Hi", "Body"))
+    assert report.sent == 8 and report.ok
+    assert set(sent_by()) == {"b"}
+
+
+def test_account_over_its_quota_is_suspended(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b"], quotas={"a": 2})
+    report = asyncio.run(pool.send_individual_emails([f"user{i}@example.com" for i in range(10)], "Hi", "Body"))
+    assert report.sent == 10
+    assert sent_by()["a"] == 2
+    assert pool.health()[0]["state"] == "suspended"
+
+
+def test_run_stops_once_every_account_is_over_quota(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b"], quotas={"a": 1, "b": 1})
+    with pytest.raises(RuntimeError, match="Daily sending quota"):
+        asyncio.run(pool.send_individual_emails([f"user{i}@example.com" for i in range(5)], "Hi", "Body"))
+    assert len(FakeAccountSMTP.outbox) == 2
+
+
+def test_build_sender_pools_configured_accounts(monkeypatch):
+    monkeypatch.setattr(async_sender_module.aiosmtplib, "SMTP", FakeAccountSMTP)
+    accounts = '[{"email": "me@example.com", "password": "x"}, {"email": "relay@example.com", "password": "y", "weight": 2, "host": "relay.example.com", "port": 587, "use_tls": false}]'
+    pool = build_sender("me@example.com", "secret", accounts=accounts)
+    assert isinstance(pool, SenderPool)
+    assert [account.name for account in pool.accounts] == ["me@example.com", "relay@example.com"]
+    assert pool.accounts[1].weight == 2 and pool.accounts[1].sender.host == "relay.example.com"
+    assert not isinstance(build_sender("me@example.com", "secret", accounts=""), SenderPool)
+
+
+def test_load_accounts_validates_entries(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text('[{"email": "a@example.com", "password": "x"}]')
+    assert load_accounts(str(path)) == [{"email": "a@example.com", "password": "x"}]
+    with pytest.raises(ValueError):
+        load_accounts('[{"email": "a@example.com"}]')
+    with pytest.raises(ValueError):
+        load_accounts("[not json")
+
+
+def test_refused_mailbox_is_left_to_the_delivery_engine(monkeypatch):
+    pool = make_pool(monkeypatch, ["a", "b"])
+    pool.max_delivery_retries = 0
+
+    async def sendmail(self, sender, recipients, message):
+        if recipients == ["full@example.com"]:
+            raise aiosmtplib.SMTPRecipientsRefused([aiosmtplib.SMTPRecipientRefused(452, "Mailbox full", "full@example.com")])
+        FakeAccountSMTP.outbox.append((self.user, list(recipients), message))
+        return {}, "OK"
+
+    monkeypatch.setattr(FakeAccountSMTP, "sendmail", sendmail)
+    failures = []
+    report = asyncio.run(pool.send_individual_emails(
+        ["full@example.com", "ok@example.com"], "Hi", "Body", failure_callback=failures.append
+    ))
+    assert report.sent == 1 and report.deferred == 1
+    assert [outcome.attempts for outcome in failures] == [1]
+    assert all(account.sender.rate_limiter.paused_for() == 0 for account in pool.accounts)
+    assert all(account["state"] == "healthy" for account in pool.health())